@@ -0,0 +1,88 @@
+"""
+Micro-benchmarks for the CTC decoding of the output of the speech recognition models
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+from learning.decode import greedy_decode, beam_decode
+from learning.metrics import character_error_rate
+from learning.language_model import load_language_model
+from benchmarks.features import best_time
+
+
+def synthetic_probabilities(num_samples=32, num_steps=300, num_classes=34, blank_ratio=0.6, seed=0):
+    """
+    This function is for generating random (peaky) softmax outputs, where most time steps are dominated by the blank token, as for a trained CTC model.
+
+    Parameters:
+        num_samples (int): Integer variable containing the number of samples
+        num_steps (int): Integer variable containing the number of time steps of each sample
+        num_classes (int): Integer variable containing the number of classes (the last one is the blank token)
+        blank_ratio (float): Float variable containing the fraction of time steps dominated by the blank token
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        probabilities (np.ndarray): 3D NumPy array containing the probabilities (axis 0 ==> samples; axis 1 ==> time steps; axis 2 ==> classes)
+
+    """
+
+    random = np.random.RandomState(seed)
+
+    logits = random.randn(num_samples, num_steps, num_classes)
+    peaks = np.where(random.rand(num_samples, num_steps) < blank_ratio, num_classes - 1, random.randint(0, num_classes - 1, size=(num_samples, num_steps)))
+    np.put_along_axis(logits, peaks[:, :, np.newaxis], 6.0, axis=2)
+
+    probabilities = np.exp(logits - logits.max(axis=2, keepdims=True))
+
+    return probabilities / probabilities.sum(axis=2, keepdims=True)
+
+
+def benchmark_decoding(num_samples=32, num_steps=300, beam_widths=(1, 2, 4, 8, 16, 32, 64), prune_k=8, language_model=None, repeats=3):
+    """
+    This function is for measuring the throughput (utterances per second) of the greedy decoding and of the prefix beam search with multiple beam widths.
+
+    Parameters:
+        num_samples (int): Integer variable containing the number of samples in the batch
+        num_steps (int): Integer variable containing the number of time steps of each sample
+        beam_widths (tuple): Tuple variable containing the beam widths to be measured
+        prune_k (int): Integer variable containing the number of characters each prefix is extended by at each time step
+        language_model (string): String variable containing the path to a character language model, also measured fused with the beam search (default is None, see learning.language_model)
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+
+    Returns:
+        results (dict): Dictionary containing the utterances per second of each decoder
+        Prints the results
+
+    """
+
+    probabilities = synthetic_probabilities(num_samples=num_samples, num_steps=num_steps)
+
+    greedy = greedy_decode(probabilities=probabilities)
+    results = {'greedy': num_samples / best_time(lambda: greedy_decode(probabilities=probabilities), repeats)}
+
+    print('Greedy: {:.0f} utterances/s'.format(results['greedy']))
+
+    for beam_width in beam_widths:
+        transcripts = beam_decode(probabilities=probabilities, beam_width=beam_width, prune_k=prune_k)
+        results['beam_' + str(beam_width)] = num_samples / best_time(lambda: beam_decode(probabilities=probabilities, beam_width=beam_width, prune_k=prune_k), repeats)
+
+        print('Beam width {}: {:.1f} utterances/s (CER vs greedy: {:.3f})'.format(beam_width, results['beam_' + str(beam_width)], character_error_rate(greedy, transcripts)))
+
+        if language_model is not None:
+            model = load_language_model(path=language_model)
+            results['beam_lm_' + str(beam_width)] = num_samples / best_time(lambda: beam_decode(probabilities=probabilities, beam_width=beam_width, prune_k=prune_k, language_model=model), repeats)
+
+            print('Beam width {} with language model: {:.1f} utterances/s'.format(beam_width, results['beam_lm_' + str(beam_width)]))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_decoding()
@@ -0,0 +1,191 @@
+"""
+Micro-benchmarks for the computation of spectral and cepstral features
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import time
+import numpy as np
+from feature_extraction.spectral import spectrogram
+from feature_extraction.stft import batch_spectrogram
+from feature_extraction.mel import batch_mfcc
+from preprocessing.spectral import normalize, padding, normalize_batch
+from python_speech_features import mfcc
+
+
+def synthetic_audio(num_files, sampling_rate=16000, min_duration=1.0, max_duration=10.0, seed=0):
+    """
+    This function is for generating random noise audio signals of random durations.
+
+    Parameters:
+        num_files (int): Integer variable containing the number of audio signals to be generated
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        min_duration (float): Float variable containing the duration (in seconds) of the shortest possible audio signal
+        max_duration (float): Float variable containing the duration (in seconds) of the longest possible audio signal
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        audio_list (list): List variable containing the NumPy arrays of the generated audio signals
+
+    """
+
+    random = np.random.RandomState(seed)
+
+    return [(0.1 * random.randn(int(random.uniform(min_duration, max_duration) * sampling_rate))).astype(np.float32) for _ in range(num_files)]
+
+
+def best_time(function, repeats):
+    """
+    This function is for measuring the best wall time of multiple calls of a function.
+
+    Parameters:
+        function (callable): Function (without arguments) to be measured
+        repeats (int): Integer variable containing the number of calls
+
+    Returns:
+        best (float): The shortest wall time (in seconds) of all calls
+
+    """
+
+    best = float('inf')
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def benchmark_spectrogram(num_files=100, sampling_rate=16000, repeats=5):
+    """
+    This function is for comparing the throughput (frames per second) of the per-file spectrogram against the batched STFT engine.
+
+    Parameters:
+        num_files (int): Integer variable containing the number of audio files in the batch
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+
+    Returns:
+        results (dict): Dictionary containing the frames per second of each path
+        Prints the results
+
+    """
+
+    audio_list = synthetic_audio(num_files=num_files, sampling_rate=sampling_rate)
+
+    reference = [spectrogram(audio=audio, sampling_rate=sampling_rate) for audio in audio_list]
+    frames = sum([len(clip) for clip in reference])
+
+    out = np.empty((frames, 129), dtype=np.float32)
+    batched = batch_spectrogram(audio_list=audio_list, sampling_rate=sampling_rate, out=out)
+    difference = max([np.max(np.abs(clip - batched_clip)) for clip, batched_clip in zip(reference, batched)])
+
+    per_file = best_time(lambda: [spectrogram(audio=audio, sampling_rate=sampling_rate) for audio in audio_list], repeats)
+    engine = best_time(lambda: batch_spectrogram(audio_list=audio_list, sampling_rate=sampling_rate, out=out), repeats)
+
+    results = {'per_file': frames / per_file, 'batched': frames / engine}
+
+    print('Frames:', frames)
+    print('Maximum absolute difference:', difference)
+    print('Per-file spectrogram: {:.0f} frames/s'.format(results['per_file']))
+    print('Batched spectrogram: {:.0f} frames/s'.format(results['batched']))
+    print('Speedup: {:.2f}x'.format(results['batched'] / results['per_file']))
+
+    return results
+
+
+def benchmark_mfcc(num_files=100, sampling_rate=16000, num_coeff=13, repeats=5):
+    """
+    This function is for comparing the throughput (frames per second) of the per-file python_speech_features MFCC against the batched MFCC engine.
+
+    Parameters:
+        num_files (int): Integer variable containing the number of audio files in the batch
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients to be generated (number of features)
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+
+    Returns:
+        results (dict): Dictionary containing the frames per second of each path
+        Prints the results
+
+    """
+
+    audio_list = synthetic_audio(num_files=num_files, sampling_rate=sampling_rate)
+
+    reference = [normalize(mfcc(signal=audio, samplerate=sampling_rate, numcep=num_coeff)) for audio in audio_list]
+    frames = sum([len(clip) for clip in reference])
+
+    batched = batch_mfcc(audio_list=audio_list, sampling_rate=sampling_rate, num_coeff=num_coeff)
+    difference = max([np.max(np.abs(clip - batched_clip)) for clip, batched_clip in zip(reference, batched)])
+
+    per_file = best_time(lambda: [normalize(mfcc(signal=audio, samplerate=sampling_rate, numcep=num_coeff)) for audio in audio_list], repeats)
+    engine = best_time(lambda: batch_mfcc(audio_list=audio_list, sampling_rate=sampling_rate, num_coeff=num_coeff), repeats)
+
+    results = {'per_file': frames / per_file, 'batched': frames / engine}
+
+    print('Frames:', frames)
+    print('Maximum absolute difference:', difference)
+    print('Per-file MFCC: {:.0f} frames/s'.format(results['per_file']))
+    print('Batched MFCC: {:.0f} frames/s'.format(results['batched']))
+    print('Speedup: {:.2f}x'.format(results['batched'] / results['per_file']))
+
+    return results
+
+
+def benchmark_minibatch(batch_sizes=(8, 16, 32, 64, 128, 256), num_features=13, min_length=100, max_length=1000, repeats=5, seed=0):
+    """
+    This function is for comparing the time of normalizing and zero-padding minibatches of features clip by clip (normalize and padding, then stacking)
+    against the minibatch kernel normalizing directly into a reused buffer (normalize_batch), for multiple batch sizes.
+
+    Parameters:
+        batch_sizes (tuple): Tuple variable containing the numbers of audio files in a minibatch to be measured
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, 13 for the MFCC)
+        min_length (int): Integer variable containing the smallest possible number of frames of an audio file
+        max_length (int): Integer variable containing the largest possible number of frames of an audio file
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        results (dict): Dictionary containing the per-clip and minibatch times (in milliseconds) of each batch size
+        Prints the results
+
+    """
+
+    random = np.random.RandomState(seed)
+    results = {}
+
+    buffer = np.empty(max(batch_sizes) * max_length * num_features, dtype=np.float32)
+
+    for batch_size in batch_sizes:
+        clips = [random.randn(random.randint(min_length, max_length + 1), num_features).astype(np.float32) for _ in range(batch_size)]
+        maximum = max([len(clip) for clip in clips])
+
+        def per_clip():
+            return np.stack([padding(data=normalize(data=clip), maximum=maximum) for clip in clips])
+
+        def minibatch():
+            return normalize_batch(clips=clips, normalization='utterance', out=buffer)[0]
+
+        difference = float(np.max(np.abs(per_clip() - minibatch())))
+
+        results[batch_size] = {'per_clip': 1000 * best_time(per_clip, repeats), 'minibatch': 1000 * best_time(minibatch, repeats)}
+
+        print('Batch size {:>4}: per-clip {:8.2f} ms, minibatch {:8.2f} ms, speedup {:5.2f}x (maximum absolute difference {:.1e})'.format(
+            batch_size, results[batch_size]['per_clip'], results[batch_size]['minibatch'], results[batch_size]['per_clip'] / results[batch_size]['minibatch'], difference))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_spectrogram()
+    print()
+    benchmark_mfcc()
+    print()
+    benchmark_minibatch()
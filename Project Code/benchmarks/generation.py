@@ -0,0 +1,192 @@
+"""
+Benchmarks for the generation of spectral features
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import tempfile
+import time
+from benchmarks.synthetic import generate_corpus
+from feature_extraction.spectral import generate_spectrogram, generate_mfcc, generate_features, load_batch_audio
+from feature_extraction.stft import batch_spectrogram
+from utils.data import find_maximum_all
+from utils.parallel import list_batches
+
+
+def decoding_maximum(path, sampling_rate):
+    """
+    This function is for finding the length of the longest spectrogram in the dataset by decoding every audio file and computing its spectrogram (the previous approach of find_maximum_all).
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+
+    Returns:
+        max_length (int): The length of the longest spectrogram in the dataset
+
+    """
+
+    max_length = 0
+
+    for folder, batch in list_batches(path):
+        clips = batch_spectrogram(audio_list=load_batch_audio(path=path + os.sep + folder + os.sep + batch, sampling_rate=sampling_rate), sampling_rate=sampling_rate)
+        max_length = max([max_length] + [len(clip) for clip in clips])
+
+    return max_length
+
+
+def benchmark_single_pass(num_folders=2, num_batches=3, num_files=20, sampling_rate=16000, repeats=3):
+    """
+    This function is for comparing the wall time of the previous two-pass spectrogram generation (searching for the maximum by decoding all audio files, then generating) against the single-pass generation, on a synthetic dataset.
+
+    Parameters:
+        num_folders (int): Integer variable containing the number of folders of the synthetic dataset
+        num_batches (int): Integer variable containing the number of batch folders in each folder of the synthetic dataset
+        num_files (int): Integer variable containing the number of audio files in each batch folder of the synthetic dataset
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+
+    Returns:
+        results (dict): Dictionary containing the best wall time (in seconds) of each path
+        Prints the results
+
+    """
+
+    with tempfile.TemporaryDirectory() as path:
+        data_path = path + os.sep + 'train'
+        generate_corpus(path=data_path, num_folders=num_folders, num_batches=num_batches, num_files=num_files, sampling_rate=sampling_rate)
+
+        two_pass = []
+        single_pass = []
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            decoding_maximum(path=data_path, sampling_rate=sampling_rate)
+            generate_spectrogram(path=data_path, sampling_rate=sampling_rate, storage='padded', cache=False)
+            two_pass.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            generate_spectrogram(path=data_path, sampling_rate=sampling_rate, storage='padded', cache=False)
+            single_pass.append(time.perf_counter() - start)
+
+    results = {'two_pass': min(two_pass), 'single_pass': min(single_pass)}
+
+    print('Audio files:', num_folders * num_batches * num_files)
+    print('Two-pass generation: {:.3f} s'.format(results['two_pass']))
+    print('Single-pass generation: {:.3f} s'.format(results['single_pass']))
+    print('Speedup: {:.2f}x'.format(results['two_pass'] / results['single_pass']))
+
+    return results
+
+
+def benchmark_maximum(num_folders=2, num_batches=3, num_files=20, sampling_rate=16000, repeats=3):
+    """
+    This function is for comparing the wall time of searching for the longest spectrogram by decoding all audio files against the header-only length index, on a synthetic dataset.
+
+    Parameters:
+        num_folders (int): Integer variable containing the number of folders of the synthetic dataset
+        num_batches (int): Integer variable containing the number of batch folders in each folder of the synthetic dataset
+        num_files (int): Integer variable containing the number of audio files in each batch folder of the synthetic dataset
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+
+    Returns:
+        results (dict): Dictionary containing the best wall time (in seconds) of each search, and the found maximums
+        Prints the results
+
+    """
+
+    with tempfile.TemporaryDirectory() as path:
+        data_path = path + os.sep + 'train'
+        generate_corpus(path=data_path, num_folders=num_folders, num_batches=num_batches, num_files=num_files, sampling_rate=sampling_rate)
+
+        start = time.perf_counter()
+        find_maximum_all(path=data_path, sampling_rate=sampling_rate, method='spectrogram')
+        index_build = time.perf_counter() - start
+
+        decoding = []
+        header = []
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            decoding_max = decoding_maximum(path=data_path, sampling_rate=sampling_rate)
+            decoding.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            header_max = find_maximum_all(path=data_path, sampling_rate=sampling_rate, method='spectrogram')
+            header.append(time.perf_counter() - start)
+
+    results = {'decoding': min(decoding), 'index_build': index_build, 'index': min(header), 'decoding_maximum': decoding_max, 'index_maximum': header_max}
+
+    print('Audio files:', num_folders * num_batches * num_files)
+    print('Maximum (decoding / index):', decoding_max, '/', header_max)
+    print('Decoding search: {:.3f} s'.format(results['decoding']))
+    print('Index search (first run, reading headers): {:.3f} s'.format(results['index_build']))
+    print('Index search (cached): {:.3f} s'.format(results['index']))
+
+    return results
+
+
+def benchmark_fused(num_folders=2, num_batches=3, num_files=20, sampling_rate=16000, native_rate=22050, num_coeff=13, repeats=3):
+    """
+    This function is for comparing the wall time of generating the spectrogram and MFCC features in two separate passes against the fused single pass, on a synthetic dataset.
+    The synthetic audio files are written at native_rate, so (as in the real dataset before resampling) every pass decodes and resamples the audio files.
+
+    Parameters:
+        num_folders (int): Integer variable containing the number of folders of the synthetic dataset
+        num_batches (int): Integer variable containing the number of batch folders in each folder of the synthetic dataset
+        num_files (int): Integer variable containing the number of audio files in each batch folder of the synthetic dataset
+        sampling_rate (int): Integer variable containing the sampling rate of the generated features (ex: 16kHz ==> sampling_rate = 16000)
+        native_rate (int): Integer variable containing the sampling rate of the synthetic audio files
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients
+        repeats (int): Integer variable containing the number of times each measurement is repeated (the best time is reported)
+
+    Returns:
+        results (dict): Dictionary containing the best wall time (in seconds) of each path
+        Prints the results
+
+    """
+
+    with tempfile.TemporaryDirectory() as path:
+        data_path = path + os.sep + 'train'
+        generate_corpus(path=data_path, num_folders=num_folders, num_batches=num_batches, num_files=num_files, sampling_rate=native_rate)
+
+        # builds the length index of the audio files, so neither path is measured with it
+        generate_features(path=data_path, sampling_rate=sampling_rate, num_coeff=num_coeff, cache=False)
+
+        separate = []
+        fused = []
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            generate_spectrogram(path=data_path, sampling_rate=sampling_rate, cache=False)
+            generate_mfcc(path=data_path, sampling_rate=sampling_rate, num_coeff=num_coeff, cache=False)
+            separate.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            generate_features(path=data_path, sampling_rate=sampling_rate, features=('spectrogram', 'mfcc'), num_coeff=num_coeff, cache=False)
+            fused.append(time.perf_counter() - start)
+
+    results = {'separate': min(separate), 'fused': min(fused)}
+
+    print('Audio files:', num_folders * num_batches * num_files)
+    print('Separate spectrogram and MFCC generation: {:.3f} s'.format(results['separate']))
+    print('Fused generation: {:.3f} s'.format(results['fused']))
+    print('Speedup: {:.2f}x'.format(results['separate'] / results['fused']))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_single_pass()
+    print()
+    benchmark_maximum()
+    print()
+    benchmark_fused()
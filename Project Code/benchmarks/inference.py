@@ -0,0 +1,160 @@
+"""
+Benchmarks for the CPU inference of the speech recognition models, comparing the float32 Keras model against its quantized TensorFlow Lite exports
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import time
+import resource
+import tempfile
+import numpy as np
+import tensorflow as tf
+from learning.models import baseline_bilstm, output_length
+from learning.export import export_tflite, load_tflite, tflite_predict
+from learning.decode import greedy_decode, indices_to_text
+from learning.metrics import character_error_rate
+from learning.dataset import list_feature_files, clip_generator
+
+
+def held_out_batch(path=None, method='mfcc', num_clips=16, num_features=13, seed=0):
+    """
+    This function is for loading a held-out batch of audio files (features and transcripts), or generating random features when no data folder is given.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (default is None, which generates random features without transcripts)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to use the spectrogram or MFCC features
+        num_clips (int): Integer variable containing the number of audio files in the batch
+        num_features (int): Integer variable containing the number of features of the random features
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        clips (list): List variable containing the 2D NumPy arrays of features of the audio files
+        transcripts (list): List variable containing the true transcripts (None when using random features)
+
+    """
+
+    if path is None:
+        random = np.random.RandomState(seed)
+        return [random.randn(random.randint(200, 1000), num_features).astype(np.float32) for _ in range(num_clips)], None
+
+    clips, transcripts = [], []
+    name = 'MFCC' if method == 'mfcc' else 'Spectrogram'
+
+    for h5_path in reversed(list_feature_files(path=path, method=method)):
+        for features, labels in clip_generator(h5_path=h5_path, name=name):
+            clips.append(features)
+            transcripts.append(labels)
+
+            if len(clips) == num_clips:
+                break
+
+        if len(clips) == num_clips:
+            break
+
+    return clips, [indices_to_text(labels) for labels in transcripts]
+
+
+def peak_memory():
+    """
+    This function is for reading the peak resident memory of the current process.
+
+    Returns:
+        memory (float): The peak resident memory in megabytes
+
+    """
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(predict, clips, repeats=3):
+    """
+    This function is for measuring the latency of a model on each audio file of a batch, and decoding its output.
+
+    Parameters:
+        predict (callable): Function returning the output of the model for a 3D NumPy array of features
+        clips (list): List variable containing the 2D NumPy arrays of features of the audio files
+        repeats (int): Integer variable containing the number of times each audio file is processed (the best time is kept)
+
+    Returns:
+        latency (float): The mean over the audio files of the best latency in milliseconds
+        hypotheses (list): List variable containing the decoded transcripts
+
+    """
+
+    latencies, hypotheses = [], []
+
+    for clip in clips:
+        best = float('inf')
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = predict(clip[np.newaxis])
+            best = min(best, time.perf_counter() - start)
+
+        latencies.append(best * 1000)
+        hypotheses.extend(greedy_decode(np.asarray(output), lengths=[int(output_length(len(clip)))]))
+
+    return float(np.mean(latencies)), hypotheses
+
+
+def benchmark_quantization(path=None, weights=None, method='mfcc', num_features=13, lstm_units=128, num_clips=16, quantizations=('none', 'dynamic', 'float16', 'int8')):
+    """
+    This function is for comparing the latency, memory and character error rate of the float32 Keras model against its TensorFlow Lite exports.
+    The character error rate is calculated against the true transcripts when a data folder is given, and always against the output of the float32 model (agreement).
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder of the held-out batch (default is None, which uses random features)
+        weights (string): String variable containing the path to the trained weights of the model (default is None, which uses randomly initialized weights)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to use the spectrogram or MFCC features
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        lstm_units (int): Integer variable to determine the size of the GRU layers
+        num_clips (int): Integer variable containing the number of audio files in the held-out batch
+        quantizations (tuple): Tuple variable containing the quantization modes to be exported (see learning.export.export_tflite)
+
+    Returns:
+        results (dict): Dictionary containing the latency (ms), model size (MB), peak memory (MB) and character error rates of each model
+        Prints the results
+
+    """
+
+    clips, transcripts = held_out_batch(path=path, method=method, num_clips=num_clips, num_features=num_features)
+
+    model = baseline_bilstm(input_shape=(None, num_features), lstm_units=lstm_units)
+
+    if weights is not None:
+        model.load_weights(weights)
+
+    results = {}
+
+    latency, reference = measure(lambda x: model(x, training=False), clips)
+    size = sum([weight.numpy().nbytes for weight in model.weights]) / 2 ** 20
+    results['float32'] = {'latency': latency, 'size': size, 'memory': peak_memory(), 'cer': character_error_rate(transcripts, reference) if transcripts else None, 'agreement': 0.0}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for quantization in quantizations:
+            file_path = export_tflite(model=model, file_path=temp_dir + os.sep + quantization + '.tflite', quantization=quantization, representative_data=clips)
+            interpreter = load_tflite(file_path=file_path)
+
+            latency, hypotheses = measure(lambda x: tflite_predict(interpreter=interpreter, x=x), clips)
+            results['tflite-' + quantization] = {'latency': latency, 'size': os.path.getsize(file_path) / 2 ** 20, 'memory': peak_memory(),
+                                                 'cer': character_error_rate(transcripts, hypotheses) if transcripts else None,
+                                                 'agreement': character_error_rate(reference, hypotheses)}
+
+    print('{:<16} {:>12} {:>10} {:>12} {:>8} {:>10}'.format('Model', 'Latency (ms)', 'Size (MB)', 'Peak (MB)', 'CER', 'vs fp32'))
+    for name, result in results.items():
+        cer = '{:.3f}'.format(result['cer']) if result['cer'] is not None else '-'
+        print('{:<16} {:>12.2f} {:>10.2f} {:>12.1f} {:>8} {:>10.3f}'.format(name, result['latency'], result['size'], result['memory'], cer, result['agreement']))
+
+    return results
+
+
+if __name__ == '__main__':
+    with tf.device('/CPU:0'):
+        benchmark_quantization()
@@ -0,0 +1,200 @@
+"""
+Benchmarks for the random access of single audio files in the generated feature files, in multiple on-disk formats
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import tempfile
+import time
+import h5py
+import numpy as np
+from utils.storage import write_ragged, write_padded, write_clip_major, read_clip, write_raw, open_raw
+
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+
+def synthetic_clips(num_clips=200, num_features=129, min_length=100, max_length=1000, seed=0):
+    """
+    This function is for generating random feature arrays of random lengths.
+
+    Parameters:
+        num_clips (int): Integer variable containing the number of feature arrays
+        num_features (int): Integer variable containing the number of features
+        min_length (int): Integer variable containing the smallest possible number of frames
+        max_length (int): Integer variable containing the largest possible number of frames
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        clips (list): List variable containing the 2D float32 NumPy arrays (axis 0 ==> data through time; axis 1 ==> features)
+
+    """
+
+    random = np.random.RandomState(seed)
+
+    return [random.randn(random.randint(min_length, max_length + 1), num_features).astype(np.float32) for _ in range(num_clips)]
+
+
+def write_formats(path, clips, num_features, formats):
+    """
+    This function is for writing the same feature arrays in multiple on-disk formats.
+
+    Parameters:
+        path (string): String variable containing the path to the folder where the files are written
+        clips (list): List variable containing the 2D NumPy arrays of features
+        num_features (int): Integer variable containing the number of features
+        formats (tuple): Tuple variable containing the formats to be written:
+        'padded_lzf' (the default padded .h5 form), 'lzf', 'gzip', 'blosc' (ragged .h5 with the compression filter), 'contiguous' (ragged .h5 without chunking or filters), 'raw' (.npy)
+
+    Returns:
+        file_paths (dict): Dictionary containing the path to the file of each format (formats which are not available are skipped)
+
+    """
+
+    file_paths = {}
+
+    for data_format in formats:
+        file_path = path + os.sep + data_format + ('.npy' if data_format == 'raw' else '.h5')
+
+        if data_format == 'raw':
+            write_raw(file_path=file_path, clips=clips, num_features=num_features)
+        elif data_format == 'blosc' and hdf5plugin is None:
+            print('Skipping blosc: the hdf5plugin package is not installed')
+            continue
+        else:
+            with h5py.File(name=file_path, mode='w', libver='latest') as h5_file:
+                if data_format == 'padded_lzf':
+                    write_padded(h5_file=h5_file, name='Features', clips=clips, num_features=num_features)
+                elif data_format == 'contiguous':
+                    h5_file.create_dataset(name='Features', data=np.concatenate(clips, axis=0))
+                    h5_file.create_dataset(name='Offsets', data=np.concatenate([[0], np.cumsum([len(clip) for clip in clips])]))
+                    h5_file.create_dataset(name='Lengths', data=np.array([len(clip) for clip in clips], dtype=np.int64))
+                    h5_file.attrs['storage'] = 'ragged'
+                else:
+                    write_ragged(h5_file=h5_file, name='Features', clips=clips, num_features=num_features,
+                                 compression=hdf5plugin.Blosc(cname='lz4') if data_format == 'blosc' else data_format)
+
+        file_paths[data_format] = file_path
+
+    return file_paths
+
+
+def benchmark_clip_reads(num_clips=200, num_features=129, num_reads=500, formats=('padded_lzf', 'lzf', 'gzip', 'blosc', 'contiguous', 'raw'), seed=0):
+    """
+    This function is for measuring the latency of reading single audio files in random order from a batch file of each format.
+    Each read clip is summed, so the memory-mapped (lazily read) raw format is measured including the access of its data.
+    The files are read right after being written, so they are mostly in the page cache of the operating system (the decompression and copying is measured, not the disk).
+
+    Parameters:
+        num_clips (int): Integer variable containing the number of audio files in the batch file
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, 13 for the MFCC)
+        num_reads (int): Integer variable containing the number of random reads
+        formats (tuple): Tuple variable containing the formats to be measured (see write_formats)
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        results (dict): Dictionary containing the median and the 95th percentile read latency (microseconds) and the file size (MB) of each format
+        Prints the results
+
+    """
+
+    clips = synthetic_clips(num_clips=num_clips, num_features=num_features, seed=seed)
+    indices = np.random.RandomState(seed).randint(0, num_clips, size=num_reads)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp_path:
+        file_paths = write_formats(path=temp_path, clips=clips, num_features=num_features, formats=formats)
+
+        for data_format, file_path in file_paths.items():
+            latencies = np.zeros(num_reads)
+
+            if data_format == 'raw':
+                data, offsets = open_raw(file_path=file_path)
+
+                for num_read, index in enumerate(indices):
+                    start = time.perf_counter()
+                    data[offsets[index]:offsets[index + 1]].sum()
+                    latencies[num_read] = time.perf_counter() - start
+
+                del data
+            else:
+                with h5py.File(name=file_path, mode='r') as h5_file:
+                    for num_read, index in enumerate(indices):
+                        start = time.perf_counter()
+                        read_clip(h5_file=h5_file, name='Features', index=index).sum()
+                        latencies[num_read] = time.perf_counter() - start
+
+            size = os.path.getsize(file_path) / 2 ** 20
+            results[data_format] = {'median': 1e6 * float(np.median(latencies)), 'p95': 1e6 * float(np.percentile(latencies, 95)), 'size': size}
+
+            print('{:>10}: {:8.1f} us median, {:8.1f} us p95, {:7.1f} MB'.format(data_format, results[data_format]['median'], results[data_format]['p95'], size))
+
+    return results
+
+
+def benchmark_access_patterns(num_clips=200, num_features=129, maximum=3000, layouts=('padded', 'ragged', 'clip_major'), cache_sizes=(None, 16 * 2 ** 20), seed=0):
+    """
+    This function is for measuring the time of reading all audio files of a batch file once (an epoch), in sequential and in random (shuffled) order,
+    for multiple storage forms and HDF5 chunk cache sizes. The padded files are padded to maximum, as when padded to the longest audio file of the entire dataset.
+
+    Parameters:
+        num_clips (int): Integer variable containing the number of audio files in the batch file
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, 13 for the MFCC)
+        maximum (int): Integer variable containing the padding length of the 'padded' and 'clip_major' files
+        layouts (tuple): Tuple variable containing the storage forms to be measured ('padded', 'ragged', 'clip_major', see utils.storage)
+        cache_sizes (tuple): Tuple variable containing the chunk cache sizes (in bytes) to be measured (None is the HDF5 default of 1 MB)
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        results (dict): Dictionary containing the sequential and random epoch times (ms) of each (layout, cache size) pair
+        Prints the results
+
+    """
+
+    clips = synthetic_clips(num_clips=num_clips, num_features=num_features, seed=seed)
+    orders = {'sequential': np.arange(num_clips), 'random': np.random.RandomState(seed).permutation(num_clips)}
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp_path:
+        for layout in layouts:
+            file_path = temp_path + os.sep + layout + '.h5'
+
+            with h5py.File(name=file_path, mode='w', libver='latest') as h5_file:
+                if layout == 'padded':
+                    write_padded(h5_file=h5_file, name='Features', clips=clips, num_features=num_features, maximum=maximum)
+                elif layout == 'clip_major':
+                    write_clip_major(h5_file=h5_file, name='Features', clips=clips, num_features=num_features, maximum=maximum)
+                else:
+                    write_ragged(h5_file=h5_file, name='Features', clips=clips, num_features=num_features)
+
+            for cache_size in cache_sizes:
+                result = {}
+
+                for pattern, order in orders.items():
+                    with h5py.File(name=file_path, mode='r', rdcc_nbytes=cache_size) as h5_file:
+                        start = time.perf_counter()
+
+                        for index in order:
+                            read_clip(h5_file=h5_file, name='Features', index=index).sum()
+
+                        result[pattern] = 1000 * (time.perf_counter() - start)
+
+                results[(layout, cache_size)] = result
+
+                print('{:>10}, cache {:>5.0f} MB: {:8.1f} ms sequential, {:8.1f} ms random'.format(layout, (cache_size or 2 ** 20) / 2 ** 20, result['sequential'], result['random']))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_clip_reads()
+    benchmark_access_patterns()
@@ -0,0 +1,84 @@
+"""
+Benchmarks for the streaming (chunked) speech recognition on the CPU
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import time
+import numpy as np
+import tensorflow as tf
+from learning.models import streaming_gru
+from learning.streaming import to_stateful, start_stream, stream_chunk, finish_stream
+from benchmarks.features import synthetic_audio
+
+
+def benchmark_streaming(duration=10.0, chunk_duration=0.1, sampling_rate=16000, num_coeff=13, lstm_units=128, weights=None):
+    """
+    This function is for measuring the first-token latency and the real-time factor of the streaming transcription on the CPU.
+    The audio is fed as fast as the transcription allows, the latency of each chunk is the audio time at which it was complete plus the time it took to process it.
+
+    Parameters:
+        duration (float): Float variable containing the duration (in seconds) of the audio stream
+        chunk_duration (float): Float variable containing the duration (in seconds) of each audio chunk
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients
+        lstm_units (int): Integer variable to determine the size of the GRU layers
+        weights (string): String variable containing the path to the trained weights of the stateless streaming_gru model (default is None, which uses randomly initialized weights)
+
+    Returns:
+        results (dict): Dictionary containing the first-token latency (ms), the mean and maximum processing time of a chunk (ms) and the real-time factor
+        Prints the results
+
+    """
+
+    with tf.device('/CPU:0'):
+        model = streaming_gru(num_features=num_coeff, lstm_units=lstm_units)
+
+        if weights is not None:
+            model.load_weights(weights)
+
+        stateful_model = to_stateful(model=model)
+
+        audio = synthetic_audio(num_files=1, sampling_rate=sampling_rate, min_duration=duration, max_duration=duration)[0]
+        chunk_size = int(chunk_duration * sampling_rate)
+
+        # warm-up, so the first chunk does not include the tracing of the model
+        state = start_stream(model=stateful_model, sampling_rate=sampling_rate, num_coeff=num_coeff)
+        for start in range(0, sampling_rate, chunk_size):
+            stream_chunk(state=state, audio_chunk=audio[start:start + chunk_size])
+
+        state = start_stream(model=stateful_model, sampling_rate=sampling_rate, num_coeff=num_coeff)
+        chunk_times = []
+        first_token = None
+
+        for start in range(0, len(audio), chunk_size):
+            begin = time.perf_counter()
+            stream_chunk(state=state, audio_chunk=audio[start:start + chunk_size])
+            chunk_times.append(time.perf_counter() - begin)
+
+            if first_token is None and state['outputs'] > 0:
+                first_token = (min(start + chunk_size, len(audio)) / sampling_rate + chunk_times[-1]) * 1000
+
+        begin = time.perf_counter()
+        finish_stream(state=state)
+        chunk_times.append(time.perf_counter() - begin)
+
+    results = {'first_token': first_token, 'mean_chunk': 1000 * float(np.mean(chunk_times)), 'max_chunk': 1000 * float(np.max(chunk_times)),
+               'real_time_factor': sum(chunk_times) / (len(audio) / sampling_rate)}
+
+    print('Chunk duration: {:.0f} ms'.format(chunk_duration * 1000))
+    print('First-token latency: {:.1f} ms'.format(results['first_token']))
+    print('Chunk processing time: {:.2f} ms mean, {:.2f} ms max'.format(results['mean_chunk'], results['max_chunk']))
+    print('Real-time factor: {:.3f}'.format(results['real_time_factor']))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_streaming()
@@ -0,0 +1,66 @@
+"""
+Functions for generating a synthetic dataset, used for benchmarking
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import numpy as np
+import soundfile as sf
+from utils.utils import increment_batch, reset_batch, increment_file, reset_file
+
+
+def generate_corpus(path, num_folders=2, num_batches=3, num_files=20, sampling_rate=16000, min_duration=1.0, max_duration=10.0, seed=0):
+    """
+    This function is for generating a synthetic dataset of random noise audio files, with the same folder structure and naming convention as the real dataset.
+
+    Parameters:
+        path (string): String variable containing the path to the (new) main data folder
+        num_folders (int): Integer variable containing the number of folders to be generated
+        num_batches (int): Integer variable containing the number of batch folders to be generated in each folder
+        num_files (int): Integer variable containing the number of audio files to be generated in each batch folder
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        min_duration (float): Float variable containing the duration (in seconds) of the shortest possible audio file
+        max_duration (float): Float variable containing the duration (in seconds) of the longest possible audio file
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        Creates the folders, batch folders, .wav files and -trans.txt transcript files in the main data folder
+
+    """
+
+    random = np.random.RandomState(seed)
+    letters = 'АБВГДЃЕЖЗЅИЈКЛЉМНЊОПРСТЌУФХЦЧЏШ'
+
+    for num_folder in range(1, num_folders + 1):
+        folder = str(num_folder)
+        batch = reset_batch()
+
+        for _ in range(num_batches):
+            batch_path = path + os.sep + folder + os.sep + batch
+            os.makedirs(batch_path, exist_ok=True)
+
+            file = reset_file()
+            transcript = []
+
+            for _ in range(num_files):
+                duration = random.uniform(min_duration, max_duration)
+                audio = (0.1 * random.randn(int(duration * sampling_rate))).astype(np.float32)
+
+                sf.write(batch_path + os.sep + folder + '-' + batch + '-' + file + '.wav', audio, sampling_rate)
+
+                words = [''.join(random.choice(list(letters), size=random.randint(1, 9))) for _ in range(random.randint(1, 12))]
+                transcript.append(folder + '-' + batch + '-' + file + ' ' + ' '.join(words))
+
+                file = increment_file(file)
+
+            with open(batch_path + os.sep + folder + '-' + batch + '-trans.txt', mode='w', encoding='utf-8') as transcript_file:
+                transcript_file.write('\n'.join(transcript))
+
+            batch = increment_batch(batch)
@@ -0,0 +1,98 @@
+"""
+Micro-benchmarks for the training step of the speech recognition models
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import time
+import numpy as np
+import tensorflow as tf
+from learning.models import baseline_bilstm
+from learning.train import train_file, make_train_step
+
+
+def synthetic_batch(batch_size=8, max_length=400, num_features=13, max_label=40, seed=0):
+    """
+    This function is for generating a random minibatch of features and enumerated transcripts, with random lengths.
+
+    Parameters:
+        batch_size (int): Integer variable containing the number of samples in the minibatch
+        max_length (int): Integer variable containing the padded number of frames
+        num_features (int): Integer variable containing the number of features
+        max_label (int): Integer variable containing the padded length of the transcripts
+        seed (int): Integer variable containing the seed of the random number generator
+
+    Returns:
+        x, y, x_length, y_length (tf.Tensor): The features, labels and their lengths
+
+    """
+
+    random = np.random.RandomState(seed)
+
+    x_length = random.randint(max_length // 2, max_length + 1, size=batch_size).astype(np.int32)
+    y_length = random.randint(max_label // 2, max_label + 1, size=batch_size).astype(np.int32)
+
+    x = random.randn(batch_size, max_length, num_features).astype(np.float32)
+    y = random.randint(0, 33, size=(batch_size, max_label)).astype(np.int32)
+
+    return tf.constant(x), tf.constant(y), tf.constant(x_length), tf.constant(y_length)
+
+
+def benchmark_train_step(batch_size=8, max_length=400, num_features=13, lstm_units=64, steps=20):
+    """
+    This function is for comparing the training throughput (steps per second) of the eager training step against the compiled training step on the CPU.
+
+    Parameters:
+        batch_size (int): Integer variable containing the number of samples in the minibatch
+        max_length (int): Integer variable containing the padded number of frames
+        num_features (int): Integer variable containing the number of features
+        lstm_units (int): Integer variable to determine the size of the GRU layers
+        steps (int): Integer variable containing the number of measured steps (after one warm-up step)
+
+    Returns:
+        results (dict): Dictionary containing the steps per second of each path
+        Prints the results
+
+    """
+
+    x, y, x_length, y_length = synthetic_batch(batch_size=batch_size, max_length=max_length, num_features=num_features)
+
+    with tf.device('/CPU:0'):
+        model = baseline_bilstm(input_shape=(None, num_features), lstm_units=lstm_units)
+        optimizer = tf.keras.optimizers.Adam()
+
+        train_file(x, y, optimizer, model)
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            loss = train_file(x, y, optimizer, model)
+            print('Loss: {}'.format(loss))      # the old training loop reads the loss after every step
+        eager = steps / (time.perf_counter() - start)
+
+        train_step, loss_metric = make_train_step(model=model, optimizer=optimizer, num_features=num_features, boundaries=[max_length + 1])
+        train_step(x, y, x_length, y_length)
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            train_step(x, y, x_length, y_length)
+        print('Loss: {}'.format(float(loss_metric.result())))
+        compiled = steps / (time.perf_counter() - start)
+
+    results = {'eager': eager, 'compiled': compiled}
+
+    print()
+    print('Eager training step: {:.2f} steps/s'.format(results['eager']))
+    print('Compiled training step: {:.2f} steps/s'.format(results['compiled']))
+    print('Speedup: {:.2f}x'.format(results['compiled'] / results['eager']))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_train_step()
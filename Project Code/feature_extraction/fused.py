@@ -0,0 +1,88 @@
+"""
+Functions for fused extraction of multiple feature types from a single decode and a single power spectrum of each audio file
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+from feature_extraction.stft import batch_spectrogram, split_segments
+from feature_extraction.mel import batch_power_spectrum, log_mel_energy, mel_to_mfcc, batch_delta
+from preprocessing.spectral import normalize_segments, segment_statistics
+from utils.index import spectrogram_length
+
+
+def batch_features(audio_list, sampling_rate, features=('spectrogram', 'mfcc'), num_coeff=13, num_filters=26, normalization=True, clip_statistics=False):
+    """
+    This function is for generating multiple feature types of multiple audio files at once.
+    The filterbank, MFCC and delta features are all derived from a single power spectrum (the framing of python_speech_features.mfcc, see feature_extraction.mel),
+    the spectrogram keeps its own framing (the defaults of scipy.signal.spectrogram, see feature_extraction.stft), so its features stay equal to generate_spectrogram.
+    Each feature type is equal (within floating point tolerance) to generating it alone.
+
+    Parameters:
+        audio_list (list): List variable containing the NumPy arrays of the raw audio signals
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        features (tuple): Tuple variable containing any of the feature types: 'spectrogram' (log-power spectrogram), 'fbank' (log mel filterbank energies),
+                          'mfcc' (mel-frequency cepstral coefficients), 'delta' (delta and delta-delta of the MFCC, before normalization)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients
+        num_filters (int): Integer variable containing the number of filters in the mel filterbank
+        normalization (bool): Boolean variable to determine whether to normalize the features of each audio file
+        clip_statistics (bool): Boolean variable to determine whether to calculate the per-feature mean and standard deviation of each audio file (before normalization)
+
+    Returns:
+        clips (dict): Dictionary containing the list of 2D NumPy arrays of features of each audio file, for each feature type (axis 0 ==> data through time; axis 1 ==> features)
+        statistics (dict): Dictionary containing the (mean, std) 2D NumPy arrays of each feature type (axis 0 ==> audio files; axis 1 ==> features), empty unless clip_statistics is set
+
+    """
+
+    for feature in features:
+        if feature not in ('spectrogram', 'fbank', 'mfcc', 'delta'):
+            raise ValueError('Wrong input for features argument! Possible inputs: \'spectrogram\', \'fbank\', \'mfcc\', \'delta\'')
+
+    data = {}
+
+    if 'spectrogram' in features:
+        lengths = np.array([spectrogram_length(num_samples=len(audio)) for audio in audio_list], dtype=np.int64)
+        data['spectrogram'] = (np.empty((int(lengths.sum()), 129), dtype=np.float32), lengths)
+
+        batch_spectrogram(audio_list=audio_list, sampling_rate=sampling_rate, normalization=False, out=data['spectrogram'][0])
+
+    if set(features) & {'fbank', 'mfcc', 'delta'}:
+        power, lengths = batch_power_spectrum(audio_list=audio_list, sampling_rate=sampling_rate)
+        mel_energy = log_mel_energy(power=power, sampling_rate=sampling_rate, num_filters=num_filters)
+
+        if 'mfcc' in features or 'delta' in features:
+            mfcc = mel_to_mfcc(mel_energy=mel_energy, power=power, num_coeff=num_coeff)
+
+            if 'delta' in features:
+                delta = batch_delta(data=mfcc, lengths=lengths)
+                data['delta'] = (np.concatenate([delta, batch_delta(data=delta, lengths=lengths)], axis=1), lengths)
+
+            if 'mfcc' in features:
+                data['mfcc'] = (mfcc, lengths)
+
+        if 'fbank' in features:
+            data['fbank'] = (mel_energy, lengths)
+
+        del power
+
+    clips = {}
+    statistics = {}
+
+    for feature in features:
+        feature_data, lengths = data[feature]
+
+        if clip_statistics:
+            statistics[feature] = segment_statistics(data=feature_data, lengths=lengths)
+
+        if normalization:
+            normalize_segments(data=feature_data, lengths=lengths)
+
+        clips[feature] = split_segments(data=feature_data, lengths=lengths)
+
+    return clips, statistics
@@ -0,0 +1,297 @@
+"""
+Functions for batched mel-frequency cepstral coefficient based feature extraction
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import as_strided
+from scipy import fft
+from preprocessing.spectral import normalize_segments
+from feature_extraction.stft import split_segments
+
+
+def hz_to_mel(hz):
+    """
+    This function is for converting a frequency from Hertz to Mels.
+
+    Parameters:
+        hz (float or np.ndarray): The frequency (or NumPy array of frequencies) in Hertz
+
+    Returns:
+        mel (float or np.ndarray): The frequency (or NumPy array of frequencies) in Mels
+
+    """
+
+    return 2595 * np.log10(1 + hz / 700.)
+
+
+def mel_to_hz(mel):
+    """
+    This function is for converting a frequency from Mels to Hertz.
+
+    Parameters:
+        mel (float or np.ndarray): The frequency (or NumPy array of frequencies) in Mels
+
+    Returns:
+        hz (float or np.ndarray): The frequency (or NumPy array of frequencies) in Hertz
+
+    """
+
+    return 700 * (10 ** (mel / 2595.0) - 1)
+
+
+@lru_cache(maxsize=None)
+def get_filterbank(sampling_rate, nfft, num_filters=26):
+    """
+    This function is for generating (and caching) the matrix of triangular mel filters, equal to python_speech_features.get_filterbanks (with lowfreq=0 and highfreq=sampling_rate/2).
+
+    Parameters:
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        nfft (int): Integer variable containing the FFT size
+        num_filters (int): Integer variable containing the number of filters in the filterbank
+
+    Returns:
+        filterbank (np.ndarray): 2D NumPy array (read-only, shared between calls) containing the filters (axis 0 ==> FFT bins; axis 1 ==> filters), to be applied by right-multiplication
+
+    """
+
+    mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sampling_rate / 2), num_filters + 2)
+    bins = np.floor((nfft + 1) * mel_to_hz(mel_points) / sampling_rate)
+
+    index = np.arange(nfft // 2 + 1)[:, None]
+    left, center, right = bins[None, :-2], bins[None, 1:-1], bins[None, 2:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = np.where((index >= left) & (index < center), (index - left) / (center - left), 0.)
+        falling = np.where((index >= center) & (index < right), (right - index) / (right - center), 0.)
+
+    filterbank = (rising + falling).astype(np.float32)
+    filterbank.setflags(write=False)
+
+    return filterbank
+
+
+@lru_cache(maxsize=None)
+def get_dct(num_filters, num_coeff, ceplifter=22):
+    """
+    This function is for generating (and caching) the matrix of the orthonormal type-II discrete cosine transform, with the cepstral lifter already applied to it.
+
+    Parameters:
+        num_filters (int): Integer variable containing the number of filters in the filterbank (size of the DCT input)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients to be kept
+        ceplifter (int): Integer variable containing the liftering coefficient (0 disables the lifter)
+
+    Returns:
+        dct (np.ndarray): 2D NumPy array (read-only, shared between calls) containing the transform (axis 0 ==> filters; axis 1 ==> coefficients), to be applied by right-multiplication
+
+    """
+
+    n = np.arange(num_filters)[:, None]
+    k = np.arange(num_coeff)[None, :]
+
+    dct = np.cos(np.pi * k * (2 * n + 1) / (2 * num_filters)) * np.sqrt(2.0 / num_filters)
+    dct[:, 0] = dct[:, 0] / np.sqrt(2)
+
+    if ceplifter > 0:
+        dct = dct * (1 + (ceplifter / 2.) * np.sin(np.pi * k / ceplifter))
+
+    dct = dct.astype(np.float32)
+    dct.setflags(write=False)
+
+    return dct
+
+
+def frame_preemphasized(audio_list, frame_length, frame_step, preemph, width=None):
+    """
+    This function is for applying pre-emphasis to multiple audio signals and splitting them into overlapping frames, all stacked into a single 2D array.
+    The framing is equal to python_speech_features.sigproc.framesig (the last frame of each signal is zero-padded, every signal has at least one frame).
+
+    Parameters:
+        audio_list (list): List variable containing the NumPy arrays of the raw audio signals
+        frame_length (int): Integer variable containing the length of each frame
+        frame_step (int): Integer variable containing the number of samples between the beginnings of two neighbouring frames
+        preemph (float): Float variable containing the pre-emphasis filter coefficient (0 disables the filter)
+        width (int): Integer variable containing the size of axis 1 of the output array, the samples after frame_length are zeros (default is None, which is frame_length)
+                     Passing the FFT size avoids another zero-padded copy of all frames inside the FFT
+
+    Returns:
+        frames (np.ndarray): 2D NumPy array containing the frames of all audio signals (axis 0 ==> frames of all signals through time; axis 1 ==> samples)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio signal
+
+    """
+
+    lengths = np.array([1 if len(audio) <= frame_length else 1 + int(np.ceil((len(audio) - frame_length) / frame_step)) for audio in audio_list], dtype=np.int64)
+    frames = np.empty((int(lengths.sum()), max(width or frame_length, frame_length)), dtype=np.float32)
+    frames[:, frame_length:] = 0
+
+    buffer = np.zeros((int(lengths.max(initial=1)) - 1) * frame_step + frame_length, dtype=np.float32)
+
+    offset = 0
+    for audio, length in zip(audio_list, lengths):
+        padded_length = (length - 1) * frame_step + frame_length
+        padded = buffer[:padded_length]
+        padded[len(audio):] = 0
+
+        if len(audio):
+            padded[0] = audio[0]
+            np.multiply(audio[:-1], -preemph, out=padded[1:len(audio)])
+            padded[1:len(audio)] += audio[1:]
+
+        frames[offset:offset + length, :frame_length] = as_strided(padded, shape=(length, frame_length), strides=(padded.strides[0] * frame_step, padded.strides[0]), writeable=False)
+        offset = offset + length
+
+    return frames, lengths
+
+
+def batch_power_spectrum(audio_list, sampling_rate, winlen=0.025, winstep=0.01, nfft=512, preemph=0.97):
+    """
+    This function is for generating the power spectrum of the pre-emphasized frames of multiple audio files at once (the shared first step of the MFCC and filterbank features).
+    All frames of all audio files go through a single batched rFFT.
+
+    Parameters:
+        audio_list (list): List variable containing the NumPy arrays of the raw audio signals
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        winlen (float): Float variable containing the length of each frame in seconds
+        winstep (float): Float variable containing the step between neighbouring frames in seconds
+        nfft (int): Integer variable containing the FFT size
+        preemph (float): Float variable containing the pre-emphasis filter coefficient (0 disables the filter)
+
+    Returns:
+        power (np.ndarray): 2D NumPy array containing the power spectrum of all frames (axis 0 ==> frames of all audio files through time; axis 1 ==> FFT bins)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+
+    """
+
+    frame_length = int(np.floor(winlen * sampling_rate + 0.5))
+    frame_step = int(np.floor(winstep * sampling_rate + 0.5))
+
+    frames, lengths = frame_preemphasized(audio_list=audio_list, frame_length=frame_length, frame_step=frame_step, preemph=preemph, width=nfft)
+
+    power = np.abs(fft.rfft(frames, n=nfft, axis=1, overwrite_x=True))
+    del frames
+
+    power *= power
+    power *= 1.0 / nfft
+
+    return power, lengths
+
+
+def log_mel_energy(power, sampling_rate, nfft=512, num_filters=26):
+    """
+    This function is for applying the mel filterbank to a power spectrum and taking the logarithm, equal to python_speech_features.logfbank.
+
+    Parameters:
+        power (np.ndarray): 2D NumPy array containing the power spectrum of all frames (see batch_power_spectrum)
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        nfft (int): Integer variable containing the FFT size
+        num_filters (int): Integer variable containing the number of filters in the filterbank
+
+    Returns:
+        mel_energy (np.ndarray): 2D NumPy array containing the log mel filterbank energies of all frames (axis 0 ==> frames; axis 1 ==> filters)
+
+    """
+
+    mel_energy = power @ get_filterbank(sampling_rate, nfft, num_filters)
+
+    mel_energy[mel_energy == 0] = np.finfo(float).eps
+    np.log(mel_energy, out=mel_energy)
+
+    return mel_energy
+
+
+def mel_to_mfcc(mel_energy, power, num_coeff=13, ceplifter=22):
+    """
+    This function is for generating the mel-frequency cepstral coefficients from the log mel filterbank energies, the first coefficient is replaced with the log of the frame energy.
+
+    Parameters:
+        mel_energy (np.ndarray): 2D NumPy array containing the log mel filterbank energies of all frames (see log_mel_energy)
+        power (np.ndarray): 2D NumPy array containing the power spectrum of all frames, from which the frame energy is calculated (see batch_power_spectrum)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients to be generated (number of features)
+        ceplifter (int): Integer variable containing the liftering coefficient (0 disables the lifter)
+
+    Returns:
+        data (np.ndarray): 2D NumPy array containing the MFCC features of all frames (axis 0 ==> frames; axis 1 ==> mel-frequency cepstral coefficients)
+
+    """
+
+    energy = power.sum(axis=1)
+    energy[energy == 0] = np.finfo(float).eps
+
+    data = mel_energy @ get_dct(mel_energy.shape[1], num_coeff, ceplifter)
+    data[:, 0] = np.log(energy)
+
+    return data
+
+
+def batch_delta(data, lengths, window=2):
+    """
+    This function is for calculating the delta (differential) features of multiple audio files stored one after another (through time) in a single array.
+    Each audio file is processed separately, equal to calling python_speech_features.delta on each of them (the first and last frames are repeated at the edges).
+
+    Parameters:
+        data (np.ndarray): 2D NumPy array containing the concatenated features of multiple audio files (axis 0 ==> data through time; axis 1 ==> features)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+        window (int): Integer variable containing the number of neighbouring frames on each side used for the delta
+
+    Returns:
+        delta (np.ndarray): 2D NumPy array containing the delta features, of the same shape as data
+
+    """
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    first = np.repeat(offsets[:-1], lengths)
+    last = np.repeat(offsets[1:] - 1, lengths)
+    frames = np.arange(len(data))
+
+    delta = np.zeros_like(data)
+
+    for step in range(1, window + 1):
+        delta += step * (data[np.minimum(frames + step, last)] - data[np.maximum(frames - step, first)])
+
+    delta *= 1.0 / (2 * sum([step ** 2 for step in range(1, window + 1)]))
+
+    return delta
+
+
+def batch_mfcc(audio_list, sampling_rate, num_coeff=13, winlen=0.025, winstep=0.01, num_filters=26, nfft=512, preemph=0.97, ceplifter=22, normalization=True):
+    """
+    This function is for generating the mel-frequency cepstral coefficients of multiple audio files at once.
+    The output is equal (within floating point tolerance) to calling python_speech_features.mfcc followed by preprocessing.spectral.normalize on each audio file.
+    All frames of all audio files go through a single batched rFFT and the cached filterbank and DCT matrices are applied as single matrix multiplications.
+
+    Parameters:
+        audio_list (list): List variable containing the NumPy arrays of the raw audio signals
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients to be generated (number of features)
+        winlen (float): Float variable containing the length of each frame in seconds
+        winstep (float): Float variable containing the step between neighbouring frames in seconds
+        num_filters (int): Integer variable containing the number of filters in the filterbank
+        nfft (int): Integer variable containing the FFT size
+        preemph (float): Float variable containing the pre-emphasis filter coefficient (0 disables the filter)
+        ceplifter (int): Integer variable containing the liftering coefficient (0 disables the lifter)
+        normalization (bool): Boolean variable to determine whether to normalize the coefficients of each audio file
+
+    Returns:
+        clips (list): List variable containing the 2D NumPy arrays of the MFCC features of each audio file (axis 0 ==> data through time; axis 1 ==> mel-frequency cepstral coefficients)
+
+    """
+
+    power, lengths = batch_power_spectrum(audio_list=audio_list, sampling_rate=sampling_rate, winlen=winlen, winstep=winstep, nfft=nfft, preemph=preemph)
+
+    data = mel_to_mfcc(mel_energy=log_mel_energy(power=power, sampling_rate=sampling_rate, nfft=nfft, num_filters=num_filters), power=power, num_coeff=num_coeff, ceplifter=ceplifter)
+    del power
+
+    if normalization:
+        normalize_segments(data=data, lengths=lengths)
+
+    return split_segments(data=data, lengths=lengths)
@@ -11,164 +11,600 @@ Author:
 """
 
 import os
-import librosa as lb
+import time
 import numpy as np
 import h5py
+from functools import partial
 from scipy import signal
-from python_speech_features import mfcc
-from utils.data import find_maximum_all, count_files_batch
-from preprocessing.spectral import normalize, padding
-
-
-def generate_spectrogram(path, sampling_rate, verbose=False):
+from utils.storage import FEATURE_NAMES, write_ragged, write_padded, write_clip_major, resize_padded
+from utils.parallel import list_batches, run_batches
+from utils.data import find_maximum_all
+from utils.manifest import manifest_clips
+from utils.audio_cache import load_audio
+from utils.index import spectrogram_length, mfcc_length
+from utils.cache import batch_cache_key, read_cache_key, write_cache_key, cached_maximum, print_cache_report
+from feature_extraction.stft import batch_spectrogram as batch_stft_spectrogram
+from feature_extraction.mel import batch_mfcc as batch_mel_mfcc
+from feature_extraction.fused import batch_features
+from feature_extraction.writer import write_batch_async, print_writer_report
+from preprocessing.spectral import normalize
+from preprocessing.statistics import write_batch_statistics, compute_statistics, apply_statistics_all
+
+
+def generate_spectrogram(path, sampling_rate, storage='padded', normalization='utterance', workers=1, manifest=None, cache=True, audio_cache=None, async_write=True, verbose=False):
     """
     This function is for generating the frequency spectrogram for each audio file in each individual batch folder.
+    Each audio file is loaded and processed only once, the padding length is calculated beforehand from the headers of the audio files (see utils.index).
 
     Parameters:
         path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
         sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine whether to zero-pad all audio files to the length of the longest one in the dataset, or to store them concatenated through time without padding, or to zero-pad them in clip-major order with chunks of the typical audio file length
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine whether to normalize the features of each audio file with its own mean and standard deviation,
+                                or each feature with its mean and standard deviation over the entire dataset (see preprocessing.statistics), or not to normalize the features
+        workers (int): Integer variable containing the number of worker processes, each processing a whole batch folder at a time (default is 1; None uses all available cores)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to skip the batch folders whose audio files and feature parameters did not change since their .h5 file was written (see utils.cache)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache, shared with the other features (default is None, which decodes the audio files without caching, see utils.audio_cache)
+        async_write (bool): Boolean variable to determine whether to write the .h5 files on a background thread while the features are generated (see feature_extraction.writer)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
         Creates a .h5 file of the NumPy arrays containing the generated spectrogram in the corresponding batch folder
+        When using 'padded' storage:
         Axis 0 represents the data through time
         Axis 1 represents the frequency
         Axis 2 represents the multiple individual audio files
+        When using 'ragged' or 'clip_major' storage, see utils.storage.write_ragged and utils.storage.write_clip_major
 
     """
 
-    folder_list = os.listdir(path)
+    if storage not in ('padded', 'ragged', 'clip_major'):
+        raise ValueError('Wrong input for storage argument! Possible inputs: \'padded\', \'ragged\', \'clip_major\'')
+
+    if normalization not in ('utterance', 'global', 'none'):
+        raise ValueError('Wrong input for normalization argument! Possible inputs: \'utterance\', \'global\', \'none\'')
+
+    batch_list = list_batches(path=path, manifest=manifest)
 
     if verbose:
         print('Generating Spectrogram...')
         print()
 
-    maximum = find_maximum_all(path=path, sampling_rate=sampling_rate, method='spectrogram', verbose=True)      # current maximum is 6971 (19.03.2020)
-
-    for folder in folder_list:
-        if verbose:
-            print('Loading folder', folder, '...')
-
-        batch_list = sorted(os.listdir(path + os.sep + folder))
-
-        for batch in batch_list:
-            if verbose:
-                print('Loading batch', batch, '...')
-
-            count = count_files_batch(path=path + os.sep + folder + os.sep + batch)
-
-            h5_file = h5py.File(name=path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-spectrogram.h5', mode='w', libver='latest')
-
-            batch_spectrogram = h5_file.create_dataset(name='Spectrogram', shape=(maximum, 129, count), chunks=(maximum, 129, 1), dtype=np.float32, compression='lzf')
-
-            file_list = sorted(os.listdir(path + os.sep + folder + os.sep + batch))
-            num_file = 0
-
-            for file in file_list:
-                if not file.endswith('.wav'):
-                    continue
+    maximum = find_maximum_all(path=path, sampling_rate=sampling_rate, method='spectrogram', workers=workers, manifest=manifest) if storage != 'ragged' else None
 
-                audio, _ = lb.load(path + os.sep + folder + os.sep + batch + os.sep + file, sr=sampling_rate)
+    tasks = [{'path': path, 'folder': folder, 'batch': batch, 'sampling_rate': sampling_rate, 'storage': storage, 'normalization': normalization, 'maximum': maximum, 'manifest': manifest, 'cache': cache, 'audio_cache': audio_cache, 'async_write': async_write} for folder, batch in batch_list]
+    results = run_batches(function=spectrogram_batch, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
 
-                _, _, spectrogram_data = signal.spectrogram(x=audio, fs=sampling_rate)
+    if storage != 'ragged' and max([batch_maximum for _, batch_maximum, _, _ in results], default=0) > maximum:
+        maximum = max([batch_maximum for _, batch_maximum, _, _ in results])
 
-                with np.errstate(divide='ignore'):
-                    spectrogram_data = np.swapaxes(10*np.log10(spectrogram_data), 0, 1)
-                    spectrogram_data[np.isneginf(spectrogram_data)] = 0.0
+        for h5_path, _, _, _ in results:
+            resize_padded(file_path=h5_path, name='Spectrogram', maximum=maximum)
 
-                spectrogram_data = normalize(spectrogram_data)
-                spectrogram_data = padding(spectrogram_data, maximum)
+    if cache and verbose:
+        print_cache_report(results)
 
-                batch_spectrogram[:, :, num_file] = spectrogram_data
+    written = [h5_path for h5_path, _, hit, _ in results if not hit]
 
-                num_file = num_file + 1
+    if async_write and verbose and written:
+        print_writer_report(written)
 
-            h5_file.close()
+    # the statistics of each batch are stored in its .h5 file during the generation, so they are only merged here
+    if normalization != 'utterance':
+        compute_statistics(path=path, method='spectrogram', workers=workers, manifest=manifest)
 
-            if verbose:
-                print('Batch', batch, 'done!')
-                print()
+    if normalization == 'global':
+        apply_statistics_all(path=path, method='spectrogram', workers=workers, manifest=manifest)
 
-        if verbose:
-            print('Folder', folder, 'done!')
-            print()
+    if storage != 'ragged' and verbose:
+        print()
+        print('Maximum:', maximum)      # maximum was 6971 (19.03.2020)
 
     if verbose:
+        print()
         print('Generation Successful!')
         print()
 
 
-def generate_mfcc(path, sampling_rate, num_coeff, verbose=False):
+def generate_mfcc(path, sampling_rate, num_coeff, storage='padded', normalization='utterance', workers=1, manifest=None, cache=True, audio_cache=None, async_write=True, verbose=False):
     """
     This function is for generating the mel-frequency cepstral coefficients for each audio file for each individual batch folder.
+    Each audio file is loaded and processed only once, the padding length is calculated beforehand from the headers of the audio files (see utils.index).
 
     Parameters:
         path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
         sampling_rate (int): Integer variable containing the sampling rate of the audio(ex: 16kHz ==> sampling_rate = 16000)
         num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients to be generated (number of features)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine whether to zero-pad all audio files to the length of the longest one in the dataset, or to store them concatenated through time without padding, or to zero-pad them in clip-major order with chunks of the typical audio file length
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine whether to normalize the features of each audio file with its own mean and standard deviation,
+                                or each feature with its mean and standard deviation over the entire dataset (see preprocessing.statistics), or not to normalize the features
+        workers (int): Integer variable containing the number of worker processes, each processing a whole batch folder at a time (default is 1; None uses all available cores)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to skip the batch folders whose audio files and feature parameters did not change since their .h5 file was written (see utils.cache)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache, shared with the other features (default is None, which decodes the audio files without caching, see utils.audio_cache)
+        async_write (bool): Boolean variable to determine whether to write the .h5 files on a background thread while the features are generated (see feature_extraction.writer)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
         Creates a .h5 file of the numpy arrays containing the generated MFCCs in the corresponding batch folder
+        When using 'padded' storage:
         Axis 0 represents the generated data through time
         Axis 1 represents the mel-frequency cepstral coefficients
         Axis 2 represents the multiple individual audio files
+        When using 'ragged' or 'clip_major' storage, see utils.storage.write_ragged and utils.storage.write_clip_major
 
     """
 
-    folder_list = os.listdir(path)
+    if storage not in ('padded', 'ragged', 'clip_major'):
+        raise ValueError('Wrong input for storage argument! Possible inputs: \'padded\', \'ragged\', \'clip_major\'')
+
+    if normalization not in ('utterance', 'global', 'none'):
+        raise ValueError('Wrong input for normalization argument! Possible inputs: \'utterance\', \'global\', \'none\'')
+
+    batch_list = list_batches(path=path, manifest=manifest)
 
     if verbose:
         print('Generating MFCC...')
         print()
 
-    # maximum = find_maximum_all(path=path, sampling_rate=sampling_rate,  method='mfcc', num_coeff=num_coeff)     # current maximum is 9759 (19.03.2020)
-    maximum = 9759
+    maximum = find_maximum_all(path=path, sampling_rate=sampling_rate, method='mfcc', workers=workers, manifest=manifest) if storage != 'ragged' else None
+
+    tasks = [{'path': path, 'folder': folder, 'batch': batch, 'sampling_rate': sampling_rate, 'num_coeff': num_coeff, 'storage': storage, 'normalization': normalization, 'maximum': maximum, 'manifest': manifest, 'cache': cache, 'audio_cache': audio_cache, 'async_write': async_write} for folder, batch in batch_list]
+    results = run_batches(function=mfcc_batch, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
+
+    if storage != 'ragged' and max([batch_maximum for _, batch_maximum, _, _ in results], default=0) > maximum:
+        maximum = max([batch_maximum for _, batch_maximum, _, _ in results])
+
+        for h5_path, _, _, _ in results:
+            resize_padded(file_path=h5_path, name='MFCC', maximum=maximum)
+
+    if cache and verbose:
+        print_cache_report(results)
+
+    written = [h5_path for h5_path, _, hit, _ in results if not hit]
+
+    if async_write and verbose and written:
+        print_writer_report(written)
+
+    # the statistics of each batch are stored in its .h5 file during the generation, so they are only merged here
+    if normalization != 'utterance':
+        compute_statistics(path=path, method='mfcc', workers=workers, manifest=manifest)
+
+    if normalization == 'global':
+        apply_statistics_all(path=path, method='mfcc', workers=workers, manifest=manifest)
+
+    if storage != 'ragged' and verbose:
+        print()
+        print('Maximum:', maximum)      # maximum was 9759 (19.03.2020)
+
+    if verbose:
+        print()
+        print('Generation Successful!')
+        print()
 
-    for folder in folder_list:
-        if verbose:
-            print('Loading folder', folder, '...')
 
-        batch_list = sorted(os.listdir(path + os.sep + folder))
+def generate_features(path, sampling_rate, features=('spectrogram', 'mfcc'), num_coeff=13, storage='padded', normalization='utterance', clip_statistics=False, workers=1, manifest=None, cache=True, audio_cache=None, verbose=False):
+    """
+    This function is for generating multiple feature types for each audio file in each individual batch folder, in a single pass over the dataset.
+    Each audio file is decoded once, and the filterbank, MFCC and delta features are derived from a single power spectrum (see feature_extraction.fused.batch_features).
+    Each feature type is written to its own .h5 file, equal to the file written by generate_spectrogram or generate_mfcc (and cached with the same key, see utils.cache).
 
-        for batch in batch_list:
-            if verbose:
-                print('Loading batch', batch, '...')
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        features (tuple): Tuple variable containing any of the feature types: 'spectrogram', 'fbank' (log mel filterbank energies), 'mfcc', 'delta' (delta and delta-delta of the MFCC)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients (of the 'mfcc' and 'delta' features)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see generate_spectrogram)
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine the normalization of the features (see generate_spectrogram)
+        clip_statistics (bool): Boolean variable to determine whether to store the per-feature mean and standard deviation of each audio file (before normalization) in the .h5 files, as the 'ClipMean' and 'ClipStd' datasets
+        workers (int): Integer variable containing the number of worker processes, each processing a whole batch folder at a time (default is 1; None uses all available cores)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to skip the feature types whose audio files and feature parameters did not change since their .h5 file was written (see utils.cache)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, which decodes the audio files without caching, see utils.audio_cache)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        Creates a .h5 file for each feature type in the corresponding batch folder, named as per agreed upon naming convention (<folder>-<batch>-<feature>.h5)
 
-            count = count_files_batch(path=path + os.sep + folder + os.sep + batch)
+    """
 
-            h5_file = h5py.File(name=path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-mfcc.h5', mode='w', libver='latest')
+    for feature in features:
+        if feature not in FEATURE_NAMES:
+            raise ValueError('Wrong input for features argument! Possible inputs: \'spectrogram\', \'fbank\', \'mfcc\', \'delta\'')
 
-            batch_mfcc = h5_file.create_dataset(name='MFCC', shape=(maximum, num_coeff, count), chunks=(maximum, num_coeff, 1), dtype=np.float32, compression='lzf')
+    if storage not in ('padded', 'ragged', 'clip_major'):
+        raise ValueError('Wrong input for storage argument! Possible inputs: \'padded\', \'ragged\', \'clip_major\'')
 
-            file_list = sorted(os.listdir(path + os.sep + folder + os.sep + batch))
-            num_file = 0
+    if normalization not in ('utterance', 'global', 'none'):
+        raise ValueError('Wrong input for normalization argument! Possible inputs: \'utterance\', \'global\', \'none\'')
 
-            for file in file_list:
-                if not file.endswith('.wav'):
-                    continue
+    batch_list = list_batches(path=path, manifest=manifest)
 
-                audio, _ = lb.load(path + os.sep + folder + os.sep + batch + os.sep + file, sr=sampling_rate)
+    if verbose:
+        print('Generating', ', '.join([FEATURE_NAMES[feature] for feature in features]) + '...')
+        print()
 
-                mfcc_data = mfcc(signal=audio, samplerate=sampling_rate, numcep=num_coeff)
+    # the filterbank and delta features have the frames of the MFCC
+    maximum = {feature: find_maximum_all(path=path, sampling_rate=sampling_rate, method='spectrogram' if feature == 'spectrogram' else 'mfcc', workers=workers, manifest=manifest)
+               for feature in features} if storage != 'ragged' else {feature: None for feature in features}
 
-                mfcc_data = normalize(mfcc_data)
-                mfcc_data = padding(mfcc_data, maximum)
+    tasks = [{'path': path, 'folder': folder, 'batch': batch, 'sampling_rate': sampling_rate, 'features': tuple(features), 'num_coeff': num_coeff, 'storage': storage, 'normalization': normalization,
+              'clip_statistics': clip_statistics, 'maximum': maximum, 'manifest': manifest, 'cache': cache, 'audio_cache': audio_cache} for folder, batch in batch_list]
+    results = run_batches(function=features_batch, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
 
-                batch_mfcc[:, :, num_file] = mfcc_data
+    for feature in features:
+        feature_results = [result[feature] for result in results]
 
-                num_file = num_file + 1
+        if storage != 'ragged' and max([batch_maximum for _, batch_maximum, _, _ in feature_results], default=0) > maximum[feature]:
+            maximum[feature] = max([batch_maximum for _, batch_maximum, _, _ in feature_results])
 
-            h5_file.close()
+            for h5_path, _, _, _ in feature_results:
+                resize_padded(file_path=h5_path, name=FEATURE_NAMES[feature], maximum=maximum[feature])
 
-            if verbose:
-                print('Batch', batch, 'done!')
-                print()
+        if cache and verbose:
+            print(FEATURE_NAMES[feature] + ':')
+            print_cache_report(feature_results)
 
-        if verbose:
-            print('Folder', folder, 'done!')
-            print()
+        if normalization != 'utterance':
+            compute_statistics(path=path, method=feature, workers=workers, manifest=manifest)
+
+        if normalization == 'global':
+            apply_statistics_all(path=path, method=feature, workers=workers, manifest=manifest)
+
+    if storage != 'ragged' and verbose:
+        print()
+        print('Maximum:', maximum)
 
     if verbose:
+        print()
         print('Generation Successful!')
         print()
+
+
+def features_batch(path, folder, batch, sampling_rate, features=('spectrogram', 'mfcc'), num_coeff=13, storage='padded', normalization='utterance', clip_statistics=False, maximum=None, manifest=None, cache=True, audio_cache=None):
+    """
+    This function is for generating multiple feature types for each audio file in a single batch folder, decoding the audio files only once.
+    Only the feature types whose .h5 file is not up to date are generated, the audio files are not decoded at all if every .h5 file is up to date.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder
+        folder (string): String variable of the name of the folder containing the batch folder
+        batch (string): String variable of the name of the batch folder
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        features (tuple): Tuple variable containing the feature types (see generate_features)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see utils.storage)
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine the normalization (the features are written without normalization unless it is 'utterance', see generate_spectrogram)
+        clip_statistics (bool): Boolean variable to determine whether to store the per-feature mean and standard deviation of each audio file in the .h5 files
+        maximum (dict): Dictionary containing the length to pad to of each feature type when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to keep the existing .h5 files whose cache key is unchanged (see utils.cache)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, see utils.audio_cache)
+
+    Returns:
+        results (dict): Dictionary containing the (h5_path, batch_maximum, hit, seconds) tuple of each feature type (see process_batch), the time of a generation is divided between the generated feature types
+
+    """
+
+    batch_path = path + os.sep + folder + os.sep + batch
+    file_list = list_batch_audio(path=batch_path, manifest=manifest)
+    maximum = maximum or {}
+
+    results = {}
+    pending = {}
+
+    for feature in features:
+        h5_path = batch_path + os.sep + folder + '-' + batch + '-' + feature + '.h5'
+        parameters = feature_parameters(method=feature, sampling_rate=sampling_rate, num_coeff=num_coeff, storage=storage, normalization=normalization, clip_statistics=clip_statistics)
+        key, stats = None, None
+
+        if cache:
+            cached_key, previous, seconds = read_cache_key(h5_path=h5_path)
+            key, stats = batch_cache_key(path=batch_path, file_list=file_list, parameters=parameters, previous=previous)
+
+            if key == cached_key:
+                batch_maximum = cached_maximum(h5_path=h5_path)
+
+                if storage != 'ragged':
+                    resize_padded(file_path=h5_path, name=FEATURE_NAMES[feature], maximum=maximum.get(feature) if maximum.get(feature) is not None else batch_maximum)
+
+                results[feature] = (h5_path, batch_maximum, True, seconds)
+                continue
+
+        pending[feature] = (h5_path, key, stats)
+
+    if not pending:
+        return results
+
+    start = time.perf_counter()
+
+    audio_list = load_audio(path=batch_path, file_list=file_list, sampling_rate=sampling_rate, audio_cache=audio_cache)
+    clips, statistics = batch_features(audio_list=audio_list, sampling_rate=sampling_rate, features=tuple(pending), num_coeff=num_coeff,
+                                       normalization=normalization == 'utterance', clip_statistics=clip_statistics)
+
+    num_features = {'spectrogram': 129, 'fbank': 26, 'mfcc': num_coeff, 'delta': 2 * num_coeff}
+    maximums = {feature: write_batch(file_path=h5_path, name=FEATURE_NAMES[feature], clips=clips[feature], num_features=num_features[feature], storage=storage,
+                                     maximum=maximum.get(feature), statistics=statistics.get(feature), normalized=normalization == 'utterance') for feature, (h5_path, _, _) in pending.items()}
+
+    seconds = (time.perf_counter() - start) / len(pending)
+
+    for feature, (h5_path, key, stats) in pending.items():
+        if cache:
+            write_cache_key(h5_path=h5_path, key=key, stats=stats, seconds=seconds)
+
+        results[feature] = (h5_path, maximums[feature], False, seconds)
+
+    return results
+
+
+def feature_parameters(method, sampling_rate, num_coeff=13, storage='padded', normalization='utterance', clip_statistics=False):
+    """
+    This function is for creating the dictionary of all parameters a feature type depends on, used as part of the cache key of its .h5 files (see utils.cache).
+
+    Parameters:
+        method (string): {'spectrogram', 'fbank', 'mfcc', 'delta'} String variable containing the feature type
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients (of the 'mfcc' and 'delta' features)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable containing the storage form
+        normalization (string): {'utterance', 'global', 'none'} String variable containing the normalization
+        clip_statistics (bool): Boolean variable to determine whether the per-feature statistics of each audio file are stored
+
+    Returns:
+        parameters (dict): Dictionary containing the parameters
+
+    """
+
+    if method == 'spectrogram':
+        parameters = {'method': method, 'sampling_rate': sampling_rate, 'nperseg': 256, 'noverlap': 32, 'window': ['tukey', 0.25]}
+    else:
+        parameters = {'method': method, 'sampling_rate': sampling_rate, 'winlen': 0.025, 'winstep': 0.01, 'num_filters': 26, 'nfft': 512, 'preemph': 0.97}
+
+        if method != 'fbank':
+            parameters.update({'num_coeff': num_coeff, 'ceplifter': 22})
+
+        if method == 'delta':
+            parameters['delta_window'] = 2
+
+    parameters.update({'normalization': True if normalization == 'utterance' else normalization, 'storage': storage})
+
+    if clip_statistics:
+        parameters['clip_statistics'] = True
+
+    return parameters
+
+
+def spectrogram_batch(path, folder, batch, sampling_rate, storage='padded', normalization='utterance', maximum=None, manifest=None, cache=True, audio_cache=None, async_write=True):
+    """
+    This function is for generating the frequency spectrogram for each audio file in a single batch folder.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder
+        folder (string): String variable of the name of the folder containing the batch folder
+        batch (string): String variable of the name of the batch folder
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see utils.storage)
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine the normalization (the features are written without normalization unless it is 'utterance', see generate_spectrogram)
+        maximum (int): The length to pad to when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to keep the existing .h5 file if its cache key is unchanged (see utils.cache)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, see utils.audio_cache)
+        async_write (bool): Boolean variable to determine whether to write the .h5 file on a background thread while the features are generated (see feature_extraction.writer)
+
+    Returns:
+        h5_path (string): The path to the created .h5 file
+        batch_maximum (int): The length of the longest audio file in the batch
+        hit (bool): Whether the existing .h5 file was kept
+        seconds (float): The time in seconds it took to generate the .h5 file (on a cache hit, the time it took when it was written, i.e. the time saved)
+
+    """
+
+    batch_path = path + os.sep + folder + os.sep + batch
+    h5_path = batch_path + os.sep + folder + '-' + batch + '-spectrogram.h5'
+
+    parameters = feature_parameters(method='spectrogram', sampling_rate=sampling_rate, storage=storage, normalization=normalization)
+
+    return process_batch(path=batch_path, h5_path=h5_path, name='Spectrogram', features=partial(batch_stft_spectrogram, sampling_rate=sampling_rate, normalization=normalization == 'utterance'), num_features=129, parameters=parameters, storage=storage, maximum=maximum, manifest=manifest, cache=cache, audio_cache=audio_cache,
+                         lengths=spectrogram_length if async_write else None)
+
+
+def mfcc_batch(path, folder, batch, sampling_rate, num_coeff, storage='padded', normalization='utterance', maximum=None, manifest=None, cache=True, audio_cache=None, async_write=True):
+    """
+    This function is for generating the mel-frequency cepstral coefficients for each audio file in a single batch folder.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder
+        folder (string): String variable of the name of the folder containing the batch folder
+        batch (string): String variable of the name of the batch folder
+        sampling_rate (int): Integer variable containing the sampling rate of the audio(ex: 16kHz ==> sampling_rate = 16000)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients to be generated (number of features)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see utils.storage)
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine the normalization (the features are written without normalization unless it is 'utterance', see generate_spectrogram)
+        maximum (int): The length to pad to when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to keep the existing .h5 file if its cache key is unchanged (see utils.cache)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, see utils.audio_cache)
+        async_write (bool): Boolean variable to determine whether to write the .h5 file on a background thread while the features are generated (see feature_extraction.writer)
+
+    Returns:
+        h5_path (string): The path to the created .h5 file
+        batch_maximum (int): The length of the longest audio file in the batch
+        hit (bool): Whether the existing .h5 file was kept
+        seconds (float): The time in seconds it took to generate the .h5 file (on a cache hit, the time it took when it was written, i.e. the time saved)
+
+    """
+
+    batch_path = path + os.sep + folder + os.sep + batch
+    h5_path = batch_path + os.sep + folder + '-' + batch + '-mfcc.h5'
+
+    parameters = feature_parameters(method='mfcc', sampling_rate=sampling_rate, num_coeff=num_coeff, storage=storage, normalization=normalization)
+
+    return process_batch(path=batch_path, h5_path=h5_path, name='MFCC', features=partial(batch_mel_mfcc, sampling_rate=sampling_rate, num_coeff=num_coeff, normalization=normalization == 'utterance'), num_features=num_coeff, parameters=parameters, storage=storage, maximum=maximum, manifest=manifest, cache=cache, audio_cache=audio_cache,
+                         lengths=partial(mfcc_length, sampling_rate=sampling_rate) if async_write else None)
+
+
+def process_batch(path, h5_path, name, features, num_features, parameters, storage='padded', maximum=None, manifest=None, cache=True, audio_cache=None, lengths=None, group_size=32):
+    """
+    This function is for generating the features of all audio files in a batch folder and writing them to a .h5 file, unless the existing .h5 file is up to date.
+    The existing file is kept when its cache key (the hashes of the audio files and the feature parameters, see utils.cache.batch_cache_key) matches, when using padded ('padded' or 'clip_major') storage it is only resized to the new padding length.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        h5_path (string): String variable containing the path to the .h5 file
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        features (callable): Function generating the list of 2D NumPy arrays of features from a list of raw audio signals (called with the audio_list keyword argument)
+        num_features (int): Integer variable containing the number of features
+        parameters (dict): Dictionary containing all parameters the features depend on, part of the cache key
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see utils.storage)
+        maximum (int): The length to pad to when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folder (default is None, see utils.manifest)
+        cache (bool): Boolean variable to determine whether to keep the existing .h5 file if its cache key is unchanged
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, see utils.audio_cache)
+        lengths (callable): Function returning the number of frames of the features from the number of samples of an audio file (see utils.index),
+                            when given the features are generated in groups of group_size audio files and written on a background thread (default is None, see feature_extraction.writer)
+        group_size (int): Integer variable containing the number of audio files generated at a time when writing on a background thread
+
+    Returns:
+        h5_path (string): The path to the .h5 file
+        batch_maximum (int): The length of the longest audio file in the batch
+        hit (bool): Whether the existing .h5 file was kept
+        seconds (float): The time in seconds it took to generate the .h5 file
+
+    """
+
+    file_list = list_batch_audio(path=path, manifest=manifest)
+
+    if cache:
+        cached_key, previous, seconds = read_cache_key(h5_path=h5_path)
+        key, stats = batch_cache_key(path=path, file_list=file_list, parameters=parameters, previous=previous)
+
+        if key == cached_key:
+            batch_maximum = cached_maximum(h5_path=h5_path)
+
+            if storage != 'ragged':
+                resize_padded(file_path=h5_path, name=name, maximum=maximum if maximum is not None else batch_maximum)
+
+            return h5_path, batch_maximum, True, seconds
+
+    start = time.perf_counter()
+
+    audio_list = load_audio(path=path, file_list=file_list, sampling_rate=parameters['sampling_rate'], audio_cache=audio_cache)
+
+    if lengths is not None:
+        groups = (features(audio_list=audio_list[first:first + group_size]) for first in range(0, len(audio_list), group_size))
+        batch_maximum = write_batch_async(file_path=h5_path, name=name, groups=groups, lengths=[lengths(len(audio)) for audio in audio_list], num_features=num_features, storage=storage, maximum=maximum,
+                                          normalized=parameters['normalization'] is True)
+    else:
+        batch_maximum = write_batch(file_path=h5_path, name=name, clips=features(audio_list=audio_list), num_features=num_features, storage=storage, maximum=maximum,
+                                    normalized=parameters['normalization'] is True)
+
+    seconds = time.perf_counter() - start
+
+    if cache:
+        write_cache_key(h5_path=h5_path, key=key, stats=stats, seconds=seconds)
+
+    return h5_path, batch_maximum, False, seconds
+
+
+def spectrogram(audio, sampling_rate):
+    """
+    This function is for generating the normalized log-power frequency spectrogram of a single audio file.
+    Used as the reference implementation, batches of audio files are processed with feature_extraction.stft.batch_spectrogram.
+
+    Parameters:
+        audio (np.ndarray): NumPy array containing the raw audio signal
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+
+    Returns:
+        spectrogram_data (np.ndarray): 2D NumPy array containing the spectrogram (axis 0 ==> data through time; axis 1 ==> frequency)
+
+    """
+
+    _, _, spectrogram_data = signal.spectrogram(x=audio, fs=sampling_rate)
+
+    with np.errstate(divide='ignore'):
+        spectrogram_data = np.swapaxes(10*np.log10(spectrogram_data), 0, 1)
+        spectrogram_data[np.isneginf(spectrogram_data)] = 0.0
+
+    return normalize(spectrogram_data)
+
+
+def list_batch_audio(path, manifest=None):
+    """
+    This function is for listing the audio files in a batch folder, in sorted order.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folder (default is None, see utils.manifest)
+
+    Returns:
+        file_list (list): List variable containing the names of the audio files
+
+    """
+
+    if manifest is not None:
+        return [clip['file'] for clip in manifest_clips(manifest=manifest, path=path)]
+
+    return [file for file in sorted(os.listdir(path)) if file.endswith('.wav')]
+
+
+def load_batch_audio(path, sampling_rate, manifest=None, audio_cache=None):
+    """
+    This function is for loading all audio files in a batch folder, in sorted order.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folder (default is None, see utils.manifest)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, which decodes the audio files without caching, see utils.audio_cache)
+
+    Returns:
+        batch_audio (list): List variable containing the NumPy arrays of the raw audio signals
+
+    """
+
+    return load_audio(path=path, file_list=list_batch_audio(path=path, manifest=manifest), sampling_rate=sampling_rate, audio_cache=audio_cache)
+
+
+def write_batch(file_path, name, clips, num_features, storage='padded', maximum=None, statistics=None, normalized=False):
+    """
+    This function is for writing the generated features of all audio files in a batch folder to a new .h5 file.
+
+    Parameters:
+        file_path (string): String variable containing the path to the .h5 file to be created
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features)
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see utils.storage)
+        maximum (int): The length to pad to when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        statistics (tuple): Tuple of the 2D NumPy arrays of the per-feature mean and standard deviation of each audio file, stored as the 'ClipMean' and 'ClipStd' datasets (default is None, which stores none)
+        normalized (bool): Boolean variable to determine whether the features are normalized per audio file ('utterance' normalization), in which case the statistics of the features
+                           are not stored and the 'normalization' attribute is set instead, so they are never merged into the statistics of the dataset (see preprocessing.statistics)
+
+    Returns:
+        batch_maximum (int): The length of the longest audio file in the batch
+
+    """
+
+    h5_file = h5py.File(name=file_path, mode='w', libver='latest')
+
+    if storage == 'padded':
+        batch_maximum = write_padded(h5_file=h5_file, name=name, clips=clips, num_features=num_features, maximum=maximum)
+    elif storage == 'clip_major':
+        batch_maximum = write_clip_major(h5_file=h5_file, name=name, clips=clips, num_features=num_features, maximum=maximum)
+    else:
+        write_ragged(h5_file=h5_file, name=name, clips=clips, num_features=num_features)
+        batch_maximum = max([len(clip) for clip in clips], default=0)
+
+    if normalized:
+        h5_file.attrs['normalization'] = 'utterance'
+    else:
+        write_batch_statistics(h5_file=h5_file, clips=clips)
+
+    if statistics is not None:
+        h5_file.create_dataset(name='ClipMean', data=statistics[0])
+        h5_file.create_dataset(name='ClipStd', data=statistics[1])
+
+    h5_file.close()
+
+    return batch_maximum
@@ -0,0 +1,150 @@
+"""
+Functions for batched short-time Fourier transform based feature extraction
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import as_strided
+from scipy import fft, signal
+from preprocessing.spectral import normalize_segments
+
+
+@lru_cache(maxsize=None)
+def get_window(window, nperseg):
+    """
+    This function is for generating (and caching) the window function applied to each frame.
+
+    Parameters:
+        window (tuple): Tuple variable containing the window specification, as accepted by scipy.signal.get_window (ex: ('tukey', 0.25))
+        nperseg (int): Integer variable containing the length of each frame
+
+    Returns:
+        window_data (np.ndarray): NumPy array containing the window function (read-only, shared between calls)
+
+    """
+
+    window_data = signal.get_window(window, nperseg).astype(np.float32)
+    window_data.setflags(write=False)
+
+    return window_data
+
+
+def frame_signals(audio_list, nperseg, step):
+    """
+    This function is for splitting multiple audio signals into overlapping frames, all stacked into a single 2D array.
+    The frames are taken as strided views of each signal, so each sample is copied only once, directly into the output array.
+
+    Parameters:
+        audio_list (list): List variable containing the NumPy arrays of the raw audio signals
+        nperseg (int): Integer variable containing the length of each frame
+        step (int): Integer variable containing the number of samples between the beginnings of two neighbouring frames
+
+    Returns:
+        frames (np.ndarray): 2D NumPy array containing the frames of all audio signals (axis 0 ==> frames of all signals through time; axis 1 ==> samples)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio signal (signals shorter than one frame have no frames)
+
+    """
+
+    lengths = np.array([(len(audio) - nperseg) // step + 1 if len(audio) >= nperseg else 0 for audio in audio_list], dtype=np.int64)
+    frames = np.empty((int(lengths.sum()), nperseg), dtype=np.float32)
+
+    offset = 0
+    for audio, length in zip(audio_list, lengths):
+        if length == 0:
+            continue
+
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        frames[offset:offset + length] = as_strided(audio, shape=(length, nperseg), strides=(audio.strides[0] * step, audio.strides[0]), writeable=False)
+        offset = offset + length
+
+    return frames, lengths
+
+
+def batch_spectrogram(audio_list, sampling_rate, nperseg=256, noverlap=None, window=('tukey', 0.25), normalization=True, out=None):
+    """
+    This function is for generating the normalized log-power frequency spectrogram of multiple audio files at once.
+    The output is equal (within floating point tolerance) to calling feature_extraction.spectral.spectrogram on each audio file, which uses the default parameters of scipy.signal.spectrogram.
+    All frames of all audio files go through a single batched rFFT, and the log, clamping and normalization are done in place on the output array.
+
+    Parameters:
+        audio_list (list): List variable containing the NumPy arrays of the raw audio signals
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        nperseg (int): Integer variable containing the length of each frame (default is 256, as in scipy.signal.spectrogram)
+        noverlap (int): Integer variable containing the number of overlapping samples between frames (default is None, which is nperseg // 8, as in scipy.signal.spectrogram)
+        window (tuple): Tuple variable containing the window specification (default is ('tukey', 0.25), as in scipy.signal.spectrogram)
+        normalization (bool): Boolean variable to determine whether to normalize the spectrogram of each audio file
+        out (np.ndarray): Preallocated 2D float32 NumPy array to write the spectrogram to, reused between calls (default is None, which allocates a new array)
+                          Must have at least as many rows as the total number of frames and exactly nperseg // 2 + 1 columns
+
+    Returns:
+        clips (list): List variable containing the 2D NumPy arrays (views into the output array) of the spectrogram of each audio file (axis 0 ==> data through time; axis 1 ==> frequency)
+
+    """
+
+    if noverlap is None:
+        noverlap = nperseg // 8
+
+    frames, lengths = frame_signals(audio_list=audio_list, nperseg=nperseg, step=nperseg - noverlap)
+    window_data = get_window(window, nperseg)
+
+    total = len(frames)
+    num_bins = nperseg // 2 + 1
+
+    if out is None:
+        out = np.empty((total, num_bins), dtype=np.float32)
+    elif out.shape[0] < total or out.shape[1] != num_bins or out.dtype != np.float32:
+        raise ValueError('Wrong shape or type of the output array! Expected a float32 array of at least ' + str(total) + ' x ' + str(num_bins))
+
+    data = out[:total]
+
+    frames -= frames.mean(axis=1, keepdims=True)
+    frames *= window_data
+
+    spectrum = fft.rfft(frames, axis=1, overwrite_x=True)
+    del frames
+
+    np.abs(spectrum, out=data)
+    del spectrum
+
+    # 10*log10(scale*|X|^2) == 20*log10(|X|) + 10*log10(scale), where the one-sided density scale also doubles all but the DC (and Nyquist) bins
+    scale = np.full(num_bins, 1.0 / (sampling_rate * float(np.sum(window_data.astype(np.float64) ** 2))))
+    scale[1:num_bins - 1 if nperseg % 2 == 0 else num_bins] *= 2
+
+    with np.errstate(divide='ignore'):
+        np.log10(data, out=data)
+
+    data *= 20
+    data += (10 * np.log10(scale)).astype(np.float32)
+    data[np.isneginf(data)] = 0.0
+
+    if normalization:
+        normalize_segments(data=data, lengths=lengths)
+
+    return split_segments(data=data, lengths=lengths)
+
+
+def split_segments(data, lengths):
+    """
+    This function is for splitting an array of features of multiple audio files, stored one after another through time, into separate arrays (views, without copying).
+
+    Parameters:
+        data (np.ndarray): 2D NumPy array containing the concatenated features of multiple audio files (axis 0 ==> data through time; axis 1 ==> features)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+
+    Returns:
+        clips (list): List variable containing the 2D NumPy arrays (views into the data array) of the features of each audio file
+
+    """
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    return [data[offsets[index]:offsets[index + 1]] for index in range(len(lengths))]
@@ -0,0 +1,183 @@
+"""
+Functions for writing the generated features to the .h5 batch files on a background thread, overlapping the generation with the compression and disk writes
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import time
+import queue
+import threading
+import h5py
+import numpy as np
+from utils.storage import create_features, write_clips
+from preprocessing.statistics import write_batch_statistics
+
+
+def write_batch_async(file_path, name, groups, lengths, num_features, storage='padded', maximum=None, normalized=False, queue_size=2):
+    """
+    This function is for writing the features of all audio files in a batch folder to a new .h5 file, while they are being generated.
+    The features are generated in groups of audio files by the calling thread, and each group is written by a background thread as a single hyperslab write (see utils.storage.write_clips),
+    so the generation of the next group overlaps with the compression and writing of the previous ones. At most queue_size generated groups wait to be written.
+    The file is always closed (flushed) before returning, an error of the background thread is raised in the calling thread.
+    The time spent generating, writing and in total is stored in the .h5 file (see print_writer_report).
+
+    Parameters:
+        file_path (string): String variable containing the path to the .h5 file to be created
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        groups (iterable): Iterable (ex: generator) of lists of 2D NumPy arrays of features of consecutive audio files, generated as it is iterated
+        lengths (list): List variable containing the number of frames of each audio file in the batch, known before the features are generated (see utils.index)
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable to determine the storage form (see utils.storage)
+        maximum (int): The length to pad to when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        normalized (bool): Boolean variable to determine whether the features are normalized per audio file, in which case their statistics are not stored (see feature_extraction.spectral.write_batch)
+        queue_size (int): Integer variable containing the largest number of generated groups waiting to be written
+
+    Returns:
+        batch_maximum (int): The length of the longest audio file in the batch
+
+    """
+
+    lengths = np.array(lengths, dtype=np.int64)
+    work = queue.Queue(maxsize=queue_size)
+    errors = []
+    seconds = {'compute': 0.0, 'io': 0.0}
+
+    def writer():
+        h5_file = None
+
+        try:
+            start = time.perf_counter()
+            h5_file = h5py.File(name=file_path, mode='w', libver='latest')
+            create_features(h5_file=h5_file, name=name, lengths=lengths, num_features=num_features, storage=storage, maximum=maximum)
+            seconds['io'] = seconds['io'] + time.perf_counter() - start
+        except BaseException as error:
+            errors.append(error)
+
+        statistics = None
+        written = 0
+
+        while True:
+            clips = work.get()
+
+            if clips is None:
+                break
+
+            # after an error the remaining groups are only taken from the queue, so the calling thread is never blocked
+            if errors:
+                continue
+
+            try:
+                start = time.perf_counter()
+
+                if [len(clip) for clip in clips] != lengths[written:written + len(clips)].tolist():
+                    raise ValueError('Wrong number of frames of the generated features! Expected: ' + str(lengths[written:written + len(clips)].tolist()))
+
+                write_clips(h5_file=h5_file, name=name, clips=clips, start=written)
+                if not normalized:
+                    statistics = write_batch_statistics(h5_file=h5_file, clips=clips, previous=statistics)
+                written = written + len(clips)
+
+                seconds['io'] = seconds['io'] + time.perf_counter() - start
+            except BaseException as error:
+                errors.append(error)
+
+        if h5_file is not None:
+            try:
+                start = time.perf_counter()
+                h5_file.close()
+                seconds['io'] = seconds['io'] + time.perf_counter() - start
+            except BaseException as error:
+                errors.append(error)
+
+        if not errors and written != len(lengths):
+            errors.append(ValueError('Wrong number of generated audio files! Expected: ' + str(len(lengths)) + ', generated: ' + str(written)))
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+
+    try:
+        for clips in timed(iterable=groups, seconds=seconds):
+            work.put(clips)
+
+            if errors:
+                break
+    finally:
+        work.put(None)
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    with h5py.File(name=file_path, mode='a') as h5_file:
+        h5_file.attrs['compute_seconds'] = seconds['compute']
+        h5_file.attrs['io_seconds'] = seconds['io']
+        h5_file.attrs['wall_seconds'] = time.perf_counter() - start
+
+        if normalized:
+            h5_file.attrs['normalization'] = 'utterance'
+
+    return int(lengths.max()) if len(lengths) else 0
+
+
+def timed(iterable, seconds):
+    """
+    This function is for iterating over an iterable while adding the time spent generating each item to seconds['compute'].
+
+    Parameters:
+        iterable (iterable): Iterable (ex: generator) to be iterated over
+        seconds (dict): Dictionary containing the 'compute' time in seconds, updated in place
+
+    Returns:
+        Yields the items of the iterable
+
+    """
+
+    iterator = iter(iterable)
+
+    while True:
+        start = time.perf_counter()
+
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            seconds['compute'] = seconds['compute'] + time.perf_counter() - start
+
+        yield item
+
+
+def print_writer_report(h5_paths):
+    """
+    This function is for printing the time spent generating and writing the features of the .h5 batch files written by write_batch_async, and how much of it overlapped.
+
+    Parameters:
+        h5_paths (list): List variable containing the paths to the .h5 batch files
+
+    Returns:
+        None
+
+    """
+
+    compute, io, wall = 0.0, 0.0, 0.0
+
+    for h5_path in h5_paths:
+        with h5py.File(name=h5_path, mode='r') as h5_file:
+            if 'wall_seconds' not in h5_file.attrs:
+                continue
+
+            compute = compute + float(h5_file.attrs['compute_seconds'])
+            io = io + float(h5_file.attrs['io_seconds'])
+            wall = wall + float(h5_file.attrs['wall_seconds'])
+
+    overlap = max(compute + io - wall, 0.0)
+
+    print()
+    print('Writer: compute {:.2f}s, I/O {:.2f}s, wall {:.2f}s, overlapped {:.2f}s ({:.0f}% of I/O)'.format(compute, io, wall, overlap, 100 * overlap / max(io, 1e-12)))
@@ -0,0 +1,333 @@
+"""
+Functions for building streaming TensorFlow input pipelines over the generated feature files.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import h5py
+import numpy as np
+import tensorflow as tf
+from utils.parallel import list_batches
+from utils.storage import read_clip, storage_form, open_raw, raw_offsets_path, is_raw_current
+from utils.data import load_transcript, encode_transcripts
+from utils.labels import load_labels
+from preprocessing.spectral import normalize_segments, normalize_global
+from preprocessing.statistics import load_statistics
+
+
+def list_feature_files(path, method='mfcc', manifest=None, raw=False):
+    """
+    This function is for listing the generated .h5 (or converted .npy) feature files of all batch folders, in sorted order.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to list the spectrogram or MFCC files
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        raw (bool): Boolean variable to determine whether to list the raw .npy files instead of the .h5 files (see utils.data.convert_raw_all),
+                    the .h5 file is listed for the batch folders whose raw file is missing or stale (converted from a since regenerated or normalized .h5 file)
+
+    Returns:
+        file_list (list): List variable containing the paths to the feature files (batch folders without a generated file are skipped)
+
+    """
+
+    if method not in ('spectrogram', 'mfcc'):
+        raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\'')
+
+    file_list = []
+
+    for folder, batch in list_batches(path=path, manifest=manifest):
+        file_path = path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5'
+
+        if raw and is_raw_current(file_path=file_path[:-len('.h5')] + '.npy', h5_path=file_path):
+            file_list.append(file_path[:-len('.h5')] + '.npy')
+        elif os.path.exists(file_path):
+            file_list.append(file_path)
+
+    return file_list
+
+
+def clip_generator(h5_path, name, manifest='', rdcc_nbytes=0, normalization='', mean=None, std=None):
+    """
+    This function is for iterating over the audio files of a single .h5 batch file, reading the features of one audio file at a time.
+    Raw .npy files are memory-mapped, the features of each audio file are a view of the mapped file (no decompression and no copying).
+    The labels are read from the precomputed label file of the batch folder (see utils.labels.generate_labels), the transcripts are enumerated only if it does not exist.
+    Raises a ValueError if the number of transcripts differs from the number of audio files in the batch file.
+    Used as the source of tf.data.Dataset.from_generator, which passes the arguments as bytes.
+
+    Parameters:
+        h5_path (string or bytes): The path to the .h5 (or raw .npy) batch file
+        name (string or bytes): The name of the dataset (ex: 'Spectrogram', 'MFCC')
+        manifest (string or bytes): The path to the manifest database, used for loading the transcripts (default is '', which reads the transcript file of the batch folder)
+        rdcc_nbytes (int): The size (in bytes) of the HDF5 chunk cache (default is 0, which uses the HDF5 default of 1 MB)
+        normalization (string or bytes): {'', 'utterance', 'global'} The normalization applied to the features as they are read (default is '', which returns the features as stored)
+        mean (np.ndarray): NumPy array containing the mean of each feature over the entire dataset, used for 'global' normalization (see preprocessing.statistics)
+        std (np.ndarray): NumPy array containing the standard deviation of each feature over the entire dataset, used for 'global' normalization
+
+    Returns:
+        Yields a tuple for each audio file in the batch:
+        features (np.ndarray): 2D float32 NumPy array containing the features, without padding (axis 0 ==> data through time; axis 1 ==> features)
+        labels (np.ndarray): int32 NumPy array containing the enumerated transcript
+
+    """
+
+    h5_path, name, manifest, normalization = [value.decode('utf-8') if isinstance(value, bytes) else value for value in (h5_path, name, manifest, normalization)]
+
+    labels, offsets = load_labels(path=os.path.dirname(h5_path), manifest=manifest or None)
+
+    if labels is None:
+        labels, offsets = encode_transcripts(load_transcript(path=os.path.dirname(h5_path), manifest=manifest or None))
+
+    labels = labels.astype(np.int32)
+
+    if h5_path.endswith('.npy'):
+        data, clip_offsets = open_raw(file_path=h5_path)
+        check_label_count(h5_path=h5_path, offsets=offsets, num_clips=len(clip_offsets) - 1)
+
+        for index in range(len(clip_offsets) - 1):
+            yield normalize_clip(clip=data[clip_offsets[index]:clip_offsets[index + 1]], normalization=normalization, mean=mean, std=std), labels[offsets[index]:offsets[index + 1]]
+
+        return
+
+    with h5py.File(name=h5_path, mode='r', rdcc_nbytes=int(rdcc_nbytes) or None) as h5_file:
+        check_label_count(h5_path=h5_path, offsets=offsets, num_clips=len(h5_file['Lengths']))
+
+        for index in range(len(h5_file['Lengths'])):
+            features = read_clip(h5_file=h5_file, name=name, index=index).astype(np.float32, copy=False)
+
+            yield normalize_clip(clip=features, normalization=normalization, mean=mean, std=std), labels[offsets[index]:offsets[index + 1]]
+
+
+def check_label_count(h5_path, offsets, num_clips):
+    """
+    This function is for checking that a batch file has exactly one transcript for each of its audio files, so the features are never paired with misaligned labels.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 (or raw .npy) batch file
+        offsets (np.ndarray): NumPy array containing the start of each transcript in the labels array, with the total length as the last element
+        num_clips (int): Integer variable containing the number of audio files in the batch file
+
+    Returns:
+        None
+
+    """
+
+    if len(offsets) - 1 != num_clips:
+        raise ValueError('The batch file ' + h5_path + ' contains ' + str(num_clips) + ' audio files, but ' + str(len(offsets) - 1) + ' transcripts! Regenerate the features or the labels of the batch folder')
+
+
+def normalize_clip(clip, normalization, mean=None, std=None):
+    """
+    This function is for normalizing the features of a single audio file as it is read, in place when the array is writable (read from a .h5 file),
+    otherwise (a view of a memory-mapped raw file) into a single new array.
+
+    Parameters:
+        clip (np.ndarray): 2D float32 NumPy array containing the features (axis 0 ==> data through time; axis 1 ==> features)
+        normalization (string): {'', 'utterance', 'global'} String variable containing the normalization ('' returns the features unchanged)
+        mean (np.ndarray): NumPy array containing the mean of each feature over the entire dataset, used for 'global' normalization
+        std (np.ndarray): NumPy array containing the standard deviation of each feature over the entire dataset, used for 'global' normalization
+
+    Returns:
+        clip (np.ndarray): 2D float32 NumPy array containing the normalized features
+
+    """
+
+    if normalization == 'global':
+        return normalize_global(data=clip, mean=mean, std=std, out=None if clip.flags.writeable else np.empty_like(clip))
+
+    if normalization == 'utterance':
+        return normalize_segments(data=clip if clip.flags.writeable else np.array(clip), lengths=[len(clip)])
+
+    return clip
+
+
+def build_dataset(path, method='mfcc', batch_size=32, shuffle_buffer=1024, cycle_length=4, num_buckets=None, boundaries=None, manifest=None, raw=False, rdcc_nbytes=None, normalization=None, seed=None, verbose=False):
+    """
+    This function is for building a streaming tf.data.Dataset over the generated .h5 feature files and the transcripts of the dataset.
+    Only the audio files currently in the shuffle buffer and the prefetched minibatches are kept in memory, regardless of the size of the dataset:
+    the order of the .h5 files is shuffled each epoch, cycle_length files are read in parallel (interleaved) one audio file at a time,
+    the audio files are shuffled within a bounded buffer, zero-padded only to the longest audio file in each minibatch, and the minibatches are prefetched.
+    When bucketing is used, the audio files are grouped by their number of frames and each minibatch is zero-padded to the boundary of its bucket,
+    so only a small, fixed set of minibatch shapes is produced and most of the padding is avoided.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to use the spectrogram or MFCC features
+        batch_size (int): Integer variable containing the number of audio files in each minibatch
+        shuffle_buffer (int): Integer variable containing the number of audio files in the shuffle buffer (0 disables the shuffling)
+        cycle_length (int): Integer variable containing the number of .h5 files read in parallel
+        num_buckets (int): Integer variable containing the number of length buckets, with boundaries at the quantiles of the lengths of all audio files (default is None, which disables the bucketing)
+        boundaries (list): List variable containing the bucket boundaries in frames, used instead of num_buckets (default is None, see bucket_boundaries)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        raw (bool): Boolean variable to determine whether to read the memory-mapped raw .npy files instead of the .h5 files (see utils.data.convert_raw_all)
+        rdcc_nbytes (int): Integer variable containing the size (in bytes) of the HDF5 chunk cache of each opened .h5 file (default is None, which uses the HDF5 default of 1 MB)
+        normalization (string): {'utterance', 'global'} String variable to determine whether to normalize the features of each audio file as they are read with its own mean and standard deviation,
+                                or with the per-feature statistics of the entire dataset (see preprocessing.statistics.compute_statistics), for features generated with normalization='none'
+                                (default is None, which uses the features as stored)
+        seed (int): Integer variable containing the random seed of the shuffling (default is None)
+        verbose (bool): Boolean variable to determine whether to print the padding ratio with and without the bucketing
+
+    Returns:
+        dataset (tf.data.Dataset): Dataset of minibatches, each a tuple of:
+        features (3D float32 tensor, axis 0 ==> audio files; axis 1 ==> data through time; axis 2 ==> features)
+        labels (2D int32 tensor of the enumerated transcripts, zero-padded)
+        feature_length (1D int32 tensor containing the number of frames of each audio file)
+        label_length (1D int32 tensor containing the length of each transcript)
+
+    """
+
+    file_list = list_feature_files(path=path, method=method, manifest=manifest, raw=raw)
+    name = 'MFCC' if method == 'mfcc' else 'Spectrogram'
+
+    if not file_list:
+        raise ValueError('No generated feature files found! Generate the features first (see feature_extraction.spectral)')
+
+    if file_list[0].endswith('.npy'):
+        num_features = open_raw(file_path=file_list[0])[0].shape[1]
+    else:
+        with h5py.File(name=file_list[0], mode='r') as h5_file:
+            num_features = h5_file[name].shape[2 if storage_form(h5_file) == 'clip_major' else 1]
+
+    if normalization not in (None, 'utterance', 'global'):
+        raise ValueError('Wrong input for normalization argument! Possible inputs: None, \'utterance\', \'global\'')
+
+    if normalization == 'global':
+        mean, std = load_statistics(path=path, method=method)
+    else:
+        mean, std = np.zeros(num_features), np.ones(num_features)
+
+    output_signature = (tf.TensorSpec(shape=(None, num_features), dtype=tf.float32), tf.TensorSpec(shape=(None,), dtype=tf.int32))
+
+    dataset = tf.data.Dataset.from_tensor_slices(file_list)
+
+    if shuffle_buffer:
+        dataset = dataset.shuffle(buffer_size=len(file_list), seed=seed, reshuffle_each_iteration=True)
+
+    dataset = dataset.interleave(lambda h5_path: tf.data.Dataset.from_generator(clip_generator, args=(h5_path, name, manifest or '', rdcc_nbytes or 0, normalization or '', mean, std), output_signature=output_signature),
+                                 cycle_length=cycle_length, block_length=1, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle_buffer)
+
+    dataset = dataset.map(lambda features, labels: (features, labels, tf.shape(features)[0], tf.shape(labels)[0]), num_parallel_calls=tf.data.AUTOTUNE)
+
+    if shuffle_buffer:
+        dataset = dataset.shuffle(buffer_size=shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    if num_buckets is not None or boundaries is not None:
+        lengths = load_feature_lengths(file_list=file_list)
+
+        if boundaries is None:
+            boundaries = bucket_boundaries(lengths=lengths, num_buckets=num_buckets)
+
+        if verbose:
+            print_padding_report(lengths=lengths, boundaries=boundaries)
+
+        dataset = dataset.bucket_by_sequence_length(element_length_func=lambda features, labels, feature_length, label_length: feature_length,
+                                                    bucket_boundaries=list(boundaries), bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+                                                    padded_shapes=([None, num_features], [None], [], []), pad_to_bucket_boundary=True)
+    else:
+        dataset = dataset.padded_batch(batch_size=batch_size, padded_shapes=([None, num_features], [None], [], []))
+
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def load_feature_lengths(file_list):
+    """
+    This function is for loading the number of frames of all audio files in multiple .h5 (or raw .npy) batch files (only the Lengths datasets or the offsets are read).
+
+    Parameters:
+        file_list (list): List variable containing the paths to the .h5 (or raw .npy) batch files
+
+    Returns:
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+
+    """
+
+    lengths = []
+
+    for h5_path in file_list:
+        if h5_path.endswith('.npy'):
+            lengths.append(np.diff(np.load(raw_offsets_path(file_path=h5_path))))
+            continue
+
+        with h5py.File(name=h5_path, mode='r') as h5_file:
+            lengths.append(h5_file['Lengths'][:])
+
+    return np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+
+
+def bucket_boundaries(lengths, num_buckets=8):
+    """
+    This function is for calculating the boundaries of length buckets, so that each bucket contains roughly the same number of audio files.
+    A bucket with the boundaries [a, b) is zero-padded to b - 1 frames, the last boundary is always larger than the longest audio file.
+
+    Parameters:
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+        num_buckets (int): Integer variable containing the number of buckets
+
+    Returns:
+        boundaries (list): List variable containing the (increasing, unique) bucket boundaries in frames
+
+    """
+
+    lengths = np.asarray(lengths)
+
+    if len(lengths) == 0:
+        return [1]
+
+    quantiles = np.quantile(lengths, np.arange(1, num_buckets) / num_buckets, method='higher') + 1
+    boundaries = sorted(set(int(boundary) for boundary in quantiles) | {int(lengths.max()) + 1})
+
+    return boundaries
+
+
+def padding_ratio(lengths, boundaries=None):
+    """
+    This function is for calculating the fraction of zero-padded frames in the minibatches, which are wasted computation in every layer of the model.
+
+    Parameters:
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+        boundaries (list): List variable containing the bucket boundaries (default is None, which pads all audio files to the longest one, as in the padded .h5 files)
+
+    Returns:
+        ratio (float): The number of padded frames divided by the total number of frames after padding
+
+    """
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+
+    if len(lengths) == 0:
+        return 0.0
+
+    if boundaries is None:
+        padded = np.full(len(lengths), lengths.max())
+    else:
+        padded = np.asarray(boundaries, dtype=np.int64)[np.searchsorted(boundaries, lengths, side='right')] - 1
+
+    return float(1 - lengths.sum() / padded.sum())
+
+
+def print_padding_report(lengths, boundaries):
+    """
+    This function is for printing the padding ratio with and without the bucketing, and the number of audio files in each bucket.
+
+    Parameters:
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+        boundaries (list): List variable containing the bucket boundaries
+
+    Returns:
+        None
+
+    """
+
+    counts = np.bincount(np.searchsorted(boundaries, lengths, side='right'), minlength=len(boundaries))
+
+    print('Bucket boundaries:', list(boundaries))
+    print('Audio files per bucket:', counts[:len(boundaries)].tolist())
+    print('Padding ratio: {:.1%} (padded to the longest audio file) ==> {:.1%} (padded to the bucket boundary)'.format(padding_ratio(lengths=lengths), padding_ratio(lengths=lengths, boundaries=boundaries)))
+    print()
@@ -0,0 +1,251 @@
+"""
+Functions for decoding the output of the speech recognition models into text.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+from utils.utils import get_char_set
+from learning.language_model import initial_contexts, lookup_rows
+
+HASH_MASK = np.uint64((1 << 48) - 1)
+
+
+def get_alphabet():
+    """
+    This function is for generating the array of output classes of the models, in the same order as used by utils.data.enumerate_transcript.
+
+    Returns:
+        alphabet (list): List variable containing the letters of the Macedonian alphabet, the whitespace character, the blank token ('%') and the end token ('>')
+
+    """
+
+    return get_char_set() + [' ', '%', '>']
+
+
+def indices_to_text(indices):
+    """
+    This function is for converting an enumerated transcript back into its textual form.
+
+    Parameters:
+        indices (list or np.ndarray): The enumerated transcript
+
+    Returns:
+        transcript (string): The transcript in textual form
+
+    """
+
+    alphabet = get_alphabet()
+
+    return ''.join([alphabet[index] for index in indices])
+
+
+def greedy_decode(probabilities, lengths=None, blank_index=-1):
+    """
+    This function is for decoding the output of the model with best path (greedy) CTC decoding: the most probable class of each time step is taken,
+    repeated classes are merged and the blank tokens are removed. All samples of the batch are processed at once.
+
+    Parameters:
+        probabilities (np.ndarray): 3D NumPy array containing the output of the model (axis 0 ==> samples; axis 1 ==> time steps; axis 2 ==> classes)
+        lengths (np.ndarray): NumPy array containing the number of valid time steps of each sample (default is None, which uses all time steps)
+        blank_index (int): Integer variable containing the index of the blank token (default is -1, the last class, as in learning.train.ctc_loss)
+
+    Returns:
+        transcripts (list): List variable containing the decoded transcript (string) of each sample
+
+    """
+
+    probabilities = np.asarray(probabilities)
+    num_samples, num_steps, num_classes = probabilities.shape
+    blank_index = blank_index % num_classes
+
+    best_path = np.argmax(probabilities, axis=-1)
+
+    keep = best_path != blank_index
+    keep[:, 1:] &= best_path[:, 1:] != best_path[:, :-1]
+
+    if lengths is not None:
+        keep &= np.arange(num_steps)[np.newaxis, :] < np.asarray(lengths)[:, np.newaxis]
+
+    alphabet = np.array(get_alphabet() + [''] * (num_classes - len(get_alphabet())))
+
+    return [''.join(alphabet[best_path[num_sample][keep[num_sample]]]) for num_sample in range(num_samples)]
+
+
+def beam_decode(probabilities, beam_width=16, prune_k=8, lengths=None, blank_index=-1, language_model=None, alpha=0.5, beta=1.0):
+    """
+    This function is for decoding the output of the model with CTC prefix beam search, keeping the beam_width most probable transcripts (prefixes) at each time step.
+    The probabilities of a prefix ending with and without a blank token are tracked separately in log space, so all alignments of the same transcript are summed.
+    Each prefix is extended only by the prune_k most probable characters of the time step, and all extensions of all prefixes are scored, merged and pruned as NumPy arrays.
+
+    Parameters:
+        probabilities (np.ndarray): 3D NumPy array containing the output (softmax) of the model (axis 0 ==> samples; axis 1 ==> time steps; axis 2 ==> classes)
+        beam_width (int): Integer variable containing the number of prefixes kept at each time step
+        prune_k (int): Integer variable containing the number of most probable characters each prefix is extended by at each time step
+        lengths (np.ndarray): NumPy array containing the number of valid time steps of each sample (default is None, which uses all time steps)
+        blank_index (int): Integer variable containing the index of the blank token (default is -1, the last class, as in learning.train.ctc_loss)
+        language_model (dict): Dictionary containing the character language model fused with the acoustic scores (default is None, see learning.language_model.load_language_model)
+        alpha (float): Float variable containing the weight of the language model log probabilities
+        beta (float): Float variable containing the bonus added for each character of the transcript (both alpha and beta should be tuned on held-out data)
+
+    Returns:
+        transcripts (list): List variable containing the decoded transcript (string) of each sample
+
+    """
+
+    probabilities = np.asarray(probabilities)
+    num_classes = probabilities.shape[-1]
+    blank_index = blank_index % num_classes
+
+    with np.errstate(divide='ignore'):
+        log_probabilities = np.log(probabilities.astype(np.float64, copy=False))
+
+    return [indices_to_text(indices) for indices in beam_search(log_probabilities=log_probabilities, lengths=lengths, beam_width=beam_width, prune_k=prune_k, blank_index=blank_index,
+                                                                     language_model=language_model, alpha=alpha, beta=beta)]
+
+
+def beam_search(log_probabilities, lengths=None, beam_width=16, prune_k=8, blank_index=33, language_model=None, alpha=0.5, beta=1.0, oov_log_probability=-10.0):
+    """
+    This function is for running the CTC prefix beam search on the output of the model for a batch of samples (see beam_decode).
+    All samples are searched at once, each time step is a fixed number of NumPy operations on (samples, prefixes) arrays regardless of the batch size.
+    Each prefix is identified by a 48-bit hash, updated with each appended character: an extended prefix can only be equal to one of the current prefixes
+    of the same sample (never to another extended prefix), those are found with a single np.searchsorted over the (sample, hash) keys of all samples and merged.
+    With a language model (shallow fusion), the prefixes are ranked by their acoustic score plus alpha times their language model score plus beta times their number of characters.
+    Each prefix keeps the row of the language model of its context, so scoring its extensions is a single gather, and only the kept extended prefixes are looked up.
+
+    Parameters:
+        log_probabilities (np.ndarray): 3D NumPy array containing the log probabilities of the classes (axis 0 ==> samples; axis 1 ==> time steps; axis 2 ==> classes)
+        lengths (np.ndarray): NumPy array containing the number of valid time steps of each sample (default is None, which uses all time steps)
+        beam_width (int): Integer variable containing the number of prefixes kept at each time step
+        prune_k (int): Integer variable containing the number of most probable characters each prefix is extended by at each time step
+        blank_index (int): Integer variable containing the (non-negative) index of the blank token
+        language_model (dict): Dictionary containing the character language model (default is None, see learning.language_model.load_language_model)
+        alpha (float): Float variable containing the weight of the language model log probabilities
+        beta (float): Float variable containing the bonus added for each character of the transcript
+        oov_log_probability (float): Float variable containing the language model log probability of the classes outside of its vocabulary (ex: '%')
+
+    Returns:
+        indices (list): List variable containing the class indices (list) of the most probable transcript of each sample
+
+    """
+
+    num_samples, num_steps, num_classes = log_probabilities.shape
+    characters = np.delete(np.arange(num_classes), blank_index)
+    prune_k = min(prune_k, len(characters))
+    samples = np.arange(num_samples)[:, np.newaxis]
+    sample_keys = samples.astype(np.uint64) << np.uint64(48)
+
+    if lengths is not None:
+        # after the end of a sample only the blank token is possible, so its prefixes do not change
+        finished = np.arange(num_steps)[np.newaxis, :] >= np.asarray(lengths)[:, np.newaxis]
+        log_probabilities = np.where(finished[:, :, np.newaxis], -np.inf, log_probabilities)
+        log_probabilities[:, :, blank_index][finished] = 0.0
+
+    hashes = np.zeros((num_samples, 1), dtype=np.uint64)
+    blank_scores = np.zeros((num_samples, 1))
+    non_blank_scores = np.full((num_samples, 1), -np.inf)
+    last = np.full((num_samples, 1), -1)
+    history = []
+
+    if language_model is not None:
+        vocabulary_size = language_model['vocabulary_size']
+        contexts, rows = initial_contexts(language_model=language_model, shape=(num_samples, 1))
+        language_scores = np.zeros((num_samples, 1))
+        num_characters = np.zeros((num_samples, 1))
+
+    for step in range(num_steps):
+        step_log_probabilities = log_probabilities[:, step, :]
+        candidates = characters[np.argpartition(-step_log_probabilities[:, characters], prune_k - 1, axis=1)[:, :prune_k]]
+        candidate_log_probabilities = np.take_along_axis(step_log_probabilities, candidates, axis=1)
+
+        num_beams = hashes.shape[1]
+        totals = np.logaddexp(blank_scores, non_blank_scores)
+
+        # the prefix stays the same: the step is a blank, or a repetition of the last character
+        stay_blank = totals + step_log_probabilities[:, blank_index, np.newaxis]
+        stay_non_blank = np.where(last >= 0, non_blank_scores + np.take_along_axis(step_log_probabilities, np.maximum(last, 0), axis=1), -np.inf)
+
+        # the prefix is extended by a character: a repeated character is a new one only after a blank
+        repeated = last[:, :, np.newaxis] == candidates[:, np.newaxis, :]
+        extend_non_blank = (np.where(repeated, blank_scores[:, :, np.newaxis], totals[:, :, np.newaxis]) + candidate_log_probabilities[:, np.newaxis, :]).reshape(num_samples, -1)
+
+        with np.errstate(over='ignore'):
+            extend_hashes = (hashes[:, :, np.newaxis] * np.uint64(1000003) + (candidates[:, np.newaxis, :] + 1).astype(np.uint64)).reshape(num_samples, -1) & HASH_MASK
+
+        # prefixes with zero probability (kept only when there are fewer possible prefixes than beam_width) may be duplicates, so they are never merged
+        keys = np.where(np.isfinite(totals), sample_keys | hashes, np.iinfo(np.uint64).max).ravel()
+        extend_keys = (sample_keys | extend_hashes).ravel()
+
+        order = np.argsort(keys)
+        positions = np.minimum(np.searchsorted(keys[order], extend_keys), len(keys) - 1)
+
+        merged = (keys[order][positions] == extend_keys) & np.isfinite(extend_non_blank).ravel()
+        merged_beam = order[positions[merged]] % num_beams
+        merged_sample, merged_extension = np.divmod(np.flatnonzero(merged), extend_hashes.shape[1])
+
+        stay_non_blank[merged_sample, merged_beam] = np.logaddexp(stay_non_blank[merged_sample, merged_beam], extend_non_blank[merged_sample, merged_extension])
+        extend_non_blank[merged_sample, merged_extension] = -np.inf
+
+        if language_model is not None:
+            in_vocabulary = candidates < vocabulary_size
+            extend_language = np.where(in_vocabulary[:, np.newaxis, :], language_model['log_probs'][rows[:, :, np.newaxis], np.where(in_vocabulary, candidates, 0)[:, np.newaxis, :]],
+                                       oov_log_probability).reshape(num_samples, -1)
+            extend_language = np.repeat(language_scores, prune_k, axis=1) + extend_language
+            stay_bonus = alpha * language_scores + beta * num_characters
+            extend_bonus = alpha * extend_language + beta * np.repeat(num_characters + 1, prune_k, axis=1)
+        else:
+            stay_bonus, extend_bonus = 0.0, 0.0
+
+        scores = np.concatenate([np.logaddexp(stay_blank, stay_non_blank) + stay_bonus, extend_non_blank + extend_bonus], axis=1)
+
+        if scores.shape[1] > beam_width:
+            keep = np.argpartition(-scores, beam_width - 1, axis=1)[:, :beam_width]
+        else:
+            keep = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+        extended = keep >= num_beams
+        stay = np.minimum(keep, num_beams - 1)
+        extension = np.maximum(keep - num_beams, 0)
+
+        parents = np.where(extended, extension // prune_k, keep)
+        appended = np.where(extended, np.take_along_axis(candidates, extension % prune_k, axis=1), -1)
+        history.append((parents, appended))
+
+        hashes = np.where(extended, np.take_along_axis(extend_hashes, extension, axis=1), np.take_along_axis(hashes, stay, axis=1))
+        blank_scores = np.where(extended, -np.inf, np.take_along_axis(stay_blank, stay, axis=1))
+        non_blank_scores = np.where(extended, np.take_along_axis(extend_non_blank, extension, axis=1), np.take_along_axis(stay_non_blank, stay, axis=1))
+        last = np.where(extended, appended, np.take_along_axis(last, parents, axis=1))
+
+        if language_model is not None:
+            language_scores = np.where(extended, np.take_along_axis(extend_language, extension, axis=1), np.take_along_axis(language_scores, stay, axis=1))
+            num_characters = np.take_along_axis(num_characters, parents, axis=1) + extended
+
+            # the context is shifted by the appended character (classes outside of the vocabulary of the language model leave it unchanged)
+            contexts = np.take_along_axis(contexts, parents[:, :, np.newaxis], axis=1)
+            rows = np.take_along_axis(rows, parents, axis=1)
+            shifted = extended & (appended < vocabulary_size)
+
+            if shifted.any():
+                new_contexts = np.concatenate([contexts[shifted][:, 1:], appended[shifted][:, np.newaxis]], axis=1)
+                contexts[shifted] = new_contexts
+                rows[shifted] = lookup_rows(language_model=language_model, contexts=new_contexts)
+
+    final_scores = np.logaddexp(blank_scores, non_blank_scores)
+    if language_model is not None:
+        final_scores = final_scores + alpha * language_scores + beta * num_characters
+
+    beam = np.argmax(final_scores, axis=1)
+    path = np.empty((num_steps, num_samples), dtype=np.int64)
+
+    for step in range(num_steps - 1, -1, -1):
+        parents, appended = history[step]
+        path[step] = appended[samples[:, 0], beam]
+        beam = parents[samples[:, 0], beam]
+
+    return [[int(index) for index in path[:, num_sample] if index >= 0] for num_sample in range(num_samples)]
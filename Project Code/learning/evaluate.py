@@ -0,0 +1,165 @@
+"""
+Functions for evaluating the accuracy and the throughput of the speech recognition models over the whole dataset.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import time
+import h5py
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from learning.dataset import list_feature_files
+from learning.models import output_length
+from learning.decode import greedy_decode, beam_decode, indices_to_text
+from learning.language_model import load_language_model
+from learning.metrics import edit_distances
+from preprocessing.spectral import normalize_batch
+from utils.storage import read_clip
+from utils.data import load_transcript, enumerate_transcript
+
+LANGUAGE_MODELS = {}
+
+
+def decode_batch(probabilities, lengths, beam_width=1, language_model=None):
+    """
+    This function is for decoding the output of the model for a batch of samples, in the current process or in a worker process.
+
+    Parameters:
+        probabilities (np.ndarray): 3D NumPy array containing the output (softmax) of the model (axis 0 ==> samples; axis 1 ==> time steps; axis 2 ==> classes)
+        lengths (np.ndarray): NumPy array containing the number of valid time steps of each sample
+        beam_width (int): Integer variable containing the beam width (default is 1, which uses greedy decoding when there is no language model)
+        language_model (string): String variable containing the path to the character language model (default is None, loaded once per process)
+
+    Returns:
+        transcripts (list): List variable containing the decoded transcript (string) of each sample
+
+    """
+
+    if language_model is None and beam_width <= 1:
+        return greedy_decode(probabilities=probabilities, lengths=lengths)
+
+    if language_model is not None and language_model not in LANGUAGE_MODELS:
+        LANGUAGE_MODELS[language_model] = load_language_model(path=language_model)
+
+    return beam_decode(probabilities=probabilities, lengths=lengths, beam_width=beam_width,
+                       language_model=LANGUAGE_MODELS[language_model] if language_model is not None else None)
+
+
+def evaluate(model, path, method='mfcc', batch_size=256, beam_width=1, language_model=None, workers=1, manifest=None, frame_step=0.01, verbose=False):
+    """
+    This function is for calculating the character and word error rates of the model over all .h5 batch files of the dataset, per folder and in total.
+    The audio files of each batch file are sorted by length and run through the model in large batches, while the previous batches are decoded in a pool of worker processes.
+
+    Parameters:
+        model (keras model): Trained Keras model (the input is (samples, time, features), the output is the softmax over the classes)
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to evaluate on the spectrogram or MFCC features
+        batch_size (int): Integer variable containing the number of audio files run through the model at once
+        beam_width (int): Integer variable containing the beam width of the decoding (default is 1, which uses greedy decoding when there is no language model)
+        language_model (string): String variable containing the path to a character language model fused with the beam search (default is None, see learning.language_model)
+        workers (int): Integer variable containing the number of worker processes used for decoding (default is 1, which decodes in the current process)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        frame_step (float): Float variable containing the duration (in seconds) between two feature frames, used for calculating the real-time factor
+        verbose (bool): Boolean variable to determine whether to print the progress and the results of the function
+
+    Returns:
+        results (dict): Dictionary containing the results of each folder and the 'total' results, each a dictionary of:
+        'utterances', 'cer', 'wer', and for the total also 'seconds', 'utterances_per_second' and 'real_time_factor'
+
+    """
+
+    if method not in ('spectrogram', 'mfcc'):
+        raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\'')
+
+    name = 'Spectrogram' if method == 'spectrogram' else 'MFCC'
+    executor = ProcessPoolExecutor(max_workers=workers) if workers is not None and workers > 1 else None
+
+    batches = []
+    num_frames = 0
+    buffer = np.empty(0, dtype=np.float32)
+    start = time.perf_counter()
+
+    try:
+        for h5_path in list_feature_files(path=path, method=method, manifest=manifest):
+            folder = os.path.basename(os.path.dirname(os.path.dirname(h5_path)))
+            references = [indices_to_text(enumerate_transcript(transcript)) for transcript in load_transcript(path=os.path.dirname(h5_path), manifest=manifest)]
+
+            with h5py.File(name=h5_path, mode='r') as h5_file:
+                clips = [read_clip(h5_file=h5_file, name=name, index=index) for index in range(len(h5_file['Lengths']))]
+
+            order = np.argsort([len(clip) for clip in clips], kind='stable')
+
+            for batch_start in range(0, len(order), batch_size):
+                indices = order[batch_start:batch_start + batch_size]
+                lengths = np.array([len(clips[index]) for index in indices], dtype=np.int64)
+                num_frames = num_frames + int(lengths.sum())
+
+                # the padded input of every batch is written into the same buffer, grown only when a batch does not fit
+                if buffer.size < len(indices) * int(lengths.max()) * clips[indices[0]].shape[1]:
+                    buffer = np.empty(len(indices) * int(lengths.max()) * clips[indices[0]].shape[1], dtype=np.float32)
+
+                x, _, _ = normalize_batch(clips=[clips[index] for index in indices], normalization='none', out=buffer)
+                probabilities = np.asarray(model.predict_on_batch(x))
+                task = {'probabilities': probabilities, 'lengths': np.asarray(output_length(lengths)), 'beam_width': beam_width, 'language_model': language_model}
+
+                hypotheses = executor.submit(decode_batch, **task) if executor is not None else decode_batch(**task)
+                batches.append((folder, [references[index] for index in indices], hypotheses))
+
+            if verbose:
+                print('Batch', folder + os.sep + os.path.basename(os.path.dirname(h5_path)), 'done!')
+
+        batches = [(folder, references, hypotheses.result() if executor is not None else hypotheses) for folder, references, hypotheses in batches]
+
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    seconds = time.perf_counter() - start
+
+    results = {}
+    for folder in sorted(set([batch[0] for batch in batches])) + ['total']:
+        references = [reference for batch in batches if folder in (batch[0], 'total') for reference in batch[1]]
+        hypotheses = [hypothesis for batch in batches if folder in (batch[0], 'total') for hypothesis in batch[2]]
+
+        character_errors = int(edit_distances(references=references, hypotheses=hypotheses).sum())
+        word_errors = int(edit_distances(references=[reference.split() for reference in references], hypotheses=[hypothesis.split() for hypothesis in hypotheses]).sum())
+
+        results[folder] = {'utterances': len(references), 'cer': character_errors / max(sum([len(reference) for reference in references]), 1),
+                           'wer': word_errors / max(sum([len(reference.split()) for reference in references]), 1)}
+
+    results['total']['seconds'] = seconds
+    results['total']['utterances_per_second'] = results['total']['utterances'] / seconds
+    results['total']['real_time_factor'] = seconds / max(num_frames * frame_step, 1e-12)
+
+    if verbose:
+        print_evaluation_report(results=results)
+
+    return results
+
+
+def print_evaluation_report(results):
+    """
+    This function is for printing the results of evaluate as a table.
+
+    Parameters:
+        results (dict): Dictionary containing the results (see evaluate)
+
+    Returns:
+        Prints the results
+
+    """
+
+    print('{:>10} {:>10} {:>8} {:>8}'.format('Folder', 'Utterances', 'CER', 'WER'))
+
+    for folder, result in results.items():
+        print('{:>10} {:>10} {:>8.4f} {:>8.4f}'.format(folder, result['utterances'], result['cer'], result['wer']))
+
+    print('Throughput: {:.1f} utterances/s, real-time factor: {:.4f} ({:.1f} s)'.format(results['total']['utterances_per_second'], results['total']['real_time_factor'],
+                                                                                      results['total']['seconds']))
@@ -0,0 +1,104 @@
+"""
+Functions for exporting trained Keras models for CPU inference.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+import tensorflow as tf
+
+
+def export_tflite(model, file_path, quantization='dynamic', representative_data=None):
+    """
+    This function is for converting a Keras model into a TensorFlow Lite model, with optional post-training quantization.
+
+    Parameters:
+        model (Keras model): Trained Keras model (see learning.models)
+        file_path (string): String variable containing the path to the .tflite file to be created
+        quantization (string): {'none', 'dynamic', 'float16', 'int8'} String variable to determine the post-training quantization:
+                               'none' keeps all weights in float32
+                               'dynamic' stores the weights in int8 and quantizes the activations on the fly (dynamic range quantization)
+                               'float16' stores the weights in float16
+                               'int8' quantizes both the weights and the activations to int8, using representative_data for calibration (operations without an int8 kernel stay in float32)
+        representative_data (list): List variable containing 2D NumPy arrays of input features (axis 0 ==> data through time; axis 1 ==> features), required for 'int8'
+
+    Returns:
+        file_path (string): The path to the created .tflite file
+
+    """
+
+    if quantization not in ('none', 'dynamic', 'float16', 'int8'):
+        raise ValueError('Wrong input for quantization argument! Possible inputs: \'none\', \'dynamic\', \'float16\', \'int8\'')
+
+    if quantization == 'int8' and not representative_data:
+        raise ValueError('Representative data is required for int8 quantization!')
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+
+    if quantization == 'int8':
+        converter.representative_dataset = lambda: ([np.asarray(features, dtype=np.float32)[np.newaxis]] for features in representative_data)
+
+    tflite_model = converter.convert()
+
+    with open(file_path, mode='wb') as tflite_file:
+        tflite_file.write(tflite_model)
+
+    return file_path
+
+
+def load_tflite(file_path, num_threads=None):
+    """
+    This function is for loading a TensorFlow Lite model for inference.
+
+    Parameters:
+        file_path (string): String variable containing the path to the .tflite file
+        num_threads (int): Integer variable containing the number of CPU threads used by the interpreter (default is None, which is decided by TensorFlow Lite)
+
+    Returns:
+        interpreter (tf.lite.Interpreter): The loaded interpreter, with its tensors allocated
+
+    """
+
+    interpreter = tf.lite.Interpreter(model_path=file_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+
+    return interpreter
+
+
+def tflite_predict(interpreter, x):
+    """
+    This function is for running a TensorFlow Lite model on a batch of input features, resizing its input to the shape of the batch.
+
+    Parameters:
+        interpreter (tf.lite.Interpreter): Loaded interpreter (see load_tflite)
+        x (np.ndarray): 3D NumPy array containing the input features (axis 0 ==> samples; axis 1 ==> data through time; axis 2 ==> features)
+
+    Returns:
+        output (np.ndarray): 3D NumPy array containing the output of the model (axis 0 ==> samples; axis 1 ==> time steps; axis 2 ==> classes)
+
+    """
+
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+
+    if tuple(input_details['shape']) != x.shape:
+        interpreter.resize_tensor_input(input_details['index'], x.shape)
+        interpreter.allocate_tensors()
+
+    interpreter.set_tensor(input_details['index'], x.astype(input_details['dtype'], copy=False))
+    interpreter.invoke()
+
+    return interpreter.get_tensor(output_details['index'])
@@ -0,0 +1,258 @@
+"""
+Functions for building and querying a character n-gram language model of the transcripts, stored as memory-mappable NumPy arrays.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import json
+import numpy as np
+from utils.utils import get_char_set
+from utils.parallel import list_batches
+from utils.data import load_transcript
+
+HASH_PRIME = np.uint64(1000003)
+SLOT_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def build_language_model(path, output_path, order=5, manifest=None, verbose=False):
+    """
+    This function is for building a character n-gram language model from the transcripts of all batch folders, smoothed with Witten-Bell interpolation.
+    The conditional probabilities of all characters are precomputed for every context seen in the transcripts (one row per context),
+    so a query is a single hash table lookup of the context followed by indexing the row.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        output_path (string): String variable containing the path to the folder where the language model is stored (created if it does not exist)
+        order (int): Integer variable containing the order of the n-grams (the context is order - 1 characters)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        Creates the following files in the output folder:
+        keys.npy (uint64 hash table of the context hashes), rows.npy (int32 row of each hash table slot, -1 for empty slots),
+        log_probs.npy (float32 natural log probabilities, axis 0 ==> contexts; axis 1 ==> characters) and meta.json (parameters of the model)
+
+    """
+
+    vocabulary = get_char_set() + [' ']
+    to_index = {character: index for index, character in enumerate(vocabulary)}
+    bos = len(vocabulary)
+
+    sentences = []
+    for folder, batch in list_batches(path=path, manifest=manifest):
+        for transcript in load_transcript(path=path + os.sep + folder + os.sep + batch, manifest=manifest):
+            if transcript:
+                sentences.append([bos] * (order - 1) + [to_index[character] for character in transcript.lower().strip() if character in to_index])
+
+    if verbose:
+        print('Building language model from', len(sentences), 'transcripts...')
+
+    tokens = np.concatenate([np.array(sentence, dtype=np.int64) for sentence in sentences]) if sentences else np.zeros(0, dtype=np.int64)
+    positions = np.concatenate([np.arange(order - 1, len(sentence)) + offset for sentence, offset in zip(sentences, np.cumsum([0] + [len(sentence) for sentence in sentences[:-1]]))]) if sentences else np.zeros(0, dtype=np.int64)
+    targets = tokens[positions]
+
+    all_keys, all_rows = [], []
+    previous_keys, previous_rows = np.zeros(1, dtype=np.uint64), np.full((1, len(vocabulary)), 1.0 / len(vocabulary))
+    context_hashes = np.zeros(len(positions), dtype=np.uint64)
+    power = np.uint64(1)
+
+    for length in range(order):
+        if length > 0:
+            with np.errstate(over='ignore'):
+                suffix_hashes = context_hashes
+                context_hashes = (tokens[positions - length].astype(np.uint64) + np.uint64(1)) * power + context_hashes
+                power = power * HASH_PRIME
+        else:
+            suffix_hashes = context_hashes
+
+        keys, inverse = np.unique(context_hashes, return_inverse=True)
+        counts = np.zeros((len(keys), len(vocabulary)))
+        np.add.at(counts, (inverse, targets), 1)
+
+        # the lower-order distribution of each context is the one of the context without its first character
+        suffix_keys = np.zeros(len(keys), dtype=np.uint64)
+        suffix_keys[inverse] = suffix_hashes
+        lower = previous_rows[np.searchsorted(previous_keys, suffix_keys)] if length > 0 else np.broadcast_to(previous_rows, counts.shape)
+
+        totals = counts.sum(axis=1, keepdims=True)
+        types = (counts > 0).sum(axis=1, keepdims=True)
+        rows = (counts + types * lower) / np.maximum(totals + types, 1)
+
+        all_keys.append(keys)
+        all_rows.append(rows)
+        previous_keys, previous_rows = keys, rows
+
+        if verbose:
+            print('Order', length + 1, 'contexts:', len(keys))
+
+    keys = np.concatenate(all_keys)
+    log_probs = np.log(np.concatenate(all_rows)).astype(np.float32)
+    table_keys, table_rows, max_probes = build_hash_table(keys=keys)
+
+    os.makedirs(output_path, exist_ok=True)
+    np.save(output_path + os.sep + 'keys.npy', table_keys)
+    np.save(output_path + os.sep + 'rows.npy', table_rows)
+    np.save(output_path + os.sep + 'log_probs.npy', log_probs)
+
+    with open(output_path + os.sep + 'meta.json', mode='w', encoding='utf-8') as meta_file:
+        json.dump({'order': order, 'vocabulary_size': len(vocabulary), 'bos': bos, 'max_probes': max_probes}, meta_file)
+
+    if verbose:
+        print('Language model saved! Size: {:.1f} MB'.format((table_keys.nbytes + table_rows.nbytes + log_probs.nbytes) / 2 ** 20))
+
+
+def build_hash_table(keys):
+    """
+    This function is for building an open addressing (linear probing) hash table of 64-bit keys, with at most 50% of the slots used.
+
+    Parameters:
+        keys (np.ndarray): NumPy array containing the unique uint64 keys
+
+    Returns:
+        table_keys (np.ndarray): NumPy array containing the key stored in each slot
+        table_rows (np.ndarray): NumPy array containing the index (in the keys array) of the key stored in each slot, -1 for empty slots
+        max_probes (int): The largest number of slots probed to find a key
+
+    """
+
+    bits = max(int(np.ceil(np.log2(max(2 * len(keys), 2)))), 1)
+    table_keys = np.zeros(1 << bits, dtype=np.uint64)
+    table_rows = np.full(1 << bits, -1, dtype=np.int32)
+
+    with np.errstate(over='ignore'):
+        slots = ((keys * SLOT_MULTIPLIER) >> np.uint64(64 - bits)).astype(np.int64)
+
+    pending = np.arange(len(keys))
+    max_probes = 0
+
+    while len(pending):
+        max_probes = max_probes + 1
+        free = table_rows[slots[pending]] < 0
+
+        # of all pending keys probing the same free slot, the first one takes it
+        candidates = pending[free]
+        _, first = np.unique(slots[candidates], return_index=True)
+        placed = candidates[first]
+
+        table_keys[slots[placed]] = keys[placed]
+        table_rows[slots[placed]] = placed
+
+        pending = np.setdiff1d(pending, placed, assume_unique=True)
+        slots[pending] = (slots[pending] + 1) & ((1 << bits) - 1)
+
+    return table_keys, table_rows, max_probes
+
+
+def load_language_model(path):
+    """
+    This function is for loading a language model built by build_language_model, memory-mapping its arrays (only the pages of the queried rows are read from disk).
+
+    Parameters:
+        path (string): String variable containing the path to the folder of the language model
+
+    Returns:
+        language_model (dict): Dictionary containing the arrays ('keys', 'rows', 'log_probs') and the parameters ('order', 'vocabulary_size', 'bos', 'max_probes') of the model
+
+    """
+
+    with open(path + os.sep + 'meta.json', mode='r', encoding='utf-8') as meta_file:
+        language_model = json.load(meta_file)
+
+    for name in ('keys', 'rows', 'log_probs'):
+        language_model[name] = np.load(path + os.sep + name + '.npy', mmap_mode='r')
+
+    return language_model
+
+
+def context_hashes(contexts, length):
+    """
+    This function is for calculating the hashes of the last characters of contexts (the same polynomial hash used by build_language_model).
+
+    Parameters:
+        contexts (np.ndarray): Integer NumPy array containing the contexts in its last axis (character indices, the beginning of the transcript padded with the bos index)
+        length (int): Integer variable containing the number of last characters of each context to be hashed
+
+    Returns:
+        hashes (np.ndarray): uint64 NumPy array containing the hash of each context
+
+    """
+
+    hashes = np.zeros(contexts.shape[:-1], dtype=np.uint64)
+
+    with np.errstate(over='ignore'):
+        for position in range(contexts.shape[-1] - length, contexts.shape[-1]):
+            hashes = hashes * HASH_PRIME + contexts[..., position].astype(np.uint64) + np.uint64(1)
+
+    return hashes
+
+
+def lookup_rows(language_model, contexts):
+    """
+    This function is for finding the row of conditional log probabilities of the longest known suffix of each context.
+
+    Parameters:
+        language_model (dict): Dictionary containing the loaded language model (see load_language_model)
+        contexts (np.ndarray): Integer NumPy array containing the contexts of order - 1 characters in its last axis
+
+    Returns:
+        rows (np.ndarray): NumPy array containing the row index (into the log_probs array) for each context
+
+    """
+
+    table_keys, table_rows = language_model['keys'], language_model['rows']
+    bits = int(np.log2(len(table_keys)))
+
+    rows = np.full(contexts.shape[:-1], -1, dtype=np.int64)
+
+    for length in range(contexts.shape[-1], -1, -1):
+        unresolved = rows < 0
+        hashes = context_hashes(contexts=contexts[unresolved], length=length)
+
+        with np.errstate(over='ignore'):
+            slots = ((hashes * SLOT_MULTIPLIER) >> np.uint64(64 - bits)).astype(np.int64)
+
+        found = np.full(len(hashes), -1, dtype=np.int64)
+        searching = np.arange(len(hashes))
+
+        for _ in range(language_model['max_probes']):
+            slot_rows = table_rows[slots[searching]]
+            hit = (slot_rows >= 0) & (table_keys[slots[searching]] == hashes[searching])
+            found[searching[hit]] = slot_rows[hit]
+
+            searching = searching[~hit & (slot_rows >= 0)]
+            if len(searching) == 0:
+                break
+            slots[searching] = (slots[searching] + 1) & ((1 << bits) - 1)
+
+        rows[unresolved] = found
+
+        if (rows >= 0).all():
+            break
+
+    return rows
+
+
+def initial_contexts(language_model, shape):
+    """
+    This function is for creating the contexts of empty transcripts (filled with the bos index).
+
+    Parameters:
+        language_model (dict): Dictionary containing the loaded language model (see load_language_model)
+        shape (tuple): Tuple variable containing the shape of the array of contexts (without the context axis)
+
+    Returns:
+        contexts (np.ndarray): Integer NumPy array containing the contexts
+        rows (np.ndarray): NumPy array containing the row index of each context (see lookup_rows)
+
+    """
+
+    contexts = np.full(tuple(shape) + (language_model['order'] - 1,), language_model['bos'], dtype=np.int64)
+
+    return contexts, lookup_rows(language_model=language_model, contexts=contexts)
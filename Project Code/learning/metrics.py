@@ -0,0 +1,137 @@
+"""
+Functions for measuring the accuracy of the transcripts generated by the speech recognition models.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+
+
+def edit_distance(reference, hypothesis):
+    """
+    This function is for calculating the Levenshtein distance (number of substitutions, insertions and deletions) between two sequences.
+
+    Parameters:
+        reference (string or list): The reference sequence (ex: the characters or words of the true transcript)
+        hypothesis (string or list): The hypothesis sequence (ex: the characters or words of the decoded transcript)
+
+    Returns:
+        distance (int): The edit distance
+
+    """
+
+    return int(edit_distances(references=[reference], hypotheses=[hypothesis])[0])
+
+
+def encode_sequences(sequences):
+    """
+    This function is for converting multiple sequences (strings or lists of words) into a zero-padded 2D integer array, with equal items mapped to equal (positive) integers.
+
+    Parameters:
+        sequences (list): List variable containing the sequences
+
+    Returns:
+        encoded (np.ndarray): 2D NumPy array containing the encoded sequences (axis 0 ==> sequences; axis 1 ==> items)
+        lengths (np.ndarray): NumPy array containing the length of each sequence
+
+    """
+
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    encoded = np.zeros((len(sequences), max(lengths.max(initial=0), 1)), dtype=np.int64)
+
+    vocabulary = {}
+    for num_sequence, sequence in enumerate(sequences):
+        if isinstance(sequence, str):
+            encoded[num_sequence, :len(sequence)] = np.frombuffer(sequence.encode('utf-32-le'), dtype=np.uint32).astype(np.int64) + 1
+        else:
+            encoded[num_sequence, :len(sequence)] = [vocabulary.setdefault(item, len(vocabulary) + 1) for item in sequence]
+
+    return encoded, lengths
+
+
+def edit_distances(references, hypotheses, chunk_size=256):
+    """
+    This function is for calculating the Levenshtein distances of multiple pairs of sequences at once.
+    The pairs are sorted by length and processed in chunks, one row of the dynamic programming table is computed for all pairs of a chunk with NumPy operations:
+    substitutions and deletions are elementwise minimums with the previous row, insertions are a cumulative minimum along the row.
+
+    Parameters:
+        references (list): List variable containing the reference sequences (strings, or lists of words)
+        hypotheses (list): List variable containing the hypothesis sequences (strings, or lists of words)
+        chunk_size (int): Integer variable containing the number of pairs processed at once
+
+    Returns:
+        distances (np.ndarray): NumPy array containing the edit distance of each pair
+
+    """
+
+    distances = np.zeros(len(references), dtype=np.int64)
+    order = np.argsort([len(reference) + len(hypothesis) for reference, hypothesis in zip(references, hypotheses)], kind='stable')
+
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start:start + chunk_size]
+        encoded, lengths = encode_sequences([references[index] for index in chunk] + [hypotheses[index] for index in chunk])
+        reference, hypothesis = encoded[:len(chunk)], encoded[len(chunk):, :max(lengths[len(chunk):].max(initial=0), 1)]
+        ref_lengths, hyp_lengths = lengths[:len(chunk)], lengths[len(chunk):]
+
+        rows = np.arange(len(chunk))
+        columns = np.arange(hypothesis.shape[1] + 1)
+        previous = np.broadcast_to(columns, (len(chunk), len(columns)))
+        result = previous[rows, hyp_lengths]
+
+        for num_ref in range(1, ref_lengths.max(initial=0) + 1):
+            current = np.empty_like(previous)
+            current[:, 0] = num_ref
+            current[:, 1:] = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + (reference[:, num_ref - 1, np.newaxis] != hypothesis))
+
+            # current[j] = min over i <= j of (current[i] + j - i)
+            current = np.minimum.accumulate(current - columns, axis=1) + columns
+
+            result = np.where(ref_lengths == num_ref, current[rows, hyp_lengths], result)
+            previous = current
+
+        distances[chunk] = result
+
+    return distances
+
+
+def character_error_rate(references, hypotheses):
+    """
+    This function is for calculating the character error rate (CER) of multiple transcripts, as the total edit distance divided by the total reference length.
+
+    Parameters:
+        references (list): List variable containing the true transcripts (string)
+        hypotheses (list): List variable containing the decoded transcripts (string)
+
+    Returns:
+        cer (float): The character error rate
+
+    """
+
+    errors = int(edit_distances(references=list(references), hypotheses=list(hypotheses)).sum())
+
+    return errors / max(sum([len(reference) for reference in references]), 1)
+
+
+def word_error_rate(references, hypotheses):
+    """
+    This function is for calculating the word error rate (WER) of multiple transcripts, as the total word-level edit distance divided by the total number of reference words.
+
+    Parameters:
+        references (list): List variable containing the true transcripts (string)
+        hypotheses (list): List variable containing the decoded transcripts (string)
+
+    Returns:
+        wer (float): The word error rate
+
+    """
+
+    errors = int(edit_distances(references=[reference.split() for reference in references], hypotheses=[hypothesis.split() for hypothesis in hypotheses]).sum())
+
+    return errors / max(sum([len(reference.split()) for reference in references]), 1)
@@ -13,7 +13,7 @@ Author:
 import tensorflow as tf
 
 
-def baseline_bilstm(input_shape, lstm_units, output_size=34):
+def baseline_bilstm(input_shape, lstm_units, output_size=34, precision='float32'):
     """
     This function is for generating a simple Bidirectional LSTM Neural Network model for baseline results.
 
@@ -21,49 +21,150 @@ def baseline_bilstm(input_shape, lstm_units, output_size=34):
         input_shape (tuple): Tuple variable containing the shape of the data that will be sent as an input to the network
         lstm_units (int): Integer variable to determine the size of the LSTM layers
         output_size (int): Integer variable containing the expected size of the output of the network (default is 34, as there are 31 letters in the Macedonian alphabet + the whitespace character, blank token and end token)
+        precision (string): {'float32', 'mixed_float16', 'mixed_bfloat16'} String variable containing the Keras dtype policy of the hidden layers (default is 'float32')
+                            With a mixed policy the computations are done in 16-bit floats and the weights are kept in float32, the output layer is always computed in float32
+                            (when training with 'mixed_float16', wrap the optimizer in tf.keras.mixed_precision.LossScaleOptimizer)
 
     Returns:
         model (keras model): Keras model of the generated BiLSTM Neural Network to be used for training
 
     """
 
+    if precision not in ('float32', 'mixed_float16', 'mixed_bfloat16'):
+        raise ValueError('Wrong input for precision argument! Possible inputs: \'float32\', \'mixed_float16\', \'mixed_bfloat16\'')
+
+    policy = tf.keras.mixed_precision.Policy(precision)
+
     input_layer = tf.keras.layers.Input(name='input_layer', shape=input_shape)
 
-    conv_layer_1 = tf.keras.layers.Conv1D(name='conv1D_1', kernel_size=8, strides=2, padding='valid', filters=256, activation='relu')(input_layer)
-    norm_1 = tf.keras.layers.BatchNormalization()(conv_layer_1)
+    conv_layer_1 = tf.keras.layers.Conv1D(name='conv1D_1', kernel_size=8, strides=2, padding='valid', filters=256, activation='relu', dtype=policy)(input_layer)
+    norm_1 = tf.keras.layers.BatchNormalization(dtype=policy)(conv_layer_1)
 
-    conv_layer_2 = tf.keras.layers.Conv1D(name='conv1D_2', kernel_size=8, strides=2, padding='valid', filters=256, activation='relu')(norm_1)
-    norm_2 = tf.keras.layers.BatchNormalization()(conv_layer_2)
+    conv_layer_2 = tf.keras.layers.Conv1D(name='conv1D_2', kernel_size=8, strides=2, padding='valid', filters=256, activation='relu', dtype=policy)(norm_1)
+    norm_2 = tf.keras.layers.BatchNormalization(dtype=policy)(conv_layer_2)
 
-    conv_layer_3 = tf.keras.layers.Conv1D(name='conv1D_3', kernel_size=8, strides=2, padding='valid', filters=256, activation='relu')(norm_2)
-    norm_3 = tf.keras.layers.BatchNormalization()(conv_layer_3)
+    conv_layer_3 = tf.keras.layers.Conv1D(name='conv1D_3', kernel_size=8, strides=2, padding='valid', filters=256, activation='relu', dtype=policy)(norm_2)
+    norm_3 = tf.keras.layers.BatchNormalization(dtype=policy)(conv_layer_3)
 
-    lstm_forward_1 = tf.keras.layers.GRU(name='lstm_f1', units=lstm_units, return_sequences=True, activation='tanh')
-    lstm_backward_1 = tf.keras.layers.GRU(name='lstm_b1', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True)
+    lstm_forward_1 = tf.keras.layers.GRU(name='lstm_f1', units=lstm_units, return_sequences=True, activation='tanh', dtype=policy)
+    lstm_backward_1 = tf.keras.layers.GRU(name='lstm_b1', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True, dtype=policy)
 
-    bilstm_layer_1 = tf.keras.layers.Bidirectional(name='bilstm_1', layer=lstm_forward_1, backward_layer=lstm_backward_1)(norm_3)
-    norm_4 = tf.keras.layers.BatchNormalization()(bilstm_layer_1)
+    bilstm_layer_1 = tf.keras.layers.Bidirectional(name='bilstm_1', layer=lstm_forward_1, backward_layer=lstm_backward_1, dtype=policy)(norm_3)
+    norm_4 = tf.keras.layers.BatchNormalization(dtype=policy)(bilstm_layer_1)
 
-    lstm_forward_2 = tf.keras.layers.GRU(name='lstm_f2', units=lstm_units, return_sequences=True, activation='tanh')
-    lstm_backward_2 = tf.keras.layers.GRU(name='lstm_b2', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True)
+    lstm_forward_2 = tf.keras.layers.GRU(name='lstm_f2', units=lstm_units, return_sequences=True, activation='tanh', dtype=policy)
+    lstm_backward_2 = tf.keras.layers.GRU(name='lstm_b2', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True, dtype=policy)
 
-    bilstm_layer_2 = tf.keras.layers.Bidirectional(name='bilstm_2', layer=lstm_forward_2, backward_layer=lstm_backward_2)(norm_4)
-    norm_5 = tf.keras.layers.BatchNormalization()(bilstm_layer_2)
+    bilstm_layer_2 = tf.keras.layers.Bidirectional(name='bilstm_2', layer=lstm_forward_2, backward_layer=lstm_backward_2, dtype=policy)(norm_4)
+    norm_5 = tf.keras.layers.BatchNormalization(dtype=policy)(bilstm_layer_2)
 
-    lstm_forward_3 = tf.keras.layers.GRU(name='lstm_f3', units=lstm_units, return_sequences=True, activation='tanh')
-    lstm_backward_3 = tf.keras.layers.GRU(name='lstm_b3', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True)
+    lstm_forward_3 = tf.keras.layers.GRU(name='lstm_f3', units=lstm_units, return_sequences=True, activation='tanh', dtype=policy)
+    lstm_backward_3 = tf.keras.layers.GRU(name='lstm_b3', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True, dtype=policy)
 
-    bilstm_layer_3 = tf.keras.layers.Bidirectional(name='bilstm_3', layer=lstm_forward_3, backward_layer=lstm_backward_3)(norm_5)
-    norm_6 = tf.keras.layers.BatchNormalization()(bilstm_layer_3)
+    bilstm_layer_3 = tf.keras.layers.Bidirectional(name='bilstm_3', layer=lstm_forward_3, backward_layer=lstm_backward_3, dtype=policy)(norm_5)
+    norm_6 = tf.keras.layers.BatchNormalization(dtype=policy)(bilstm_layer_3)
 
-    lstm_forward_4 = tf.keras.layers.GRU(name='lstm_f4', units=lstm_units, return_sequences=True, activation='tanh')
-    lstm_backward_4 = tf.keras.layers.GRU(name='lstm_b4', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True)
+    lstm_forward_4 = tf.keras.layers.GRU(name='lstm_f4', units=lstm_units, return_sequences=True, activation='tanh', dtype=policy)
+    lstm_backward_4 = tf.keras.layers.GRU(name='lstm_b4', units=lstm_units, return_sequences=True, activation='tanh', go_backwards=True, dtype=policy)
 
-    bilstm_layer_4 = tf.keras.layers.Bidirectional(name='bilstm_4', layer=lstm_forward_4, backward_layer=lstm_backward_4)(norm_6)
-    norm_7 = tf.keras.layers.BatchNormalization()(bilstm_layer_4)
+    bilstm_layer_4 = tf.keras.layers.Bidirectional(name='bilstm_4', layer=lstm_forward_4, backward_layer=lstm_backward_4, dtype=policy)(norm_6)
+    norm_7 = tf.keras.layers.BatchNormalization(dtype=policy)(bilstm_layer_4)
 
-    output_layer = tf.keras.layers.Dense(name='output_layer', units=output_size, activation='softmax')(norm_7)
+    output_layer = tf.keras.layers.Dense(name='output_layer', units=output_size, activation='softmax', dtype='float32')(norm_7)
 
     model = tf.keras.models.Model(inputs=input_layer, outputs=output_layer)
 
     return model
+
+
+def streaming_gru(num_features, lstm_units, output_size=34, stateful=False, precision='float32'):
+    """
+    This function is for generating a unidirectional variant of baseline_bilstm, which can transcribe audio while it is being recorded.
+    The bidirectional GRU layers are replaced by forward-only GRU layers, so each output time step depends only on the past input frames.
+    The same model is built twice: with stateful=False for training on whole audio files, and with stateful=True for streaming inference,
+    where the GRU state is carried between consecutive chunks (the weights are transferred with set_weights, see learning.streaming).
+
+    Parameters:
+        num_features (int): Integer variable containing the number of features of the input (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        lstm_units (int): Integer variable to determine the size of the GRU layers
+        output_size (int): Integer variable containing the expected size of the output of the network (default is 34, see baseline_bilstm)
+        stateful (bool): Boolean variable to determine whether to build the stateful streaming model (with a fixed batch size of 1)
+        precision (string): {'float32', 'mixed_float16', 'mixed_bfloat16'} String variable containing the Keras dtype policy of the hidden layers (see baseline_bilstm)
+
+    Returns:
+        model (keras model): Keras model of the generated GRU Neural Network
+
+    """
+
+    if precision not in ('float32', 'mixed_float16', 'mixed_bfloat16'):
+        raise ValueError('Wrong input for precision argument! Possible inputs: \'float32\', \'mixed_float16\', \'mixed_bfloat16\'')
+
+    policy = tf.keras.mixed_precision.Policy(precision)
+
+    if stateful:
+        input_layer = tf.keras.layers.Input(name='input_layer', batch_shape=(1, None, num_features))
+    else:
+        input_layer = tf.keras.layers.Input(name='input_layer', shape=(None, num_features))
+
+    layer = input_layer
+
+    for num_layer in range(1, 4):
+        layer = tf.keras.layers.Conv1D(name='conv1D_' + str(num_layer), kernel_size=8, strides=2, padding='valid', filters=256, activation='relu', dtype=policy)(layer)
+        layer = tf.keras.layers.BatchNormalization(dtype=policy)(layer)
+
+    for num_layer in range(1, 5):
+        layer = tf.keras.layers.GRU(name='gru_' + str(num_layer), units=lstm_units, return_sequences=True, activation='tanh', stateful=stateful, dtype=policy)(layer)
+        layer = tf.keras.layers.BatchNormalization(dtype=policy)(layer)
+
+    output_layer = tf.keras.layers.Dense(name='output_layer', units=output_size, activation='softmax', dtype='float32')(layer)
+
+    model = tf.keras.models.Model(inputs=input_layer, outputs=output_layer)
+
+    return model
+
+
+def receptive_field(num_layers=3, kernel_size=8, strides=2):
+    """
+    This function is for calculating the number of input frames seen by a single output time step of the Conv1D layers, and the number of input frames between neighbouring output time steps.
+
+    Parameters:
+        num_layers (int): Integer variable containing the number of Conv1D layers (default is 3, as in baseline_bilstm and streaming_gru)
+        kernel_size (int): Integer variable containing the kernel size of the Conv1D layers
+        strides (int): Integer variable containing the strides of the Conv1D layers
+
+    Returns:
+        field (int): The number of input frames of each output time step (50 for the default layers)
+        step (int): The number of input frames between neighbouring output time steps (8 for the default layers)
+
+    """
+
+    field, step = 1, 1
+
+    for _ in range(num_layers):
+        field = field + (kernel_size - 1) * step
+        step = step * strides
+
+    return field, step
+
+
+def output_length(input_length, num_layers=3, kernel_size=8, strides=2):
+    """
+    This function is for calculating the number of time steps of the output of the model from the number of frames of the input, as reduced by the 'valid' Conv1D layers.
+
+    Parameters:
+        input_length: Integer, NumPy array or tensor containing the number of frames of each input
+        num_layers (int): Integer variable containing the number of Conv1D layers (default is 3, as in baseline_bilstm)
+        kernel_size (int): Integer variable containing the kernel size of the Conv1D layers
+        strides (int): Integer variable containing the strides of the Conv1D layers
+
+    Returns:
+        output_length: The number of time steps of the output for each input (0 for inputs shorter than the receptive field)
+
+    """
+
+    length = input_length
+
+    for _ in range(num_layers):
+        length = (length - kernel_size) // strides + 1
+
+    return tf.maximum(length, 0)
@@ -0,0 +1,175 @@
+"""
+Functions for streaming (chunked) speech recognition with the stateful unidirectional model.
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import numpy as np
+from feature_extraction.mel import batch_mfcc
+from learning.models import streaming_gru, receptive_field
+from learning.decode import indices_to_text
+
+
+def to_stateful(model, precision='float32'):
+    """
+    This function is for building the stateful streaming copy of a trained (stateless) streaming_gru model, with the same weights.
+
+    Parameters:
+        model (keras model): Trained Keras model generated by learning.models.streaming_gru with stateful=False
+        precision (string): {'float32', 'mixed_float16', 'mixed_bfloat16'} String variable containing the Keras dtype policy of the hidden layers
+
+    Returns:
+        stateful_model (keras model): The stateful Keras model (batch size of 1)
+
+    """
+
+    stateful_model = streaming_gru(num_features=model.input_shape[-1], lstm_units=model.get_layer('gru_1').units, output_size=model.output_shape[-1], stateful=True, precision=precision)
+    stateful_model.set_weights(model.get_weights())
+
+    return stateful_model
+
+
+def start_stream(model, sampling_rate=16000, num_coeff=13, mean=None, std=None, blank_index=-1):
+    """
+    This function is for starting the transcription of a new audio stream, resetting the GRU state of the model.
+
+    Parameters:
+        model (keras model): Stateful Keras model (see to_stateful)
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        num_coeff (int): Integer variable containing the number of mel-frequency cepstral coefficients (number of features of the model)
+        mean (float): Float variable containing the mean used for normalizing the features (default is None, which uses the running mean of the stream so far)
+        std (float): Float variable containing the standard deviation used for normalizing the features (default is None, which uses the running standard deviation of the stream so far)
+        blank_index (int): Integer variable containing the index of the blank token (default is -1, the last class, as in learning.train.ctc_loss)
+
+    Returns:
+        state (dict): Dictionary containing the state of the stream, to be passed to stream_chunk
+
+    """
+
+    model.reset_states()
+    field, step = receptive_field()
+
+    return {'model': model, 'sampling_rate': sampling_rate, 'num_coeff': num_coeff, 'mean': mean, 'std': std,
+            'frame_length': int(np.floor(0.025 * sampling_rate + 0.5)), 'frame_step': int(np.floor(0.01 * sampling_rate + 0.5)),
+            'field': field, 'step': step, 'blank_index': blank_index % model.output_shape[-1],
+            'audio': np.zeros(0, dtype=np.float32), 'last_sample': 0.0, 'frames': np.zeros((0, num_coeff), dtype=np.float32),
+            'count': 0, 'sum': 0.0, 'sum_squares': 0.0, 'previous': None, 'indices': [], 'samples': 0, 'outputs': 0}
+
+
+def stream_chunk(state, audio_chunk):
+    """
+    This function is for transcribing the next chunk of an audio stream.
+    Only the complete MFCC frames are computed (the overlapping samples of the next frame are kept for the next chunk),
+    and only the output time steps whose whole receptive field has arrived are computed (the overlapping frames of the Conv1D layers are kept for the next chunk),
+    so every audio sample and every output time step is processed exactly once and the GRU layers continue from their state after the previous chunk.
+
+    Parameters:
+        state (dict): Dictionary containing the state of the stream (see start_stream), updated in place
+        audio_chunk (np.ndarray): NumPy array containing the next raw audio samples
+
+    Returns:
+        transcript (string): The partial transcript of the stream so far (greedy CTC decoding)
+
+    """
+
+    audio_chunk = np.asarray(audio_chunk, dtype=np.float32)
+    state['samples'] = state['samples'] + len(audio_chunk)
+
+    # the pre-emphasis is applied here, across the chunk boundaries, so the MFCC frames are equal to those of the whole audio file
+    if len(audio_chunk):
+        emphasized = np.empty_like(audio_chunk)
+        emphasized[0] = audio_chunk[0] - 0.97 * state['last_sample'] if state['samples'] > len(audio_chunk) else audio_chunk[0]
+        emphasized[1:] = audio_chunk[1:] - 0.97 * audio_chunk[:-1]
+        state['last_sample'] = float(audio_chunk[-1])
+        state['audio'] = np.concatenate([state['audio'], emphasized])
+
+    add_frames(state=state, num_frames=(len(state['audio']) - state['frame_length']) // state['frame_step'] + 1 if len(state['audio']) >= state['frame_length'] else 0)
+
+    return run_model(state=state)
+
+
+def finish_stream(state):
+    """
+    This function is for transcribing the remaining audio of a finished stream, zero-padding the last MFCC frame (as done for whole audio files).
+    The result is equal to transcribing the whole audio file at once (with the same normalization).
+
+    Parameters:
+        state (dict): Dictionary containing the state of the stream (see start_stream)
+
+    Returns:
+        transcript (string): The final transcript of the stream
+
+    """
+
+    remaining = len(state['audio'])
+
+    if remaining > state['frame_length'] - state['frame_step'] or (remaining > 0 and state['count'] == 0):
+        state['audio'] = np.concatenate([state['audio'], np.zeros(state['frame_length'] - remaining, dtype=np.float32)])
+        add_frames(state=state, num_frames=1)
+
+    return run_model(state=state)
+
+
+def add_frames(state, num_frames):
+    """
+    This function is for computing the next complete MFCC frames of the buffered (pre-emphasized) audio of a stream and normalizing them.
+
+    Parameters:
+        state (dict): Dictionary containing the state of the stream, updated in place
+        num_frames (int): Integer variable containing the number of complete frames in the audio buffer
+
+    Returns:
+        None
+
+    """
+
+    if num_frames <= 0:
+        return
+
+    used = (num_frames - 1) * state['frame_step'] + state['frame_length']
+    frames = batch_mfcc(audio_list=[state['audio'][:used]], sampling_rate=state['sampling_rate'], num_coeff=state['num_coeff'], preemph=0, normalization=False)[0]
+    state['audio'] = state['audio'][num_frames * state['frame_step']:]
+
+    state['count'] = state['count'] + frames.size
+    state['sum'] = state['sum'] + float(frames.sum(dtype=np.float64))
+    state['sum_squares'] = state['sum_squares'] + float(np.einsum('ij,ij->', frames, frames, dtype=np.float64))
+
+    mean = state['mean'] if state['mean'] is not None else state['sum'] / state['count']
+    std = state['std'] if state['std'] is not None else np.sqrt(max(state['sum_squares'] / state['count'] - mean ** 2, 1e-12))
+
+    state['frames'] = np.concatenate([state['frames'], ((frames - mean) / std).astype(np.float32)])
+
+
+def run_model(state):
+    """
+    This function is for running the stateful model on the buffered MFCC frames of a stream whose receptive field is complete, and decoding the new output time steps.
+
+    Parameters:
+        state (dict): Dictionary containing the state of the stream, updated in place
+
+    Returns:
+        transcript (string): The partial transcript of the stream so far
+
+    """
+
+    frames = state['frames']
+    num_outputs = (len(frames) - state['field']) // state['step'] + 1 if len(frames) >= state['field'] else 0
+
+    if num_outputs > 0:
+        used = (num_outputs - 1) * state['step'] + state['field']
+        probabilities = np.asarray(state['model'](frames[np.newaxis, :used], training=False))[0]
+        state['frames'] = frames[num_outputs * state['step']:]
+        state['outputs'] = state['outputs'] + num_outputs
+
+        for index in np.argmax(probabilities, axis=-1):
+            if index != state['previous'] and index != state['blank_index']:
+                state['indices'].append(int(index))
+            state['previous'] = index
+
+    return indices_to_text(state['indices'])
@@ -11,6 +11,7 @@ Author:
 """
 
 import tensorflow as tf
+from learning.models import output_length
 
 
 def ctc_loss(logits, labels, logit_length, label_length):
@@ -31,7 +32,7 @@ def ctc_loss(logits, labels, logit_length, label_length):
     return tf.nn.ctc_loss(labels=labels, logits=logits, label_length=label_length, logit_length=logit_length, logits_time_major=False, unique=None, blank_index=-1, name=None)
 
 
-def train_file(x, y, optimizer, model):
+def train_file(x, y, optimizer, model, logit_length=None, label_length=None):
     """
     This function is for training the model on a single sample (audio file)
 
@@ -40,6 +41,8 @@ def train_file(x, y, optimizer, model):
         y : List variable containing the enumerated transcript file for the audio sample
         model (Keras model): Generated Keras model
         optimizer (Keras optimizer): Optimizer to be used during training
+        logit_length : Array containing the number of output time steps of each sample in the batch (default is None, which uses the full padded length, see learning.models.output_length)
+        label_length : Array containing the length of each transcript in the batch (default is None, which uses the full padded length)
 
     Returns:
         None
@@ -49,8 +52,8 @@ def train_file(x, y, optimizer, model):
     with tf.GradientTape() as tape:
         logits = model(x)
         labels = y
-        logits_length = [logits.shape[1]]*logits.shape[0]
-        labels_length = [labels.shape[1]]*labels.shape[0]
+        logits_length = [logits.shape[1]]*logits.shape[0] if logit_length is None else logit_length
+        labels_length = [labels.shape[1]]*labels.shape[0] if label_length is None else label_length
         loss = ctc_loss(logits, labels, logit_length=logits_length, label_length=labels_length)
         loss = tf.reduce_mean(loss)
     grads = tape.gradient(loss, model.trainable_variables)
@@ -63,4 +66,98 @@ def train_batch(model, optimizer, X, Y, epochs):
 
     for step in range(1, epochs):
         loss = train_file(X, Y, optimizer, model)
-        print('Epoch {}, Loss: {}'.format(step, loss))
\ No newline at end of file
+        print('Epoch {}, Loss: {}'.format(step, loss))
+
+
+def make_train_step(model, optimizer, num_features, boundaries=None):
+    """
+    This function is for compiling the training step of the model into a TensorFlow graph (tf.function), using the true lengths of the samples.
+    The loss is accumulated in a metric on the device, so the step never has to wait for the host to read its result.
+
+    Parameters:
+        model (Keras model): Generated Keras model
+        optimizer (Keras optimizer): Optimizer to be used during training (a tf.keras.mixed_precision.LossScaleOptimizer when training with 'mixed_float16', see learning.models.baseline_bilstm)
+        num_features (int): Integer variable containing the number of features of the input (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        boundaries (list): List variable containing the bucket boundaries of the dataset, a graph with a fixed time axis is compiled upfront for each bucket (default is None, which compiles a single graph for any length)
+
+    Returns:
+        train_step (callable): Function running a single training step on (x, y, x_length, y_length), returning the loss
+        loss_metric (tf.keras.metrics.Mean): Metric accumulating the mean loss of the training steps
+
+    """
+
+    loss_metric = tf.keras.metrics.Mean(name='loss')
+    loss_scaling = isinstance(optimizer, tf.keras.mixed_precision.LossScaleOptimizer)
+
+    def step(x, y, x_length, y_length):
+        with tf.GradientTape() as tape:
+            logits = model(x, training=True)
+            loss = ctc_loss(logits, y, logit_length=output_length(x_length), label_length=y_length)
+            loss = tf.reduce_mean(loss)
+
+            if loss_scaling:
+                scaled_loss = optimizer.get_scaled_loss(loss)
+
+        if loss_scaling:
+            grads = optimizer.get_unscaled_gradients(tape.gradient(scaled_loss, model.trainable_variables))
+        else:
+            grads = tape.gradient(loss, model.trainable_variables)
+        optimizer.apply_gradients(zip(grads, model.trainable_variables))
+        loss_metric.update_state(loss)
+
+        return loss
+
+    def signature(length):
+        return [tf.TensorSpec(shape=(None, length, num_features), dtype=tf.float32), tf.TensorSpec(shape=(None, None), dtype=tf.int32),
+                tf.TensorSpec(shape=(None,), dtype=tf.int32), tf.TensorSpec(shape=(None,), dtype=tf.int32)]
+
+    generic_step = tf.function(step, input_signature=signature(None))
+
+    if boundaries is None:
+        return generic_step, loss_metric
+
+    bucket_steps = {boundary - 1: tf.function(step).get_concrete_function(*signature(boundary - 1)) for boundary in boundaries}
+
+    def train_step(x, y, x_length, y_length):
+        return bucket_steps.get(x.shape[1], generic_step)(x, y, x_length, y_length)
+
+    return train_step, loss_metric
+
+
+def train_dataset(model, optimizer, dataset, epochs, boundaries=None, log_interval=100, verbose=False):
+    """
+    This function is for training the model on a streaming dataset of minibatches (see learning.dataset.build_dataset), using a compiled training step (see make_train_step)
+
+    Parameters:
+        model (Keras model): Generated Keras model
+        optimizer (Keras optimizer): Optimizer to be used during training
+        dataset (tf.data.Dataset): Dataset of (features, labels, feature_length, label_length) minibatches
+        epochs (int): Integer variable containing the number of passes through the dataset
+        boundaries (list): List variable containing the bucket boundaries of the dataset (default is None, see make_train_step)
+        log_interval (int): Integer variable containing the number of steps between printing the mean loss (the only time the loss is read from the device)
+        verbose (bool): Boolean variable to determine whether to print the mean loss
+
+    Returns:
+        loss (float): The mean loss of the last epoch
+
+    """
+
+    num_features = dataset.element_spec[0].shape[-1]
+    train_step, loss_metric = make_train_step(model=model, optimizer=optimizer, num_features=num_features, boundaries=boundaries)
+
+    epoch_loss = tf.keras.metrics.Mean(name='epoch_loss')
+
+    for epoch in range(1, epochs + 1):
+        epoch_loss.reset_state()
+
+        for step, (x, y, x_length, y_length) in enumerate(dataset, start=1):
+            epoch_loss.update_state(train_step(x, y, x_length, y_length))
+
+            if verbose and step % log_interval == 0:
+                print('Epoch {}, Step {}, Loss: {:.4f}'.format(epoch, step, float(loss_metric.result())))
+                loss_metric.reset_state()
+
+        if verbose:
+            print('Epoch {}, Loss: {:.4f}'.format(epoch, float(epoch_loss.result())))
+
+    return float(epoch_loss.result())
@@ -16,11 +16,11 @@ import numpy as np
 from matplotlib import pyplot as plt
 import seaborn as sns
 import h5py
-import librosa as lb
 from feature_extraction.spectral import generate_mfcc, generate_spectrogram
 from refactoring.transcript import refactor_all, index_transcript, format_transcript
 from refactoring.files import rename_files
-from preprocessing.audio import resample_audio
+from preprocessing.signal import resample_audio
+from utils.audio_cache import load_audio
 from utils.utils import load_mfcc_batch, plot_mfcc, plot_spectrogram, load_spectrogram_batch, plot_all
 
 
@@ -29,6 +29,7 @@ if __name__ == '__main__':
     data_path = 'F:\\Speech_Recognition_Macedonian\\Database\\train'
     rate = 16000
     coeff = 13
+    audio_cache_path = os.path.dirname(data_path) + os.sep + 'audio_cache'
 
     # rename_files(path=data_path, verbose=True)
 
@@ -36,11 +37,11 @@ if __name__ == '__main__':
 
     # refactor_all(path=data_path)
 
-    # generate_mfcc(path=data_path, sampling_rate=rate, num_coeff=coeff, verbose=True)
+    # generate_mfcc(path=data_path, sampling_rate=rate, num_coeff=coeff, audio_cache=audio_cache_path, verbose=True)
 
-    # generate_spectrogram(path=data_path, sampling_rate=rate, verbose=True)
+    # generate_spectrogram(path=data_path, sampling_rate=rate, audio_cache=audio_cache_path, verbose=True)
 
-    audio, _ = lb.load(data_path + os.sep + '8' + os.sep + '000000' + os.sep + '8-000000-0000.wav', sr=rate)
+    audio = load_audio(path=data_path + os.sep + '8' + os.sep + '000000', file_list=['8-000000-0000.wav'], sampling_rate=rate, audio_cache=audio_cache_path)[0]
 
     batch_mfcc = load_mfcc_batch(path=data_path + os.sep + '8' + os.sep + '000000')
 
@@ -11,16 +11,27 @@ Author:
 """
 
 import os
-import librosa as lb
+import math
+import soxr
+import numpy as np
+import soundfile as sf
+from scipy import signal
+from utils.parallel import list_batches, run_batches
+from utils.manifest import manifest_clips
 
 
-def resample_audio(path, sampling_rate, verbose=False):
+def resample_audio(path, sampling_rate, res_type='soxr_hq', workers=1, manifest=None, verbose=False):
     """
     This function is for resampling audio files to a set sampling rate.
+    Only the audio files whose header shows a different sampling rate are read and rewritten, the others are skipped without decoding.
+    The audio files are rewritten in place, so a manifest of the dataset must be updated afterwards (see utils.manifest.update_manifest).
 
     Parameters:
         path (string): String variable containing the path to the main data folder (containing multiple folders of literature works, which contain multiple folders of batches of audio)
         sampling_rate (int): Integer variable containing the value of the desired sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        res_type (string): {'soxr_vhq', 'soxr_hq', 'soxr_mq', 'soxr_lq', 'polyphase'} String variable containing the resampler: the quality levels of the SoX resampler, or the scipy polyphase filter
+        workers (int): Integer variable containing the number of worker processes, each processing a whole batch folder at a time (default is 1; None uses all available cores)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
@@ -28,40 +39,90 @@ def resample_audio(path, sampling_rate, verbose=False):
 
     """
 
-    folder_list = os.listdir(path)
+    if res_type not in ('soxr_vhq', 'soxr_hq', 'soxr_mq', 'soxr_lq', 'polyphase'):
+        raise ValueError('Wrong input for res_type argument! Possible inputs: \'soxr_vhq\', \'soxr_hq\', \'soxr_mq\', \'soxr_lq\', \'polyphase\'')
+
+    batch_list = list_batches(path=path, manifest=manifest)
 
     if verbose:
         print('Resampling...')
         print()
 
-    for folder in folder_list:
-        if verbose:
-            print('Loading folder', folder, '...')
+    tasks = [{'path': path + os.sep + folder + os.sep + batch, 'sampling_rate': sampling_rate, 'res_type': res_type, 'manifest': manifest} for folder, batch in batch_list]
+    results = run_batches(function=resample_batch, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
 
-        batch_list = sorted(os.listdir(path + os.sep + folder))
+    if verbose:
+        print()
+        print('Resampled:', sum([resampled for resampled, _ in results]), 'files, skipped:', sum([skipped for _, skipped in results]), 'files (already at', sampling_rate, 'Hz)')
+        print('Resampling Successful!')
+        print()
 
-        for batch in batch_list:
-            if verbose:
-                print('Loading next batch...')
 
-            file_list = sorted(os.listdir(path + os.sep + folder + os.sep + batch))
+def resample_batch(path, sampling_rate, res_type='soxr_hq', manifest=None):
+    """
+    This function is for resampling the audio files in a single batch folder to a set sampling rate.
+    Each resampled audio file is written to a temporary file in the same folder, which then replaces the original file (an interrupted run never leaves a partially written audio file).
+    The sample format (subtype) of the original audio file is kept.
 
-            for file in file_list:
-                if not file.endswith('.wav'):
-                    continue
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        sampling_rate (int): Integer variable containing the value of the desired sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        res_type (string): {'soxr_vhq', 'soxr_hq', 'soxr_mq', 'soxr_lq', 'polyphase'} String variable containing the resampler (see resample_audio)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folder (default is None, see utils.manifest)
 
-                audio, _ = lb.load(path + os.sep + folder + os.sep + batch + os.sep + file, sr=sampling_rate)
+    Returns:
+        resampled (int): The number of resampled audio files
+        skipped (int): The number of audio files already at the set sampling rate
 
-                lb.output.write_wav(path + os.sep + folder + os.sep + batch + os.sep + file, audio, sr=sampling_rate)
+    """
 
-            if verbose:
-                print('Batch', batch, 'done!')
-                print()
+    if manifest is not None:
+        clips = [(clip['file'], clip['rate']) for clip in manifest_clips(manifest=manifest, path=path)]
+    else:
+        clips = [(file, None) for file in sorted(os.listdir(path)) if file.endswith('.wav')]
 
-        if verbose:
-            print('Folder', folder, 'done!')
-            print()
+    resampled = 0
 
-    if verbose:
-        print('Resampling Successful!')
-        print()
+    for file, rate in clips:
+        if rate is None:
+            rate = sf.info(path + os.sep + file).samplerate
+
+        if rate == sampling_rate:
+            continue
+
+        info = sf.info(path + os.sep + file)
+        audio, native_rate = sf.read(path + os.sep + file, dtype='float32', always_2d=True)
+        audio = resample(audio=audio.mean(axis=1), native_rate=native_rate, sampling_rate=sampling_rate, res_type=res_type)
+
+        temp_path = path + os.sep + file + '.tmp'
+        sf.write(temp_path, audio, samplerate=sampling_rate, subtype=info.subtype, format='WAV')
+        os.replace(temp_path, path + os.sep + file)
+
+        resampled = resampled + 1
+
+    return resampled, len(clips) - resampled
+
+
+def resample(audio, native_rate, sampling_rate, res_type='soxr_hq'):
+    """
+    This function is for resampling a single audio signal.
+
+    Parameters:
+        audio (np.ndarray): NumPy array containing the raw (mono) audio signal
+        native_rate (int): Integer variable containing the sampling rate of the audio signal
+        sampling_rate (int): Integer variable containing the value of the desired sampling rate
+        res_type (string): {'soxr_vhq', 'soxr_hq', 'soxr_mq', 'soxr_lq', 'polyphase'} String variable containing the resampler (see resample_audio)
+
+    Returns:
+        audio (np.ndarray): float32 NumPy array containing the resampled audio signal
+
+    """
+
+    if native_rate == sampling_rate:
+        return audio
+
+    if res_type == 'polyphase':
+        divisor = math.gcd(native_rate, sampling_rate)
+        return signal.resample_poly(audio, sampling_rate // divisor, native_rate // divisor).astype(np.float32)
+
+    return soxr.resample(audio, native_rate, sampling_rate, quality=res_type[len('soxr_'):].upper()).astype(np.float32, copy=False)
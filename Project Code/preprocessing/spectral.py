@@ -45,3 +45,198 @@ def padding(data, maximum):
     """
 
     return np.pad(data, ((0, maximum - len(data)), (0, 0)), 'constant', constant_values=0.)
+
+
+def normalize_batch(clips, normalization='utterance', mean=None, std=None, maximum=None, out=None, mask=False):
+    """
+    This function is for normalizing and zero-padding the features of multiple audio files (a minibatch) into a single 3D array.
+    Each audio file is normalized while it is written into the output array, without temporary arrays, equal to calling normalize (or normalize_global) and padding on each of them.
+
+    Parameters:
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features) of the audio files
+        normalization (string): {'utterance', 'global', 'none'} String variable to determine whether to normalize each audio file with the mean and standard deviation of all its features,
+                                or each feature with its mean and standard deviation over the entire dataset (see preprocessing.statistics), or only to pad the features
+        mean (np.ndarray): NumPy array containing the mean of each feature over the entire dataset (only used with 'global' normalization)
+        std (np.ndarray): NumPy array containing the standard deviation of each feature over the entire dataset (only used with 'global' normalization)
+        maximum (int): The length to pad to (default is None, which pads to the longest audio file in the minibatch)
+        out (np.ndarray): Preallocated contiguous float32 NumPy array, reused between calls, whose memory holds the output (default is None, which allocates a new array)
+                          Must have at least (number of audio files) * maximum * (number of features) elements, its shape does not matter
+        mask (bool): Boolean variable to determine whether to also create the boolean mask of the frames which are not padding
+
+    Returns:
+        data (np.ndarray): 3D contiguous float32 NumPy array containing the padded features (axis 0 ==> audio files; axis 1 ==> data through time; axis 2 ==> features)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+        frame_mask (np.ndarray): 2D boolean NumPy array (axis 0 ==> audio files; axis 1 ==> data through time), None unless mask is set
+
+    """
+
+    if normalization not in ('utterance', 'global', 'none'):
+        raise ValueError('Wrong input for normalization argument! Possible inputs: \'utterance\', \'global\', \'none\'')
+
+    lengths = np.array([len(clip) for clip in clips], dtype=np.int64)
+
+    if maximum is None:
+        maximum = int(lengths.max()) if len(lengths) else 0
+
+    num_features = clips[0].shape[1] if clips else 0
+    size = len(clips) * maximum * num_features
+
+    if out is None:
+        data = np.empty((len(clips), maximum, num_features), dtype=np.float32)
+    elif out.size < size or out.dtype != np.float32 or not out.flags['C_CONTIGUOUS']:
+        raise ValueError('Wrong size or type of the output array! Expected a contiguous float32 array of at least ' + str(size) + ' elements')
+    else:
+        data = out.reshape(-1)[:size].reshape(len(clips), maximum, num_features)
+
+    if normalization == 'global':
+        mean = mean.astype(np.float32, copy=False)
+        std = std.astype(np.float32, copy=False)
+
+    for index, clip in enumerate(clips):
+        target = data[index, :len(clip)]
+
+        if normalization == 'utterance' and clip.size:
+            clip_mean = clip.sum(dtype=np.float64) / clip.size
+            clip_std = np.sqrt(max(np.einsum('ij,ij->', clip, clip, dtype=np.float64) / clip.size - clip_mean ** 2, 0.))
+
+            np.subtract(clip, np.float32(clip_mean), out=target)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                target /= np.float32(clip_std)
+        elif normalization == 'global':
+            np.subtract(clip, mean, out=target)
+            target /= std
+        else:
+            target[...] = clip
+
+        data[index, len(clip):] = 0
+
+    frame_mask = np.arange(maximum)[None, :] < lengths[:, None] if mask else None
+
+    return data, lengths, frame_mask
+
+
+def normalize_segments(data, lengths):
+    """
+    This function is for in-place normalization of the features of multiple audio files stored one after another (through time) in a single array.
+    Each audio file is normalized separately, equal to calling normalize on each of them.
+
+    Parameters:
+        data (np.ndarray): 2D NumPy array containing the concatenated features of multiple audio files (axis 0 ==> data through time; axis 1 ==> features)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+
+    Returns:
+        data (np.ndarray): The same NumPy array, containing the normalized data
+
+    """
+
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    counts = np.maximum(np.asarray(lengths) * data.shape[1], 1)
+
+    mean = (np.bincount(segments, weights=data.sum(axis=1, dtype=np.float64), minlength=len(lengths)) / counts).astype(data.dtype)
+    data -= mean[segments, None]
+
+    std = np.sqrt(np.bincount(segments, weights=np.einsum('ij,ij->i', data, data, dtype=np.float64), minlength=len(lengths)) / counts).astype(data.dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        data /= std[segments, None]
+
+    return data
+
+
+def segment_statistics(data, lengths):
+    """
+    This function is for calculating the mean and standard deviation of each feature of each audio file, for multiple audio files stored one after another (through time) in a single array.
+
+    Parameters:
+        data (np.ndarray): 2D NumPy array containing the concatenated features of multiple audio files (axis 0 ==> data through time; axis 1 ==> features)
+        lengths (np.ndarray): NumPy array containing the number of frames of each audio file
+
+    Returns:
+        mean (np.ndarray): 2D float32 NumPy array containing the mean of each feature of each audio file (axis 0 ==> audio files; axis 1 ==> features), zeros for audio files without frames
+        std (np.ndarray): 2D float32 NumPy array containing the standard deviation of each feature of each audio file
+
+    """
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    counts = np.maximum(np.asarray(lengths), 1)[:, None]
+
+    sums = np.zeros((len(data) + 1, data.shape[1]))
+    np.cumsum(data, axis=0, dtype=np.float64, out=sums[1:])
+    mean = (sums[offsets[1:]] - sums[offsets[:-1]]) / counts
+
+    np.cumsum(np.square(data, dtype=np.float64), axis=0, out=sums[1:])
+    variance = (sums[offsets[1:]] - sums[offsets[:-1]]) / counts - mean ** 2
+
+    return mean.astype(np.float32), np.sqrt(np.maximum(variance, 0)).astype(np.float32)
+
+
+def feature_statistics(data):
+    """
+    This function is for calculating the per-feature statistics (number of frames, mean and sum of squared deviations) of the features of one or more audio files,
+    as accumulators that can be merged with merge_statistics (so the statistics of the entire dataset can be calculated in parts, by multiple workers).
+
+    Parameters:
+        data (np.ndarray): 2D NumPy array containing the features (axis 0 ==> data through time; axis 1 ==> features)
+
+    Returns:
+        statistics (tuple): Tuple of the number of frames (int), the mean (float64 NumPy array) and the sum of squared deviations from the mean (float64 NumPy array) of each feature
+
+    """
+
+    count = len(data)
+
+    if count == 0:
+        return 0, np.zeros(data.shape[1]), np.zeros(data.shape[1])
+
+    mean = data.mean(axis=0, dtype=np.float64)
+    deviations = data - mean.astype(data.dtype)
+
+    return count, mean, np.einsum('ij,ij->j', deviations, deviations, dtype=np.float64)
+
+
+def merge_statistics(first, second):
+    """
+    This function is for merging the statistics of two disjoint parts of the data (Chan et al. parallel variance algorithm), equal to calculating them over both parts at once.
+
+    Parameters:
+        first (tuple): Tuple of the number of frames, the mean and the sum of squared deviations of the first part (see feature_statistics)
+        second (tuple): Tuple of the number of frames, the mean and the sum of squared deviations of the second part
+
+    Returns:
+        statistics (tuple): Tuple of the number of frames, the mean and the sum of squared deviations of both parts
+
+    """
+
+    count = first[0] + second[0]
+
+    if first[0] == 0 or second[0] == 0:
+        return first if second[0] == 0 else second
+
+    delta = second[1] - first[1]
+
+    return count, first[1] + delta * second[0] / count, first[2] + second[2] + delta ** 2 * first[0] * second[0] / count
+
+
+def normalize_global(data, mean, std, out=None):
+    """
+    This function is for normalizing features with per-feature statistics of the entire dataset (see preprocessing.statistics).
+
+    Parameters:
+        data (np.ndarray): 2D NumPy array containing the features (axis 0 ==> data through time; axis 1 ==> features)
+        mean (np.ndarray): NumPy array containing the mean of each feature
+        std (np.ndarray): NumPy array containing the standard deviation of each feature
+        out (np.ndarray): NumPy array to write the normalized data to (default is None, which normalizes data in place; data must be writable)
+
+    Returns:
+        data (np.ndarray): NumPy array containing the normalized data
+
+    """
+
+    if out is None:
+        out = data
+
+    np.subtract(data, mean.astype(out.dtype, copy=False), out=out)
+    out /= std.astype(out.dtype, copy=False)
+
+    return out
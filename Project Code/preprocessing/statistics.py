@@ -0,0 +1,232 @@
+"""
+Functions for calculating the per-feature statistics of the generated features over the entire dataset, and normalizing the features with them
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import h5py
+import numpy as np
+from functools import reduce
+from utils.storage import FEATURE_NAMES, is_ragged, storage_form, read_clips
+from utils.parallel import list_batches, run_batches
+from preprocessing.spectral import feature_statistics, merge_statistics, normalize_global
+
+STATISTICS_SUFFIX = '-statistics.h5'
+
+
+def write_batch_statistics(h5_file, clips, previous=None):
+    """
+    This function is for calculating the statistics of the (not yet normalized) features of a batch and storing them in its .h5 file,
+    so the statistics of the entire dataset can later be merged without reading the features again.
+
+    Parameters:
+        h5_file (h5py.File): Opened (writable) .h5 file of the batch folder
+        clips (list): List variable containing the 2D NumPy arrays of features of the audio files in the batch
+        previous (tuple): Tuple of the statistics of the previously written audio files of the batch, merged with the new ones when the batch is written in parts (default is None)
+
+    Returns:
+        statistics (tuple): Tuple of the number of frames, the mean and the sum of squared deviations of each feature (see preprocessing.spectral.feature_statistics)
+
+    """
+
+    statistics = reduce(merge_statistics, [feature_statistics(clip) for clip in clips], *([previous] if previous is not None else []))
+
+    h5_file.attrs['stat_count'] = statistics[0]
+    h5_file.attrs['stat_mean'] = statistics[1]
+    h5_file.attrs['stat_m2'] = statistics[2]
+
+    return statistics
+
+
+def batch_statistics(h5_path, name):
+    """
+    This function is for reading the stored statistics of a .h5 batch file, calculating (and storing) them from its features if they are missing.
+    Raises a ValueError for batch files with features normalized per audio file ('utterance' normalization), whose statistics are not those of the features.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+
+    Returns:
+        statistics (tuple): Tuple of the number of frames, the mean and the sum of squared deviations of each feature
+
+    """
+
+    with h5py.File(name=h5_path, mode='r') as h5_file:
+        if h5_file.attrs.get('normalization') == 'utterance':
+            raise ValueError('The features of ' + h5_path + ' are normalized per audio file! Generate them with normalization=\'global\' or \'none\' first')
+
+        if 'stat_count' in h5_file.attrs:
+            return int(h5_file.attrs['stat_count']), h5_file.attrs['stat_mean'], h5_file.attrs['stat_m2']
+
+        clips = read_clips(h5_file=h5_file, name=name)
+
+        # the stored features are already normalized with the statistics applied to them, the statistics are of the features before the normalization
+        if 'applied_mean' in h5_file.attrs:
+            clips = [clip * h5_file.attrs['applied_std'].astype(np.float32) + h5_file.attrs['applied_mean'].astype(np.float32) for clip in clips]
+
+    with h5py.File(name=h5_path, mode='a') as h5_file:
+        return write_batch_statistics(h5_file=h5_file, clips=clips)
+
+
+def compute_statistics(path, method='mfcc', workers=1, manifest=None, verbose=False):
+    """
+    This function is for calculating the mean and standard deviation of each feature over all audio files of the entire dataset, in a single pass.
+    The statistics of each batch file are calculated in parallel (or read from the file, when stored during the generation of the features) and merged.
+    Raises a ValueError if any batch file has features normalized per audio file (see batch_statistics).
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc', 'fbank', 'delta'} String variable to determine the features (see utils.storage.FEATURE_NAMES)
+        workers (int): Integer variable containing the number of worker processes (default is 1, which processes the batch folders serially)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        mean (np.ndarray): NumPy array containing the mean of each feature
+        std (np.ndarray): NumPy array containing the standard deviation of each feature
+        Creates the <method>-statistics.h5 file in the main data folder (see statistics_path)
+
+    """
+
+    if method not in FEATURE_NAMES:
+        raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\', \'fbank\', \'delta\'')
+
+    name = FEATURE_NAMES[method]
+    batch_list = [(folder, batch) for folder, batch in list_batches(path=path, manifest=manifest)
+                  if os.path.exists(path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5')]
+
+    tasks = [{'h5_path': path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5', 'name': name} for folder, batch in batch_list]
+    results = run_batches(function=batch_statistics, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
+
+    if not results:
+        raise ValueError('No generated .h5 files found! Generate the features first (see feature_extraction.spectral)')
+
+    count, mean, m2 = reduce(merge_statistics, results)
+    std = np.sqrt(np.maximum(m2 / max(count, 1), 1e-12))
+
+    with h5py.File(name=statistics_path(path=path, method=method), mode='w') as h5_file:
+        h5_file.create_dataset(name='Mean', data=mean)
+        h5_file.create_dataset(name='Std', data=std)
+        h5_file.attrs['count'] = count
+
+    if verbose:
+        print('Statistics of', count, 'frames saved!')
+
+    return mean, std
+
+
+def statistics_path(path, method='mfcc'):
+    """
+    This function is for constructing the path to the statistics file of the entire dataset, written by compute_statistics and read by load_statistics.
+    The file is stored in the main data folder next to the folders (like the manifest, see utils.manifest), the functions walking the folders skip it as it is not a directory.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder
+        method (string): {'spectrogram', 'mfcc', 'fbank', 'delta'} String variable to determine the features
+
+    Returns:
+        file_path (string): The path to the statistics file (ex: <path>/mfcc-statistics.h5)
+
+    """
+
+    return path + os.sep + method + STATISTICS_SUFFIX
+
+
+def load_statistics(path, method='mfcc'):
+    """
+    This function is for loading the statistics of the entire dataset calculated by compute_statistics.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder
+        method (string): {'spectrogram', 'mfcc', 'fbank', 'delta'} String variable to determine the features whose statistics are loaded
+
+    Returns:
+        mean (np.ndarray): NumPy array containing the mean of each feature
+        std (np.ndarray): NumPy array containing the standard deviation of each feature
+
+    """
+
+    with h5py.File(name=statistics_path(path=path, method=method), mode='r') as h5_file:
+        return h5_file['Mean'][:], h5_file['Std'][:]
+
+
+def apply_statistics(h5_path, name, mean, std):
+    """
+    This function is for normalizing the features of a .h5 batch file in place (in the file) with the statistics of the entire dataset.
+    The applied statistics are stored in the file: a file already normalized with the same statistics is skipped,
+    and a file normalized with other (outdated) statistics is first restored to the features before the normalization. The padding is never changed.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        mean (np.ndarray): NumPy array containing the mean of each feature
+        std (np.ndarray): NumPy array containing the standard deviation of each feature
+
+    Returns:
+        None
+
+    """
+
+    with h5py.File(name=h5_path, mode='a') as h5_file:
+        if 'applied_mean' in h5_file.attrs and np.array_equal(h5_file.attrs['applied_mean'], mean) and np.array_equal(h5_file.attrs['applied_std'], std):
+            return
+
+        applied = (h5_file.attrs['applied_mean'].astype(np.float32), h5_file.attrs['applied_std'].astype(np.float32)) if 'applied_mean' in h5_file.attrs else None
+        dataset = h5_file[name]
+
+        if is_ragged(h5_file):
+            clips = [dataset[:]]
+        else:
+            clips = read_clips(h5_file=h5_file, name=name)
+
+        for clip in clips:
+            if applied is not None:
+                clip *= applied[1]
+                clip += applied[0]
+
+            normalize_global(data=clip, mean=mean, std=std)
+
+        if is_ragged(h5_file):
+            dataset[:] = clips[0]
+        elif storage_form(h5_file) == 'clip_major':
+            for index, clip in enumerate(clips):
+                dataset[index, :len(clip)] = clip
+        else:
+            for index, clip in enumerate(clips):
+                dataset[:len(clip), :, index] = clip
+
+        h5_file.attrs['applied_mean'] = mean
+        h5_file.attrs['applied_std'] = std
+
+
+def apply_statistics_all(path, method='mfcc', workers=1, manifest=None, verbose=False):
+    """
+    This function is for normalizing the features of all .h5 batch files in place with the statistics of the entire dataset (see compute_statistics and apply_statistics).
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc', 'fbank', 'delta'} String variable to determine the features to be normalized
+        workers (int): Integer variable containing the number of worker processes (default is 1, which processes the batch folders serially)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        None
+
+    """
+
+    mean, std = load_statistics(path=path, method=method)
+    name = FEATURE_NAMES[method]
+    batch_list = [(folder, batch) for folder, batch in list_batches(path=path, manifest=manifest)
+                  if os.path.exists(path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5')]
+
+    tasks = [{'h5_path': path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5', 'name': name, 'mean': mean, 'std': std} for folder, batch in batch_list]
+    run_batches(function=apply_statistics, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
@@ -32,7 +32,8 @@ def rename_files(path, verbose=False):
     batch_count = reset_batch()
     file_count = reset_file()
 
-    folder_list = os.listdir(path)
+    # only the folders are renamed, files in the main data folder (ex: manifest.sqlite, the feature statistics) are skipped
+    folder_list = [folder for folder in os.listdir(path) if os.path.isdir(path + os.sep + folder)]
 
     if verbose:
         print('Renaming...')
@@ -47,7 +48,7 @@ def rename_files(path, verbose=False):
 
         os.rename(path + os.sep + folder, path + os.sep + new_folder_name)
 
-        batch_list = sorted(os.listdir(path + os.sep + new_folder_name))
+        batch_list = sorted([batch for batch in os.listdir(path + os.sep + new_folder_name) if os.path.isdir(path + os.sep + new_folder_name + os.sep + batch)])
 
         for batch in batch_list:
             if verbose:
@@ -28,7 +28,7 @@ def rename_transcripts(path, verbose=False):
 
     """
 
-    folder_list = os.listdir(path)
+    folder_list = [folder for folder in os.listdir(path) if os.path.isdir(path + os.sep + folder)]
 
     if verbose:
         print('Indexing...')
@@ -38,7 +38,7 @@ def rename_transcripts(path, verbose=False):
         if verbose:
             print('Loading folder', folder, '...')
 
-        batch_list = sorted(os.listdir(path + os.sep + folder))
+        batch_list = sorted([batch for batch in os.listdir(path + os.sep + folder) if os.path.isdir(path + os.sep + folder + os.sep + batch)])
 
         for batch in batch_list:
             if verbose:
@@ -166,7 +166,7 @@ def refactor_all(path, verbose=False):
 
     """
 
-    folder_list = os.listdir(path)
+    folder_list = [folder for folder in os.listdir(path) if os.path.isdir(path + os.sep + folder)]
 
     if verbose:
         print('Indexing...')
@@ -176,7 +176,7 @@ def refactor_all(path, verbose=False):
         if verbose:
             print('Loading folder', folder, '...')
 
-        batch_list = sorted(os.listdir(path + os.sep + folder))
+        batch_list = sorted([batch for batch in os.listdir(path + os.sep + folder) if os.path.isdir(path + os.sep + folder + os.sep + batch)])
 
         for batch in batch_list:
             if verbose:
@@ -0,0 +1,151 @@
+"""
+Utility functions for caching the decoded (and resampled) audio files of the batch folders as memory-mapped float32 arrays, shared by all processing stages
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import hashlib
+import tempfile
+import librosa as lb
+import numpy as np
+
+AUDIO_CACHE_BYTES = 4 * 2 ** 30
+
+
+def audio_cache_key(path, file_list, sampling_rate):
+    """
+    This function is for calculating the key of the decoded audio of a batch folder, from the paths, modification times and sizes of its audio files and the target sampling rate.
+    The audio files are not read, a changed (ex: resampled or replaced) audio file changes its modification time and therefore the key.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        file_list (list): List variable containing the names of the audio files, in the order they are loaded
+        sampling_rate (int): Integer variable containing the target sampling rate of the decoded audio (ex: 16kHz ==> sampling_rate = 16000)
+
+    Returns:
+        key (string): The hexadecimal SHA-1 digest identifying the decoded audio
+
+    """
+
+    digest = hashlib.sha1((os.path.abspath(path) + '|' + str(sampling_rate)).encode('utf-8'))
+
+    for file in file_list:
+        stat = os.stat(path + os.sep + file)
+        digest.update('|{}|{}|{}'.format(file, stat.st_mtime_ns, stat.st_size).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def load_audio(path, file_list, sampling_rate, audio_cache=None, max_bytes=AUDIO_CACHE_BYTES):
+    """
+    This function is for loading the audio files of a batch folder, through the decoded audio cache when one is given.
+    On a cache miss the audio files are decoded once and stored concatenated in a single .npy file (with the start of each audio file in a -offsets.npy file),
+    on a hit the stored file is memory-mapped, so every stage of a run reading the same batch folder (spectrogram, MFCC) shares one decode.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        file_list (list): List variable containing the names of the audio files, in the order they are loaded
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache (default is None, which decodes the audio files without caching)
+        max_bytes (int): Integer variable containing the largest total size (in bytes) of the cache, the least recently used batch folders are removed above it
+
+    Returns:
+        audio_list (list): List variable containing the float32 NumPy arrays of the raw audio signals (read-only views of the memory-mapped file on a cache hit)
+
+    """
+
+    if audio_cache is None:
+        return [lb.load(path + os.sep + file, sr=sampling_rate)[0] for file in file_list]
+
+    key = audio_cache_key(path=path, file_list=file_list, sampling_rate=sampling_rate)
+    data_path = audio_cache + os.sep + key + '.npy'
+    offsets_path = audio_cache + os.sep + key + '-offsets.npy'
+
+    try:
+        offsets = np.load(offsets_path)
+        data = np.load(data_path, mmap_mode='r')
+        os.utime(data_path)
+    except (FileNotFoundError, ValueError):
+        audio_list = [lb.load(path + os.sep + file, sr=sampling_rate)[0].astype(np.float32, copy=False) for file in file_list]
+
+        offsets = np.concatenate([[0], np.cumsum([len(audio) for audio in audio_list])]).astype(np.int64)
+        data = np.concatenate(audio_list) if audio_list else np.zeros(0, dtype=np.float32)
+
+        os.makedirs(audio_cache, exist_ok=True)
+
+        # the offsets are written before the data, a batch folder is only in the cache once its data file exists
+        for file_path, array in ((offsets_path, offsets), (data_path, data)):
+            handle, temp_path = tempfile.mkstemp(suffix='.npy', dir=audio_cache)
+
+            with os.fdopen(handle, mode='wb') as temp_file:
+                np.save(temp_file, array)
+
+            os.replace(temp_path, file_path)
+
+        evict_audio_cache(audio_cache=audio_cache, max_bytes=max_bytes, keep=key)
+
+        return audio_list
+
+    return [data[offsets[index]:offsets[index + 1]] for index in range(len(offsets) - 1)]
+
+
+def evict_audio_cache(audio_cache, max_bytes=AUDIO_CACHE_BYTES, keep=None):
+    """
+    This function is for removing the least recently used batch folders from the decoded audio cache, until its total size is at most max_bytes.
+    The last use of a batch folder is the modification time of its data file (updated on every cache hit).
+
+    Parameters:
+        audio_cache (string): String variable containing the path to the folder of the decoded audio cache
+        max_bytes (int): Integer variable containing the largest total size (in bytes) of the cache
+        keep (string): String variable containing the key of a batch folder which is never removed (ex: the one just written)
+
+    Returns:
+        removed (int): The number of removed batch folders
+
+    """
+
+    entries = []
+    total = 0
+
+    for file in os.listdir(audio_cache):
+        if not file.endswith('.npy') or file.endswith('-offsets.npy') or file.startswith('tmp'):
+            continue
+
+        key = file[:-len('.npy')]
+
+        try:
+            stat = os.stat(audio_cache + os.sep + file)
+            size = stat.st_size + os.path.getsize(audio_cache + os.sep + key + '-offsets.npy')
+        except FileNotFoundError:
+            continue
+
+        entries.append((stat.st_mtime, key, size))
+        total = total + size
+
+    removed = 0
+
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+
+        if key == keep:
+            continue
+
+        # the data file is removed first, so a concurrent reader sees a cache miss instead of a partial batch folder
+        for file_path in (audio_cache + os.sep + key + '.npy', audio_cache + os.sep + key + '-offsets.npy'):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+        total = total - size
+        removed = removed + 1
+
+    return removed
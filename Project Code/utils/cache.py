@@ -0,0 +1,162 @@
+"""
+Utility functions for caching the generated feature files, keyed on the content of the audio files and the feature parameters
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import json
+import hashlib
+import h5py
+import numpy as np
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """
+    This function is for calculating the SHA-1 hash of the content of a file.
+
+    Parameters:
+        file_path (string): String variable containing the path to the file
+        block_size (int): Integer variable containing the number of bytes read at a time
+
+    Returns:
+        digest (string): The hexadecimal SHA-1 digest of the file content
+
+    """
+
+    digest = hashlib.sha1()
+
+    with open(file_path, mode='rb') as data_file:
+        for block in iter(lambda: data_file.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def batch_cache_key(path, file_list, parameters, previous=None):
+    """
+    This function is for calculating the cache key of a batch folder, from the hashes of its audio files and the feature parameters.
+    The hash of an audio file is reused from the stats stored in the previously written .h5 file as long as the modification time and size of the audio file have not changed, so unchanged audio files are not read again.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        file_list (list): List variable containing the names of the audio files, in the order they are processed
+        parameters (dict): Dictionary containing the feature parameters (ex: sampling rate, number of coefficients, frame length, normalization)
+        previous (dict): Dictionary containing the stats stored in the previously written .h5 file (default is None, which hashes all audio files, see read_cache_key)
+
+    Returns:
+        key (string): The hexadecimal SHA-1 digest identifying the batch content and parameters
+        stats (dict): Dictionary containing [modification time, size, hash] of each audio file, to be stored alongside the key (see write_cache_key)
+
+    """
+
+    previous = previous or {}
+    stats = {}
+
+    for file in file_list:
+        stat = os.stat(path + os.sep + file)
+        entry = previous.get(file)
+
+        if entry is None or entry[0] != stat.st_mtime or entry[1] != stat.st_size:
+            entry = [stat.st_mtime, stat.st_size, file_hash(path + os.sep + file)]
+
+        stats[file] = entry
+
+    digest = hashlib.sha1(json.dumps(parameters, sort_keys=True).encode('utf-8'))
+
+    for file in file_list:
+        digest.update(file.encode('utf-8'))
+        digest.update(stats[file][2].encode('ascii'))
+
+    return digest.hexdigest(), stats
+
+
+def read_cache_key(h5_path):
+    """
+    This function is for reading the cache key stored in a .h5 batch file.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+
+    Returns:
+        key (string): The stored cache key (None if the file does not exist or has no key)
+        stats (dict): Dictionary containing the stored [modification time, size, hash] of each audio file
+        seconds (float): The time in seconds it took to generate the file
+
+    """
+
+    if not os.path.exists(h5_path):
+        return None, {}, 0.0
+
+    try:
+        with h5py.File(name=h5_path, mode='r') as h5_file:
+            key = h5_file.attrs.get('cache_key')
+            stats = json.loads(h5_file.attrs.get('cache_stats', '{}'))
+            seconds = float(h5_file.attrs.get('cache_seconds', 0.0))
+    except OSError:
+        return None, {}, 0.0
+
+    return key, stats, seconds
+
+
+def write_cache_key(h5_path, key, stats, seconds):
+    """
+    This function is for storing the cache key in a .h5 batch file, as attributes of the file.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+        key (string): String variable containing the cache key (see batch_cache_key)
+        stats (dict): Dictionary containing [modification time, size, hash] of each audio file
+        seconds (float): Float variable containing the time in seconds it took to generate the file (reported as time saved on a cache hit)
+
+    Returns:
+        None
+
+    """
+
+    with h5py.File(name=h5_path, mode='a') as h5_file:
+        h5_file.attrs['cache_key'] = key
+        h5_file.attrs['cache_stats'] = json.dumps(stats)
+        h5_file.attrs['cache_seconds'] = seconds
+
+
+def cached_maximum(h5_path):
+    """
+    This function is for reading the length of the longest audio file in a cached .h5 batch file.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+
+    Returns:
+        batch_maximum (int): The length of the longest audio file in the batch
+
+    """
+
+    with h5py.File(name=h5_path, mode='r') as h5_file:
+        return int(np.max(h5_file['Lengths'][:], initial=0))
+
+
+def print_cache_report(results):
+    """
+    This function is for printing the number of cache hits and misses and the time saved by the cache.
+
+    Parameters:
+        results (list): List variable containing the (h5_path, batch_maximum, hit, seconds) tuples returned by the batch functions
+
+    Returns:
+        None
+
+    """
+
+    hits = [seconds for _, _, hit, seconds in results if hit]
+    misses = [seconds for _, _, hit, seconds in results if not hit]
+
+    print()
+    print('Cache:', len(hits), 'hits,', len(misses), 'misses')
+    print('Time spent: {:.2f}s, time saved: {:.2f}s'.format(sum(misses), sum(hits)))
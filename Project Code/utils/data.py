@@ -14,21 +14,25 @@ import os
 import h5py
 import re
 import numpy as np
-from scipy import signal
-import librosa as lb
-from python_speech_features import mfcc
+from functools import lru_cache
 from utils.utils import get_char_set
+from utils.index import load_batch_index, feature_lengths
+from utils.storage import is_ragged, storage_form, read_ragged, stack_clips, convert_to_raw, is_raw_current, migrate_layout
+from utils.parallel import list_batches, run_batches
+from utils.manifest import manifest_batches, manifest_clips
 
 
-def find_maximum_batch(path, sampling_rate, method='spectrogram', num_coeff=None, verbose=False):
+def find_maximum_batch(path, sampling_rate, method='spectrogram', num_coeff=None, manifest=None, verbose=False):
     """
     This function is for finding the length of the longest audio clip (through the spectrogram or MFCC features) in a batch folder, for determining the size of the data array.
+    The lengths are calculated from the number of samples in the headers of the audio files (see utils.index), without decoding the audio.
 
     Parameters:
         path (string): String variable containing the path to a batch folder (containing multiple audio files)
         sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
         method (string): {'spectrogram', 'mfcc'} String variable to determine whether to search maximum for spectrogram or MFCC features
-        num_coeff (int): Number of mel-frequency cepstral coefficients to be generated (number of features) - only when using 'mfcc' method!
+        num_coeff (int): Number of mel-frequency cepstral coefficients to be generated (number of features) - only when using 'mfcc' method! (does not affect the length)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
@@ -36,29 +40,11 @@ def find_maximum_batch(path, sampling_rate, method='spectrogram', num_coeff=None
 
     """
 
-    file_list = sorted(os.listdir(path))
-    max_length = 0
-
     if verbose:
         print('Finding maximum...')
 
-    for file in file_list:
-        if not file.endswith('.wav'):
-            continue
-
-        audio, _ = lb.load(path + os.sep + file, sr=sampling_rate)
-
-        if method == 'mfcc':
-            max_length = max(max_length, len(mfcc(signal=audio, samplerate=sampling_rate, numcep=num_coeff)))
-
-        elif method == 'spectrogram':
-            _, _, spectrogram_data = signal.spectrogram(x=audio, fs=sampling_rate)
-            spectrogram_data = np.swapaxes(10 * np.log10(spectrogram_data), 0, 1)
-
-            max_length = max(max_length, len(spectrogram_data))
-
-        else:
-            raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\'')
+    index = load_batch_index(path=path, manifest=manifest, verbose=verbose)
+    max_length = max(feature_lengths(index=index, sampling_rate=sampling_rate, method=method), default=0)
 
     if verbose:
         print('Batch maximum:', max_length)
@@ -66,7 +52,7 @@ def find_maximum_batch(path, sampling_rate, method='spectrogram', num_coeff=None
     return max_length
 
 
-def find_maximum_folder(path, sampling_rate, method='spectrogram', num_coeff=None, verbose=False):
+def find_maximum_folder(path, sampling_rate, method='spectrogram', num_coeff=None, manifest=None, verbose=False):
     """
     This function is for finding the length of the longest audio clip (through the spectrogram or MFCC features) in a main folder, for determining the size of the data array.
 
@@ -75,6 +61,7 @@ def find_maximum_folder(path, sampling_rate, method='spectrogram', num_coeff=Non
         sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
         method (string): {'spectrogram', 'mfcc'} String variable to determine whether to search maximum for spectrogram or MFCC features
         num_coeff (int): Number of mel-frequency cepstral coefficients to be generated (number of features) - only when using 'mfcc' method!
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
@@ -82,7 +69,7 @@ def find_maximum_folder(path, sampling_rate, method='spectrogram', num_coeff=Non
 
     """
 
-    batch_list = sorted(os.listdir(path))
+    batch_list = list_folder_batches(path=path, manifest=manifest)
     max_length = 0
 
     if verbose:
@@ -93,7 +80,7 @@ def find_maximum_folder(path, sampling_rate, method='spectrogram', num_coeff=Non
         if verbose:
             print('Loading batch', batch, '...')
 
-        max_length = max(max_length, find_maximum_batch(path=path + os.sep + batch, sampling_rate=sampling_rate, method=method, num_coeff=num_coeff))
+        max_length = max(max_length, find_maximum_batch(path=path + os.sep + batch, sampling_rate=sampling_rate, method=method, num_coeff=num_coeff, manifest=manifest))
 
         if verbose:
             print('Batch', batch, 'done!')
@@ -106,7 +93,7 @@ def find_maximum_folder(path, sampling_rate, method='spectrogram', num_coeff=Non
     return max_length
 
 
-def find_maximum_all(path, sampling_rate, method='spectrogram', num_coeff=None, verbose=False):
+def find_maximum_all(path, sampling_rate, method='spectrogram', num_coeff=None, workers=1, manifest=None, verbose=False):
     """
     This function is for finding the length of the longest audio clip (through the spectrogram or MFCC features) the entire dataset, for determining the size of the data array.
 
@@ -115,6 +102,8 @@ def find_maximum_all(path, sampling_rate, method='spectrogram', num_coeff=None,
         sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
         method (string): {'spectrogram', 'mfcc'} String variable to determine whether to search maximum for spectrogram or MFCC features
         num_coeff (int): Number of mel-frequency cepstral coefficients to be generated (number of features) - only when using 'mfcc' method!
+        workers (int): Integer variable containing the number of worker processes, each processing a whole batch folder at a time (default is 1; None uses all available cores)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
@@ -122,36 +111,30 @@ def find_maximum_all(path, sampling_rate, method='spectrogram', num_coeff=None,
 
     """
 
-    folder_list = os.listdir(path)
-    max_length = 0
+    batch_list = list_batches(path=path, manifest=manifest)
 
     if verbose:
         print('Finding maximum...')
         print()
 
-    for folder in folder_list:
-        if verbose:
-            print('Loading folder', folder, '...')
-
-        max_length = max(max_length, find_maximum_folder(path=path + os.sep + folder, sampling_rate=sampling_rate, method=method, num_coeff=num_coeff))
-
-        if verbose:
-            print('Folder', folder, 'done!')
-            print()
+    tasks = [{'path': path + os.sep + folder + os.sep + batch, 'sampling_rate': sampling_rate, 'method': method, 'num_coeff': num_coeff, 'manifest': manifest} for folder, batch in batch_list]
+    max_length = max(run_batches(function=find_maximum_batch, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose), default=0)
 
     if verbose:
+        print()
         print('Maximum:', max_length)
         print()
 
     return max_length
 
 
-def count_files_folder(path, verbose=False):
+def count_files_folder(path, manifest=None, verbose=False):
     """
     This function is for counting the total number of audio files in a folder.
 
     Parameters:
         path (string): String variable containing the path to a main folder (containing multiple batch folders)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
@@ -159,7 +142,7 @@ def count_files_folder(path, verbose=False):
 
     """
 
-    batch_list = sorted(os.listdir(path))
+    batch_list = list_folder_batches(path=path, manifest=manifest)
     count = 0
 
     if verbose:
@@ -170,13 +153,7 @@ def count_files_folder(path, verbose=False):
         if verbose:
             print('Loading batch', batch, '...')
 
-        file_list = sorted(os.listdir(path + os.sep + batch))
-
-        for file in file_list:
-            if not file.endswith('.wav'):
-                continue
-
-            count = count + 1
+        count = count + len(load_batch_index(path=path + os.sep + batch, manifest=manifest))
 
         if verbose:
             print('Batch', batch, 'done!')
@@ -189,12 +166,13 @@ def count_files_folder(path, verbose=False):
     return count
 
 
-def count_files_batch(path, verbose=False):
+def count_files_batch(path, manifest=None, verbose=False):
     """
     This function is for counting the total number of audio files in a batch.
 
     Parameters:
         path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
         verbose (bool): Boolean variable to determine whether to print the progress of the function
 
     Returns:
@@ -202,18 +180,11 @@ def count_files_batch(path, verbose=False):
 
     """
 
-    file_list = sorted(os.listdir(path))
-    count = 0
-
     if verbose:
         print('Counting...')
         print()
 
-    for file in file_list:
-        if not file.endswith('.wav'):
-            continue
-
-        count = count + 1
+    count = len(load_batch_index(path=path, manifest=manifest))
 
     if verbose:
         print('Count:', count)
@@ -222,74 +193,209 @@ def count_files_batch(path, verbose=False):
     return count
 
 
-def load_mfcc_batch(path):
+def list_folder_batches(path, manifest=None):
+    """
+    This function is for listing the batch folders in a main folder, in sorted order.
+
+    Parameters:
+        path (string): String variable containing the path to a main folder (containing multiple batch folders)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folder (default is None, see utils.manifest)
+
+    Returns:
+        batch_list (list): List variable containing the names of the batch folders
+
+    """
+
+    if manifest is None:
+        return sorted(os.listdir(path))
+
+    folder = os.path.basename(os.path.normpath(path))
+
+    return [batch for batch_folder, batch in manifest_batches(manifest) if batch_folder == folder]
+
+
+def batch_file_name(path, suffix):
+    """
+    This function is for constructing the name of a file in a batch folder, as per agreed upon naming convention (<folder>-<batch><suffix>).
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder
+        suffix (string): String variable containing the ending of the file name (ex: '-mfcc.h5', '-trans.txt')
+
+    Returns:
+        file_name (string): The name of the file
+
+    """
+
+    batch_path = os.path.normpath(path)
+
+    return os.path.basename(os.path.dirname(batch_path)) + '-' + os.path.basename(batch_path) + suffix
+
+
+def load_mfcc_batch(path, indices=None, manifest=None, rdcc_nbytes=None):
     """
     This function is for batchwise loading of the generated MFCC features into a 3D NumPy array.
 
     Parameters:
         path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        indices (list): List variable containing the indices of the audio files to be loaded (default is None, which loads all audio files in the batch)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        rdcc_nbytes (int): Integer variable containing the size (in bytes) of the HDF5 chunk cache (default is None, which uses the HDF5 default of 1 MB)
 
     Returns:
         batch_mfcc_data (np.ndarray): 3D NumPy array containing the 2D spectrogram features for all audio files in the batch folder
-        Axis 0 represents the data through time
+        Axis 0 represents the data through time (padded to the longest loaded audio file when the features are stored in ragged form)
         Axis 1 represents the mel-frequency cepstral coefficients
         Axis 2 represents the multiple individual audio files
 
     """
 
-    data_files = [file for file in os.listdir(path) if file.endswith('.h5')]
+    data_files = [batch_file_name(path=path, suffix='-mfcc.h5')] if manifest is not None else [file for file in os.listdir(path) if file.endswith('.h5')]
     mfcc_file = None
 
     for file in data_files:
         if bool(re.match(r'﻿?[0-9]-[0-9]{6}-mfcc\.h5', file)):
             mfcc_file = file
 
-    hdf5_file = h5py.File(name=path + os.sep + mfcc_file, mode='r')
-    batch_mfcc_data = hdf5_file['MFCC'][:]
+    with h5py.File(name=path + os.sep + mfcc_file, mode='r', rdcc_nbytes=rdcc_nbytes) as hdf5_file:
+        batch_mfcc_data = read_batch(h5_file=hdf5_file, name='MFCC', indices=indices)
 
     return batch_mfcc_data
 
 
-def load_spectrogram_batch(path):
+def load_spectrogram_batch(path, indices=None, manifest=None, rdcc_nbytes=None):
     """
     This function is for batchwise loading of the generated spectrogram features into a 3D NumPy array.
 
     Parameters:
         path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        indices (list): List variable containing the indices of the audio files to be loaded (default is None, which loads all audio files in the batch)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        rdcc_nbytes (int): Integer variable containing the size (in bytes) of the HDF5 chunk cache (default is None, which uses the HDF5 default of 1 MB)
 
     Returns:
         batch_spectrogram_data (np.ndarray): 3D NumPy array containing the 2D spectrogram features for all audio files in the batch folder
-        Axis 0 represents the data through time
+        Axis 0 represents the data through time (padded to the longest loaded audio file when the features are stored in ragged form)
         Axis 1 represents the frequency
         Axis 2 represents the multiple individual audio files
 
     """
 
-    data_files = [file for file in os.listdir(path) if file.endswith('.h5')]
+    data_files = [batch_file_name(path=path, suffix='-spectrogram.h5')] if manifest is not None else [file for file in os.listdir(path) if file.endswith('.h5')]
     spectrogram_file = None
 
     for file in data_files:
         if bool(re.match(r'﻿?[0-9]-[0-9]{6}-spectrogram\.h5', file)):
             spectrogram_file = file
 
-    hdf5_file = h5py.File(name=path + os.sep + spectrogram_file, mode='r')
-    batch_spectrogram_data = hdf5_file['Spectrogram'][:]
+    with h5py.File(name=path + os.sep + spectrogram_file, mode='r', rdcc_nbytes=rdcc_nbytes) as hdf5_file:
+        batch_spectrogram_data = read_batch(h5_file=hdf5_file, name='Spectrogram', indices=indices)
 
     return batch_spectrogram_data
 
 
-def load_transcript(path):
+def convert_raw_all(path, method='mfcc', workers=1, manifest=None, verbose=False):
+    """
+    This function is for converting the generated .h5 files of all batch folders into the uncompressed, memory-mappable .npy format (see utils.storage.write_raw).
+    Only the batch folders without an up to date .npy file are converted, so it should be run again after the features are regenerated or normalized
+    (until then, learning.dataset reads the .h5 files of the batch folders with stale .npy files).
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to convert the spectrogram or MFCC files
+        workers (int): Integer variable containing the number of worker processes (default is 1, which converts the batch folders serially)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        Creates the <folder>-<batch>-<method>.npy, <folder>-<batch>-<method>-offsets.npy and <folder>-<batch>-<method>-source.npy files in each batch folder with a generated .h5 file
+
+    """
+
+    if method not in ('spectrogram', 'mfcc'):
+        raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\'')
+
+    name = 'MFCC' if method == 'mfcc' else 'Spectrogram'
+    batch_list = [(folder, batch) for folder, batch in list_batches(path=path, manifest=manifest)
+                  if os.path.exists(path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5')
+                  and not is_raw_current(file_path=path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.npy',
+                                         h5_path=path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5')]
+
+    tasks = [{'h5_path': path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5', 'name': name} for folder, batch in batch_list]
+    run_batches(function=convert_to_raw, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
+
+
+def migrate_layout_all(path, method='mfcc', storage='clip_major', workers=1, manifest=None, verbose=False):
+    """
+    This function is for rewriting the generated .h5 files of all batch folders in another storage form (see utils.storage.migrate_layout).
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to migrate the spectrogram or MFCC files
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable containing the new storage form
+        workers (int): Integer variable containing the number of worker processes (default is 1, which migrates the batch folders serially)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        None
+
+    """
+
+    if method not in ('spectrogram', 'mfcc'):
+        raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\'')
+
+    name = 'MFCC' if method == 'mfcc' else 'Spectrogram'
+    batch_list = [(folder, batch) for folder, batch in list_batches(path=path, manifest=manifest)
+                  if os.path.exists(path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5')]
+
+    tasks = [{'h5_path': path + os.sep + folder + os.sep + batch + os.sep + folder + '-' + batch + '-' + method + '.h5', 'name': name, 'storage': storage} for folder, batch in batch_list]
+    run_batches(function=migrate_layout, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batch_list], verbose=verbose)
+
+
+def read_batch(h5_file, name, indices=None):
+    """
+    This function is for reading the features of (a subset of) the audio files in an opened .h5 batch file into a 3D NumPy array, regardless of the storage form.
+
+    Parameters:
+        h5_file (h5py.File): Opened .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        indices (list): List variable containing the indices of the audio files to be read (default is None, which reads all audio files)
+
+    Returns:
+        data (np.ndarray): 3D NumPy array containing the features (axis 0 ==> data through time; axis 1 ==> features; axis 2 ==> audio files)
+        When the features are stored in ragged form, the padding is done only up to the longest of the read audio files
+
+    """
+
+    if is_ragged(h5_file):
+        return stack_clips(read_ragged(h5_file=h5_file, name=name, indices=indices))
+
+    if storage_form(h5_file) == 'clip_major':
+        return np.moveaxis(h5_file[name][:] if indices is None else np.stack([h5_file[name][index] for index in indices]), 0, 2)
+
+    if indices is None:
+        return h5_file[name][:]
+
+    return np.stack([h5_file[name][:, :, index] for index in indices], axis=2)
+
+
+def load_transcript(path, manifest=None):
     """
     This function is for batchwise loading of the transcripts of the audio files in the batch folder.
 
     Parameters:
         path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
 
     Returns:
         batch_transcripts (list): List variable containing the transcripts (string) of the audio files in the batch folder
 
     """
 
+    if manifest is not None:
+        return [clip['transcript'] for clip in manifest_clips(manifest=manifest, path=path)]
+
     file_name = [file for file in os.listdir(path) if file.endswith('.txt')][0]
 
     transcript_file = open(path + os.sep + file_name, mode='r', encoding='utf-8')
@@ -311,17 +417,59 @@ def enumerate_transcript(transcript):
 
     """
 
+    labels, _ = encode_transcripts([transcript])
+
+    return labels.tolist()
+
+
+@lru_cache(maxsize=None)
+def label_table():
+    """
+    This function is for generating the lookup table from Unicode code points to the enumerated characters (both lowercase and uppercase letters are mapped to the same index).
+    The table is built once and cached.
+
+    Returns:
+        table (np.ndarray): int8 NumPy array containing the index of each code point in the alphabet, -1 for the characters outside of the alphabet
+
+    """
+
     whitespace = ' '
     blank_token = '%'
     end_token = '>'
     alphabet = get_char_set() + [whitespace, blank_token, end_token]
 
-    to_index = {}
+    table = np.full(max([ord(character.upper()) for character in alphabet] + [ord(character) for character in alphabet]) + 1, -1, dtype=np.int8)
+
     for index, character in enumerate(alphabet):
-        to_index[character] = index
+        table[ord(character)] = index
+        table[ord(character.upper())] = index
+
+    return table
+
+
+def encode_transcripts(transcripts):
+    """
+    This function is for enumerating multiple transcripts at once, into a single flat array of labels (the concatenated transcripts) with offsets.
+
+    Parameters:
+        transcripts (list): List variable containing the transcripts (string) of the audio files
+
+    Returns:
+        labels (np.ndarray): int8 NumPy array containing the enumerated characters of all transcripts
+        offsets (np.ndarray): NumPy array containing the start of each transcript in the labels array, with the total length as the last element
+        (the labels of transcript i are labels[offsets[i]:offsets[i + 1]])
+
+    """
+
+    table = label_table()
+
+    code_points = np.frombuffer(''.join(transcripts).encode('utf-32-le'), dtype=np.uint32)
+    offsets = np.concatenate([[0], np.cumsum([len(transcript) for transcript in transcripts], dtype=np.int64)])
+
+    labels = table[np.minimum(code_points, len(table) - 1)]
+    unknown = (labels < 0) | (code_points >= len(table))
 
-    transcript_enum = []
-    for character in transcript.lower():
-        transcript_enum.append(to_index[character])
+    if unknown.any():
+        raise ValueError('Unknown characters in transcripts: ' + repr(''.join(sorted(set([chr(code_point) for code_point in code_points[unknown]])))))
 
-    return transcript_enum
+    return labels, offsets
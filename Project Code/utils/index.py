@@ -0,0 +1,169 @@
+"""
+Utility functions for indexing the lengths of the audio files from their headers, without decoding the audio
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import json
+import math
+import soundfile as sf
+from utils.manifest import manifest_clips
+
+INDEX_FILE = 'length-index.json'
+
+
+def load_batch_index(path, manifest=None, verbose=False):
+    """
+    This function is for loading the length index of a batch folder, updating it with the headers of any new or changed audio files.
+    The index is stored as a .json file in the batch folder, an entry is reused as long as the modification time and size of its audio file have not changed.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        manifest (string): String variable containing the path to the manifest database, used instead of the .json index (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        index (dict): Dictionary containing an entry for each audio file in the batch (in sorted order of the file names), with the keys:
+        'samples' (number of samples), 'rate' (native sampling rate), 'mtime' (modification time) and 'size' (file size in bytes)
+
+    """
+
+    if manifest is not None:
+        return {clip['file']: {'samples': clip['samples'], 'rate': clip['rate'], 'mtime': clip['mtime'], 'size': clip['size']} for clip in manifest_clips(manifest=manifest, path=path)}
+
+    index_path = path + os.sep + INDEX_FILE
+    cached = {}
+
+    if os.path.exists(index_path):
+        with open(index_path, mode='r', encoding='utf-8') as index_file:
+            cached = json.load(index_file)
+
+    index = {}
+    changed = False
+
+    for file in sorted(os.listdir(path)):
+        if not file.endswith('.wav'):
+            continue
+
+        stat = os.stat(path + os.sep + file)
+        entry = cached.get(file)
+
+        if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+            info = sf.info(path + os.sep + file)
+            entry = {'samples': info.frames, 'rate': info.samplerate, 'mtime': stat.st_mtime, 'size': stat.st_size}
+            changed = True
+
+        index[file] = entry
+
+    if changed or len(index) != len(cached):
+        with open(index_path, mode='w', encoding='utf-8') as index_file:
+            json.dump(index, index_file)
+
+        if verbose:
+            print('Index of', path, 'updated!')
+
+    return index
+
+
+def resampled_length(num_samples, native_rate, sampling_rate):
+    """
+    This function is for calculating the number of samples of an audio signal after resampling (as done by librosa.load).
+
+    Parameters:
+        num_samples (int): Integer variable containing the number of samples at the native sampling rate
+        native_rate (int): Integer variable containing the native sampling rate of the audio file
+        sampling_rate (int): Integer variable containing the target sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+
+    Returns:
+        num_samples (int): The number of samples at the target sampling rate
+
+    """
+
+    if native_rate == sampling_rate:
+        return num_samples
+
+    return int(math.ceil(num_samples * sampling_rate / native_rate))
+
+
+def spectrogram_length(num_samples, nperseg=256, noverlap=None):
+    """
+    This function is for calculating the number of frames of the spectrogram of an audio signal (see feature_extraction.stft.batch_spectrogram).
+
+    Parameters:
+        num_samples (int): Integer variable containing the number of samples of the audio signal
+        nperseg (int): Integer variable containing the length of each frame
+        noverlap (int): Integer variable containing the number of overlapping samples between frames (default is None, which is nperseg // 8)
+
+    Returns:
+        length (int): The number of frames
+
+    """
+
+    if noverlap is None:
+        noverlap = nperseg // 8
+
+    if num_samples < nperseg:
+        return 0
+
+    return (num_samples - nperseg) // (nperseg - noverlap) + 1
+
+
+def mfcc_length(num_samples, sampling_rate, winlen=0.025, winstep=0.01):
+    """
+    This function is for calculating the number of frames of the MFCC features of an audio signal (see feature_extraction.mel.batch_mfcc).
+
+    Parameters:
+        num_samples (int): Integer variable containing the number of samples of the audio signal
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate (ex: 16kHz ==> sampling_rate = 16000)
+        winlen (float): Float variable containing the length of each frame in seconds
+        winstep (float): Float variable containing the step between neighbouring frames in seconds
+
+    Returns:
+        length (int): The number of frames
+
+    """
+
+    frame_length = int(math.floor(winlen * sampling_rate + 0.5))
+    frame_step = int(math.floor(winstep * sampling_rate + 0.5))
+
+    if num_samples <= frame_length:
+        return 1
+
+    return 1 + int(math.ceil((num_samples - frame_length) / frame_step))
+
+
+def feature_lengths(index, sampling_rate, method='spectrogram'):
+    """
+    This function is for calculating the number of frames of the spectrogram or MFCC features of each audio file in a length index.
+
+    Parameters:
+        index (dict): Dictionary containing the length index of a batch folder (see load_batch_index)
+        sampling_rate (int): Integer variable containing the value of the audio sampling rate the features are generated at (ex: 16kHz ==> sampling_rate = 16000)
+        method (string): {'spectrogram', 'mfcc'} String variable to determine whether to calculate the lengths of the spectrogram or MFCC features
+
+    Returns:
+        lengths (list): List variable containing the number of frames of each audio file, in sorted order of the file names
+
+    """
+
+    if method not in ('spectrogram', 'mfcc'):
+        raise ValueError('Wrong input for method argument! Possible inputs: \'spectrogram\', \'mfcc\'')
+
+    lengths = []
+
+    for file in sorted(index):
+        num_samples = resampled_length(num_samples=index[file]['samples'], native_rate=index[file]['rate'], sampling_rate=sampling_rate)
+
+        if method == 'mfcc':
+            lengths.append(mfcc_length(num_samples=num_samples, sampling_rate=sampling_rate))
+        else:
+            lengths.append(spectrogram_length(num_samples=num_samples))
+
+    return lengths
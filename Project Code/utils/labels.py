@@ -0,0 +1,129 @@
+"""
+Utility functions for precomputing the enumerated transcripts (labels) of the batch folders, so the training never processes text
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import hashlib
+import h5py
+from utils.data import load_transcript, encode_transcripts, batch_file_name
+from utils.manifest import manifest_clips
+from utils.parallel import list_batches, run_batches
+
+LABELS_SUFFIX = '-labels.h5'
+
+
+def transcript_key(path, manifest=None):
+    """
+    This function is for calculating the key of the transcripts of a batch folder, stored in the label file to detect labels made stale by a changed transcript.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        manifest (string): String variable containing the path to the manifest database (default is None, see utils.manifest)
+
+    Returns:
+        key (string): The name, modification time and size of the transcript file, or the hexadecimal SHA-1 digest of the transcripts in the manifest when one is given
+
+    """
+
+    if manifest is not None:
+        digest = hashlib.sha1()
+
+        for clip in manifest_clips(manifest=manifest, path=path):
+            digest.update((str(clip['transcript']) + '\n').encode('utf-8'))
+
+        return digest.hexdigest()
+
+    file_name = [file for file in os.listdir(path) if file.endswith('.txt')][0]
+    stat = os.stat(path + os.sep + file_name)
+
+    return '{}|{}|{}'.format(file_name, stat.st_mtime_ns, stat.st_size)
+
+
+def labels_batch(path, manifest=None):
+    """
+    This function is for enumerating all transcripts of a batch folder and storing them in an .h5 file, alongside the feature files.
+    The key of the transcripts (see transcript_key) is stored as the 'transcript_key' attribute.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+        manifest (string): String variable containing the path to the manifest database, used instead of reading the transcript file (default is None, see utils.manifest)
+
+    Returns:
+        h5_path (string): The path to the generated .h5 file, which contains the 'Labels' (int8) and 'Offsets' datasets (see utils.data.encode_transcripts)
+
+    """
+
+    key = transcript_key(path=path, manifest=manifest)
+    labels, offsets = encode_transcripts(load_transcript(path=path, manifest=manifest))
+    h5_path = path + os.sep + batch_file_name(path=path, suffix=LABELS_SUFFIX)
+
+    # written to a temporary file first, so a concurrent reader never opens a partially written label file
+    with h5py.File(name=h5_path + '.tmp', mode='w') as h5_file:
+        h5_file.create_dataset(name='Labels', data=labels)
+        h5_file.create_dataset(name='Offsets', data=offsets)
+        h5_file.attrs['transcript_key'] = key
+
+    os.replace(h5_path + '.tmp', h5_path)
+
+    return h5_path
+
+
+def generate_labels(path, workers=1, manifest=None, verbose=False):
+    """
+    This function is for generating the label files of all batch folders (see labels_batch). Label files made stale by changed transcripts are also regenerated by load_labels.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        workers (int): Integer variable containing the number of worker processes (default is 1, which processes the batch folders serially)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        Creates an .h5 file in each batch folder, named as per agreed upon naming convention (<folder>-<batch>-labels.h5)
+
+    """
+
+    batches = list_batches(path=path, manifest=manifest)
+
+    tasks = [{'path': path + os.sep + folder + os.sep + batch, 'manifest': manifest} for folder, batch in batches]
+
+    run_batches(function=labels_batch, tasks=tasks, workers=workers, names=[folder + os.sep + batch for folder, batch in batches], verbose=verbose)
+
+
+def load_labels(path, manifest=None):
+    """
+    This function is for loading the precomputed labels of a batch folder.
+    If the transcripts changed since the labels were generated (the stored key differs, see transcript_key), the label file is generated again.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder
+        manifest (string): String variable containing the path to the manifest database, used instead of reading the transcript file (default is None, see utils.manifest)
+
+    Returns:
+        labels (np.ndarray): int8 NumPy array containing the enumerated characters of all transcripts of the batch folder
+        offsets (np.ndarray): NumPy array containing the start of each transcript in the labels array, with the total length as the last element
+        Returns (None, None) if the labels of the batch folder are not generated
+
+    """
+
+    h5_path = path + os.sep + batch_file_name(path=path, suffix=LABELS_SUFFIX)
+
+    if not os.path.exists(h5_path):
+        return None, None
+
+    with h5py.File(name=h5_path, mode='r') as h5_file:
+        if h5_file.attrs.get('transcript_key') == transcript_key(path=path, manifest=manifest):
+            return h5_file['Labels'][:], h5_file['Offsets'][:]
+
+    labels_batch(path=path, manifest=manifest)
+
+    with h5py.File(name=h5_path, mode='r') as h5_file:
+        return h5_file['Labels'][:], h5_file['Offsets'][:]
@@ -0,0 +1,205 @@
+"""
+Utility functions for the persistent manifest of the dataset (every audio file with its header data and transcript)
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import sqlite3
+import soundfile as sf
+
+MANIFEST_FILE = 'manifest.sqlite'
+
+
+def update_manifest(path, full=False, verbose=False):
+    """
+    This function is for creating or incrementally updating the manifest of the dataset, stored as an SQLite database in the main data folder.
+    Every batch folder is compared by stat to the last update: only the batch folders in which an audio file or the transcript file was added, removed, renamed or modified
+    (changed modification time or size) are scanned again, and only the audio files whose modification time or size changed have their headers read again.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        full (bool): Boolean variable to determine whether to scan all batch folders again, regardless of the stat comparison
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        manifest (string): The path to the manifest database, to be passed to the functions accepting a manifest
+
+    """
+
+    manifest = path + os.sep + MANIFEST_FILE
+
+    connection = sqlite3.connect(manifest)
+
+    # manifests written before the stat comparison kept only the batch folder modification time, their batches table is rebuilt
+    if 'mtime' in [row[1] for row in connection.execute('PRAGMA table_info(batches)')]:
+        connection.execute('DROP TABLE batches')
+
+    connection.execute('CREATE TABLE IF NOT EXISTS batches (folder TEXT, batch TEXT, signature TEXT, PRIMARY KEY (folder, batch))')
+    connection.execute('CREATE TABLE IF NOT EXISTS clips (folder TEXT, batch TEXT, idx INTEGER, file TEXT, path TEXT, samples INTEGER, rate INTEGER, mtime REAL, size INTEGER, transcript TEXT, PRIMARY KEY (folder, batch, idx))')
+
+    known = {(folder, batch): signature for folder, batch, signature in connection.execute('SELECT folder, batch, signature FROM batches')}
+    present = set()
+    scanned = 0
+
+    if verbose:
+        print('Updating manifest...')
+        print()
+
+    for folder in sorted(os.listdir(path)):
+        if not os.path.isdir(path + os.sep + folder):
+            continue
+
+        for batch in sorted(os.listdir(path + os.sep + folder)):
+            batch_path = path + os.sep + folder + os.sep + batch
+
+            if not os.path.isdir(batch_path):
+                continue
+
+            present.add((folder, batch))
+            signature = batch_signature(path=batch_path)
+
+            if not full and known.get((folder, batch)) == signature:
+                continue
+
+            scan_batch(connection=connection, path=path, folder=folder, batch=batch)
+            connection.execute('INSERT OR REPLACE INTO batches VALUES (?, ?, ?)', (folder, batch, signature))
+            scanned = scanned + 1
+
+            if verbose:
+                print('Batch', folder + os.sep + batch, 'scanned!')
+
+    for folder, batch in set(known) - present:
+        connection.execute('DELETE FROM batches WHERE folder = ? AND batch = ?', (folder, batch))
+        connection.execute('DELETE FROM clips WHERE folder = ? AND batch = ?', (folder, batch))
+
+    connection.commit()
+    connection.close()
+
+    if verbose:
+        print()
+        print('Manifest updated!', scanned, 'of', len(present), 'batch folders scanned,', len(set(known) - present), 'removed')
+        print()
+
+    return manifest
+
+
+def batch_signature(path):
+    """
+    This function is for calculating the stat signature of a batch folder, from the names, modification times and sizes of its audio files and transcript file.
+    Unlike the modification time of the batch folder, it also changes when a file is modified in place.
+
+    Parameters:
+        path (string): String variable containing the path to a batch folder (containing multiple audio files)
+
+    Returns:
+        signature (string): String variable containing the name, modification time and size of every audio file and transcript file
+
+    """
+
+    signature = []
+
+    for file in sorted(os.listdir(path)):
+        if file.endswith('.wav') or file.endswith('-trans.txt'):
+            stat = os.stat(path + os.sep + file)
+            signature.append('{}|{}|{}'.format(file, stat.st_mtime_ns, stat.st_size))
+
+    return '\n'.join(signature)
+
+
+def scan_batch(connection, path, folder, batch):
+    """
+    This function is for (re)scanning a single batch folder into the manifest.
+
+    Parameters:
+        connection (sqlite3.Connection): Opened connection to the manifest database
+        path (string): String variable containing the path to the main data folder
+        folder (string): String variable of the name of the folder containing the batch folder
+        batch (string): String variable of the name of the batch folder
+
+    Returns:
+        None
+
+    """
+
+    batch_path = path + os.sep + folder + os.sep + batch
+
+    previous = {row[0]: row[1:] for row in connection.execute('SELECT file, samples, rate, mtime, size FROM clips WHERE folder = ? AND batch = ?', (folder, batch))}
+    file_list = sorted(os.listdir(batch_path))
+
+    transcripts = {}
+    transcript_list = [file for file in file_list if file.endswith('-trans.txt')]
+
+    if transcript_list:
+        with open(batch_path + os.sep + transcript_list[0], mode='r', encoding='utf-8') as transcript_file:
+            for line in transcript_file.read().split('\n'):
+                if ' ' in line:
+                    key, text = line.split(' ', 1)
+                    transcripts[key.lstrip('﻿')] = text
+
+    connection.execute('DELETE FROM clips WHERE folder = ? AND batch = ?', (folder, batch))
+
+    index = 0
+    for file in file_list:
+        if not file.endswith('.wav'):
+            continue
+
+        stat = os.stat(batch_path + os.sep + file)
+        entry = previous.get(file)
+
+        if entry is None or entry[2] != stat.st_mtime or entry[3] != stat.st_size:
+            info = sf.info(batch_path + os.sep + file)
+            entry = (info.frames, info.samplerate, stat.st_mtime, stat.st_size)
+
+        connection.execute('INSERT INTO clips VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (folder, batch, index, file, folder + os.sep + batch + os.sep + file) + tuple(entry) + (transcripts.get(file[:-4]),))
+        index = index + 1
+
+
+def manifest_batches(manifest):
+    """
+    This function is for listing all batch folders recorded in the manifest, in sorted order.
+
+    Parameters:
+        manifest (string): String variable containing the path to the manifest database (see update_manifest)
+
+    Returns:
+        batches (list): List variable containing (folder, batch) tuples of names of all batch folders
+
+    """
+
+    connection = sqlite3.connect(manifest)
+    batches = [(folder, batch) for folder, batch in connection.execute('SELECT folder, batch FROM batches ORDER BY folder, batch')]
+    connection.close()
+
+    return batches
+
+
+def manifest_clips(manifest, path):
+    """
+    This function is for loading the manifest entries of all audio files in a batch folder, in order of their index.
+
+    Parameters:
+        manifest (string): String variable containing the path to the manifest database (see update_manifest)
+        path (string): String variable containing the path to a batch folder (the folder and batch names are taken from its last two components)
+
+    Returns:
+        clips (list): List variable containing a dictionary for each audio file, with the keys:
+        'file', 'path' (relative to the main data folder), 'samples', 'rate', 'mtime', 'size' and 'transcript'
+
+    """
+
+    batch_path = os.path.normpath(path)
+    folder, batch = os.path.basename(os.path.dirname(batch_path)), os.path.basename(batch_path)
+
+    connection = sqlite3.connect(manifest)
+    rows = connection.execute('SELECT file, path, samples, rate, mtime, size, transcript FROM clips WHERE folder = ? AND batch = ? ORDER BY idx', (folder, batch)).fetchall()
+    connection.close()
+
+    return [dict(zip(('file', 'path', 'samples', 'rate', 'mtime', 'size', 'transcript'), row)) for row in rows]
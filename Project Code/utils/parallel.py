@@ -0,0 +1,92 @@
+"""
+Utility functions for processing the batch folders of the dataset in parallel
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+from utils.manifest import manifest_batches
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def list_batches(path, manifest=None):
+    """
+    This function is for listing all batch folders in the main data folder, in sorted (deterministic) order.
+
+    Parameters:
+        path (string): String variable containing the path to the main data folder (containing multiple folders, divided into batches of audio files)
+        manifest (string): String variable containing the path to the manifest database, used instead of listing the folders (default is None, see utils.manifest)
+
+    Returns:
+        batches (list): List variable containing (folder, batch) tuples of names of all batch folders
+
+    """
+
+    if manifest is not None:
+        return manifest_batches(manifest)
+
+    batches = []
+
+    for folder in sorted(os.listdir(path)):
+        if not os.path.isdir(path + os.sep + folder):
+            continue
+
+        for batch in sorted(os.listdir(path + os.sep + folder)):
+            if os.path.isdir(path + os.sep + folder + os.sep + batch):
+                batches.append((folder, batch))
+
+    return batches
+
+
+def run_batches(function, tasks, workers=1, names=None, verbose=False):
+    """
+    This function is for running a function once for each batch folder, either serially or in a pool of worker processes.
+    Each task must be independent of the others (ex: writes only to its own batch folder), the results are always returned in the order of the tasks.
+
+    Parameters:
+        function (callable): Module-level function to be called for each task (must be picklable when workers > 1)
+        tasks (list): List variable containing the keyword arguments (dict) of each function call
+        workers (int): Integer variable containing the number of worker processes (default is 1, which runs all tasks serially in the current process; None uses all available cores)
+        names (list): List variable containing the names of the tasks used when printing the progress (ex: '1/000000'), defaults to the task numbers
+        verbose (bool): Boolean variable to determine whether to print the progress of the function
+
+    Returns:
+        results (list): List variable containing the return values of the function for each task, in the order of the tasks
+
+    """
+
+    if workers is None or workers < 1:
+        workers = os.cpu_count()
+
+    if names is None:
+        names = [str(num_task + 1) for num_task in range(len(tasks))]
+
+    results = [None] * len(tasks)
+
+    if workers == 1 or len(tasks) <= 1:
+        for num_task, task in enumerate(tasks):
+            results[num_task] = function(**task)
+
+            if verbose:
+                print('Batch', names[num_task], 'done!', '(' + str(num_task + 1) + '/' + str(len(tasks)) + ')')
+
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(function, **task): num_task for num_task, task in enumerate(tasks)}
+        done = 0
+
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done = done + 1
+
+            if verbose:
+                print('Batch', names[futures[future]], 'done!', '(' + str(done) + '/' + str(len(tasks)) + ')')
+
+    return results
@@ -0,0 +1,544 @@
+"""
+Utility functions for reading and writing the generated features to the .h5 batch files
+
+Copyright 2020 by Blagoj Hristov
+
+See the LICENSE file for the licensing associated with this software.
+
+Author:
+  Blagoj Hristov, March 2020
+
+"""
+
+import os
+import h5py
+import numpy as np
+
+# name of the dataset in the .h5 batch file of each feature type (<folder>-<batch>-<method>.h5)
+FEATURE_NAMES = {'spectrogram': 'Spectrogram', 'mfcc': 'MFCC', 'fbank': 'Fbank', 'delta': 'Delta'}
+
+
+def write_ragged(h5_file, name, clips, num_features, compression='lzf'):
+    """
+    This function is for writing the features of multiple audio files to a .h5 file in ragged form (all frames concatenated through time, without any padding).
+
+    Parameters:
+        h5_file (h5py.File): Opened (writable) .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset to be created (ex: 'Spectrogram', 'MFCC')
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features) of the audio files in the batch
+        num_features (int): Integer variable containing the size of axis 1 of each array (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        compression (string): String variable containing the HDF5 compression filter to be used (default is 'lzf')
+
+    Returns:
+        Creates three datasets in the .h5 file:
+        <name> (2D array of all frames, axis 0 ==> data through time of all audio files; axis 1 ==> features)
+        Offsets (index of the first frame of each audio file, with the total number of frames appended at the end)
+        Lengths (number of frames of each audio file)
+
+    """
+
+    dataset = create_features(h5_file=h5_file, name=name, lengths=[len(clip) for clip in clips], num_features=num_features, storage='ragged', compression=compression)
+
+    if clips:
+        dataset[:] = np.concatenate(clips, axis=0).astype(np.float32, copy=False)
+
+
+def write_padded(h5_file, name, clips, num_features, maximum=None, compression='lzf'):
+    """
+    This function is for writing the features of multiple audio files to a .h5 file in padded form, zero-padded to the longest audio file in the batch.
+    The time axis of the dataset is resizable, so that all batch files can later be padded to the longest audio file in the entire dataset (see resize_padded).
+
+    Parameters:
+        h5_file (h5py.File): Opened (writable) .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset to be created (ex: 'Spectrogram', 'MFCC')
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features) of the audio files in the batch
+        num_features (int): Integer variable containing the size of axis 1 of each array (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        maximum (int): The length to pad to, if known in advance (default is None, which pads to the longest audio file in the batch)
+        compression (string): String variable containing the HDF5 compression filter to be used (default is 'lzf')
+
+    Returns:
+        batch_maximum (int): The length of the longest audio file in the batch
+        Creates two datasets in the .h5 file:
+        <name> (axis 0 ==> data through time; axis 1 ==> features; axis 2 ==> audio files)
+        Lengths (number of frames of each audio file)
+
+    """
+
+    dataset = create_features(h5_file=h5_file, name=name, lengths=[len(clip) for clip in clips], num_features=num_features, storage='padded', maximum=maximum, compression=compression)
+
+    for num_clip, clip in enumerate(clips):
+        dataset[:len(clip), :, num_clip] = clip
+
+    return max([len(clip) for clip in clips], default=0)
+
+
+def write_clip_major(h5_file, name, clips, num_features, maximum=None, chunk_length=None, compression='lzf'):
+    """
+    This function is for writing the features of multiple audio files to a .h5 file in clip-major padded form (axis order: audio files, time, features).
+    Each chunk holds chunk_length frames of a single audio file (by default the median length in the batch), so reading a short audio file
+    or a time window of a long one decompresses only the chunks it overlaps, instead of the whole padded length as with write_padded.
+    The time axis of the dataset is resizable (see resize_padded), the padding beyond the last written chunk of each audio file is never stored.
+
+    Parameters:
+        h5_file (h5py.File): Opened (writable) .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset to be created (ex: 'Spectrogram', 'MFCC')
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features) of the audio files in the batch
+        num_features (int): Integer variable containing the size of axis 1 of each array (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        maximum (int): The length to pad to, if known in advance (default is None, which pads to the longest audio file in the batch)
+        chunk_length (int): Integer variable containing the number of frames in each chunk (default is None, which uses the median length of the audio files in the batch)
+        compression (string): String variable containing the HDF5 compression filter to be used (default is 'lzf')
+
+    Returns:
+        batch_maximum (int): The length of the longest audio file in the batch
+        Creates two datasets in the .h5 file:
+        <name> (axis 0 ==> audio files; axis 1 ==> data through time; axis 2 ==> features)
+        Lengths (number of frames of each audio file)
+
+    """
+
+    dataset = create_features(h5_file=h5_file, name=name, lengths=[len(clip) for clip in clips], num_features=num_features, storage='clip_major', maximum=maximum,
+                              chunk_length=chunk_length, compression=compression)
+
+    for num_clip, clip in enumerate(clips):
+        dataset[num_clip, :len(clip)] = clip
+
+    return max([len(clip) for clip in clips], default=0)
+
+
+def create_features(h5_file, name, lengths, num_features, storage='padded', maximum=None, chunk_length=None, compression='lzf'):
+    """
+    This function is for creating the (empty) dataset of the features of multiple audio files in a .h5 file, in any storage form, before the features are generated.
+    The layout is the one of write_ragged, write_padded and write_clip_major, the features can then be written in parts (see write_clips).
+
+    Parameters:
+        h5_file (h5py.File): Opened (writable) .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset to be created (ex: 'Spectrogram', 'MFCC')
+        lengths (list): List variable containing the number of frames of each audio file in the batch
+        num_features (int): Integer variable containing the number of features (ex: 129 for the spectrogram, num_coeff for the MFCC)
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable containing the storage form
+        maximum (int): The length to pad to when using 'padded' or 'clip_major' storage (default is None, which pads to the longest audio file in the batch)
+        chunk_length (int): Integer variable containing the number of frames in each chunk when using 'clip_major' storage (default is None, see write_clip_major)
+        compression (string): String variable containing the HDF5 compression filter to be used (default is 'lzf')
+
+    Returns:
+        dataset (h5py.Dataset): The created dataset, filled with zeros (the Lengths dataset, and the Offsets dataset for 'ragged' storage, are also created)
+
+    """
+
+    lengths = np.array(lengths, dtype=np.int64)
+    batch_maximum = int(lengths.max()) if len(lengths) else 0
+
+    if storage == 'ragged':
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        dataset = h5_file.create_dataset(name=name, shape=(int(offsets[-1]), num_features), chunks=(max(min(int(offsets[-1]), 4096), 1), num_features), maxshape=(None, num_features),
+                                         dtype=np.float32, compression=compression)
+        h5_file.create_dataset(name='Offsets', data=offsets)
+    elif storage == 'clip_major':
+        if chunk_length is None:
+            chunk_length = int(np.median(lengths)) if len(lengths) else 1
+
+        dataset = h5_file.create_dataset(name=name, shape=(len(lengths), max(batch_maximum, maximum or 0), num_features), maxshape=(None, None, num_features),
+                                         chunks=(1, max(min(chunk_length, batch_maximum), 1), num_features), dtype=np.float32, compression=compression, fillvalue=0.)
+    else:
+        dataset = h5_file.create_dataset(name=name, shape=(max(batch_maximum, maximum or 0), num_features, len(lengths)), maxshape=(None, num_features, None),
+                                         chunks=(max(batch_maximum, 1), num_features, 1), dtype=np.float32, compression=compression, fillvalue=0.)
+
+    h5_file.create_dataset(name='Lengths', data=lengths)
+
+    h5_file.attrs['storage'] = storage
+
+    return dataset
+
+
+def write_clips(h5_file, name, clips, start):
+    """
+    This function is for writing the features of consecutive audio files into a dataset created by create_features, as a single hyperslab write.
+    In 'clip_major' storage each audio file is written separately, so the chunks of the padding after each audio file are never stored.
+
+    Parameters:
+        h5_file (h5py.File): Opened (writable) .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        clips (list): List variable containing the 2D NumPy arrays of features of the audio files (axis 0 ==> data through time; axis 1 ==> features)
+        start (int): Integer variable containing the index (in the batch) of the first audio file
+
+    Returns:
+        None
+
+    """
+
+    dataset = h5_file[name]
+    storage = storage_form(h5_file)
+
+    if not clips:
+        return
+
+    if storage == 'ragged':
+        offset = int(h5_file['Offsets'][start])
+        data = np.concatenate(clips, axis=0)
+        dataset[offset:offset + len(data)] = data
+    elif storage == 'clip_major':
+        for num_clip, clip in enumerate(clips):
+            dataset[start + num_clip, :len(clip)] = clip
+    else:
+        length = max([len(clip) for clip in clips])
+
+        if length == 0:
+            return
+
+        block = np.zeros((length, dataset.shape[1], len(clips)), dtype=np.float32)
+        for num_clip, clip in enumerate(clips):
+            block[:len(clip), :, num_clip] = clip
+
+        dataset[:length, :, start:start + len(clips)] = block
+
+
+def resize_padded(file_path, name, maximum):
+    """
+    This function is for extending the padding of a .h5 batch file written by write_padded (or write_clip_major) to a given length.
+    Only the dataset shape is changed, the added padding is never written to disk (it is read back as the zero fill value).
+
+    Parameters:
+        file_path (string): String variable containing the path to the .h5 batch file
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        maximum (int): The length to pad to (longest audio file in the entire dataset)
+
+    Returns:
+        None
+
+    """
+
+    with h5py.File(name=file_path, mode='a') as h5_file:
+        axis = 1 if storage_form(h5_file) == 'clip_major' else 0
+
+        if h5_file[name].shape[axis] != maximum:
+            h5_file[name].resize(maximum, axis=axis)
+
+
+def storage_form(h5_file):
+    """
+    This function is for reading the storage form of a .h5 batch file.
+
+    Parameters:
+        h5_file (h5py.File): Opened .h5 file of the batch folder
+
+    Returns:
+        storage (string): {'padded', 'ragged', 'clip_major'} The storage form (files written before the storage attribute was introduced are 'padded')
+
+    """
+
+    return h5_file.attrs.get('storage', 'padded')
+
+
+def is_ragged(h5_file):
+    """
+    This function is for checking whether a .h5 batch file was written in ragged form.
+
+    Parameters:
+        h5_file (h5py.File): Opened .h5 file of the batch folder
+
+    Returns:
+        bool: Boolean value as to whether the file is stored in ragged form or not
+
+    """
+
+    return storage_form(h5_file) == 'ragged'
+
+
+def read_ragged(h5_file, name, indices=None):
+    """
+    This function is for reading the features of (a subset of) the audio files stored in ragged form in a .h5 file.
+
+    Parameters:
+        h5_file (h5py.File): Opened .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        indices (list): List variable containing the indices of the audio files to be read (default is None, which reads all audio files)
+
+    Returns:
+        clips (list): List variable containing the 2D NumPy arrays of features of the requested audio files, in the requested order
+
+    """
+
+    offsets = h5_file['Offsets'][:]
+    dataset = h5_file[name]
+
+    if indices is None:
+        data = dataset[:]
+        return [data[offsets[index]:offsets[index + 1]] for index in range(len(offsets) - 1)]
+
+    return [dataset[offsets[index]:offsets[index + 1]] for index in indices]
+
+
+def read_clip(h5_file, name, index):
+    """
+    This function is for reading the features of a single audio file from an opened .h5 batch file, without its padding, regardless of the storage form.
+    Only the frames of the requested audio file are read from disk (one chunk of the full padded length when using 'padded' storage, the overlapping chunks when using 'clip_major' storage).
+
+    Parameters:
+        h5_file (h5py.File): Opened .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        index (int): Integer variable containing the index of the audio file in the batch
+
+    Returns:
+        clip (np.ndarray): 2D NumPy array containing the features of the audio file (axis 0 ==> data through time; axis 1 ==> features)
+
+    """
+
+    if is_ragged(h5_file):
+        start, end = h5_file['Offsets'][index:index + 2]
+        return h5_file[name][start:end]
+
+    length = int(h5_file['Lengths'][index])
+
+    if storage_form(h5_file) == 'clip_major':
+        return h5_file[name][index, :length]
+
+    return h5_file[name][:length, :, index]
+
+
+def read_clips(h5_file, name):
+    """
+    This function is for reading the features of all audio files from an opened .h5 batch file, without their padding, regardless of the storage form.
+
+    Parameters:
+        h5_file (h5py.File): Opened .h5 file of the batch folder
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+
+    Returns:
+        clips (list): List variable containing the 2D NumPy arrays of features of all audio files (axis 0 ==> data through time; axis 1 ==> features)
+
+    """
+
+    if is_ragged(h5_file):
+        return read_ragged(h5_file=h5_file, name=name)
+
+    data = h5_file[name][:]
+
+    if storage_form(h5_file) == 'clip_major':
+        return [data[index, :length] for index, length in enumerate(h5_file['Lengths'][:])]
+
+    return [data[:length, :, index] for index, length in enumerate(h5_file['Lengths'][:])]
+
+
+def stack_clips(clips, maximum=None):
+    """
+    This function is for zero-padding and stacking multiple feature arrays into a single 3D array, using the same axis order as the padded .h5 files.
+
+    Parameters:
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features)
+        maximum (int): The length to pad to (default is None, which pads to the longest array in the list)
+
+    Returns:
+        data (np.ndarray): 3D NumPy array containing the padded features
+        Axis 0 represents the data through time
+        Axis 1 represents the features
+        Axis 2 represents the multiple individual audio files
+
+    """
+
+    if maximum is None:
+        maximum = max([len(clip) for clip in clips], default=0)
+
+    num_features = clips[0].shape[1] if clips else 0
+    data = np.zeros((maximum, num_features, len(clips)), dtype=np.float32)
+
+    for num_clip, clip in enumerate(clips):
+        data[:len(clip), :, num_clip] = clip
+
+    return data
+
+
+def raw_offsets_path(file_path):
+    """
+    This function is for constructing the path to the offsets file of a raw (.npy) feature file.
+
+    Parameters:
+        file_path (string): String variable containing the path to the raw .npy feature file (ex: <folder>-<batch>-mfcc.npy)
+
+    Returns:
+        offsets_path (string): The path to the offsets file (ex: <folder>-<batch>-mfcc-offsets.npy)
+
+    """
+
+    return file_path[:-len('.npy')] + '-offsets.npy'
+
+
+def raw_source_path(file_path):
+    """
+    This function is for constructing the path to the source file of a raw (.npy) feature file, which records the .h5 file it was converted from (see convert_to_raw).
+
+    Parameters:
+        file_path (string): String variable containing the path to the raw .npy feature file (ex: <folder>-<batch>-mfcc.npy)
+
+    Returns:
+        source_path (string): The path to the source file (ex: <folder>-<batch>-mfcc-source.npy)
+
+    """
+
+    return file_path[:-len('.npy')] + '-source.npy'
+
+
+def source_stamp(h5_path):
+    """
+    This function is for calculating the stamp of a .h5 batch file, from its modification time and size. Regenerating or normalizing the file changes the stamp.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+
+    Returns:
+        stamp (np.ndarray): int64 NumPy array containing the modification time (in nanoseconds) and size of the file
+
+    """
+
+    stat = os.stat(h5_path)
+
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def is_raw_current(file_path, h5_path):
+    """
+    This function is for checking whether a raw (.npy) feature file is up to date, i.e. it exists and was converted from the current version of its .h5 batch file.
+
+    Parameters:
+        file_path (string): String variable containing the path to the raw .npy feature file
+        h5_path (string): String variable containing the path to the .h5 batch file it was converted from
+
+    Returns:
+        current (bool): True if the raw file can be used instead of the .h5 file, False if it is missing or stale
+
+    """
+
+    try:
+        return np.array_equal(np.load(raw_source_path(file_path=file_path)), source_stamp(h5_path=h5_path)) and os.path.exists(file_path)
+    except FileNotFoundError:
+        return False
+
+
+def write_raw(file_path, clips, num_features):
+    """
+    This function is for writing the features of multiple audio files to an uncompressed .npy file in ragged form (all frames concatenated through time),
+    so the features of each audio file are a contiguous, time-major block which can be memory-mapped and sliced without copying (see open_raw).
+
+    Parameters:
+        file_path (string): String variable containing the path to the .npy file to be created
+        clips (list): List variable containing the 2D NumPy arrays of features (axis 0 ==> data through time; axis 1 ==> features) of the audio files in the batch
+        num_features (int): Integer variable containing the size of axis 1 of each array
+
+    Returns:
+        Creates two files:
+        <file_path> (2D float32 array of all frames, axis 0 ==> data through time of all audio files; axis 1 ==> features)
+        <file_path without .npy>-offsets.npy (index of the first frame of each audio file, with the total number of frames appended at the end)
+
+    """
+
+    offsets = np.zeros(len(clips) + 1, dtype=np.int64)
+    np.cumsum([len(clip) for clip in clips], out=offsets[1:])
+
+    data = np.lib.format.open_memmap(file_path, mode='w+', dtype=np.float32, shape=(int(offsets[-1]), num_features))
+
+    for num_clip, clip in enumerate(clips):
+        data[offsets[num_clip]:offsets[num_clip + 1]] = clip
+
+    data.flush()
+    del data
+
+    np.save(raw_offsets_path(file_path=file_path), offsets)
+
+
+def open_raw(file_path):
+    """
+    This function is for opening a raw .npy feature file written by write_raw. The data is memory-mapped, only the pages of the accessed audio files are read from disk.
+
+    Parameters:
+        file_path (string): String variable containing the path to the .npy feature file
+
+    Returns:
+        data (np.memmap): Read-only memory-mapped 2D array of all frames (axis 0 ==> data through time of all audio files; axis 1 ==> features)
+        offsets (np.ndarray): NumPy array containing the index of the first frame of each audio file, with the total number of frames appended at the end
+        (the features of audio file i are data[offsets[i]:offsets[i + 1]], a view without copying)
+
+    """
+
+    return np.load(file_path, mmap_mode='r'), np.load(raw_offsets_path(file_path=file_path))
+
+
+def convert_to_raw(h5_path, name):
+    """
+    This function is for converting a .h5 batch file (in any storage form) into the raw .npy format (see write_raw), written next to it with the same name.
+    The stamp of the .h5 file (see source_stamp) is written last to the -source.npy file, so an interrupted or outdated conversion is detected by is_raw_current.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+
+    Returns:
+        file_path (string): The path to the created .npy file
+
+    """
+
+    stamp = source_stamp(h5_path=h5_path)
+
+    with h5py.File(name=h5_path, mode='r') as h5_file:
+        clips = read_clips(h5_file=h5_file, name=name)
+        num_features = h5_file[name].shape[2 if storage_form(h5_file) == 'clip_major' else 1]
+
+    file_path = h5_path[:-len('.h5')] + '.npy'
+
+    if os.path.exists(raw_source_path(file_path=file_path)):
+        os.remove(raw_source_path(file_path=file_path))
+
+    write_raw(file_path=file_path, clips=clips, num_features=num_features)
+
+    np.save(raw_source_path(file_path=file_path), stamp)
+
+    return file_path
+
+
+def migrate_layout(h5_path, name, storage='clip_major', chunk_length=None):
+    """
+    This function is for rewriting a .h5 batch file in another storage form (ex: the existing 'padded' files into the 'clip_major' form).
+    The new file is written next to the old one and then replaces it, so an interrupted migration never leaves a partially written file.
+    The padding length and all other datasets and attributes (ex: the feature statistics and the applied normalization, see preprocessing.statistics) are kept.
+    The cache key is not kept, since the storage form is part of it (see utils.cache), so the next generation rewrites the file.
+
+    Parameters:
+        h5_path (string): String variable containing the path to the .h5 batch file
+        name (string): String variable containing the name of the dataset (ex: 'Spectrogram', 'MFCC')
+        storage (string): {'padded', 'ragged', 'clip_major'} String variable containing the new storage form
+        chunk_length (int): Integer variable containing the number of frames in each chunk when using 'clip_major' storage (default is None, see write_clip_major)
+
+    Returns:
+        None
+
+    """
+
+    if storage not in ('padded', 'ragged', 'clip_major'):
+        raise ValueError('Wrong input for storage argument! Possible inputs: \'padded\', \'ragged\', \'clip_major\'')
+
+    with h5py.File(name=h5_path, mode='r') as h5_file:
+        if storage_form(h5_file) == storage:
+            return
+
+        clips = read_clips(h5_file=h5_file, name=name)
+        num_features = h5_file[name].shape[2 if storage_form(h5_file) == 'clip_major' else 1]
+        maximum = None if is_ragged(h5_file) else h5_file[name].shape[1 if storage_form(h5_file) == 'clip_major' else 0]
+        extra = {key: h5_file[key][:] for key in h5_file.keys() if key not in (name, 'Lengths', 'Offsets')}
+        attributes = {key: value for key, value in h5_file.attrs.items() if key not in ('storage', 'cache_key', 'cache_stats', 'cache_seconds')}
+
+    temp_path = h5_path + '.tmp'
+
+    with h5py.File(name=temp_path, mode='w', libver='latest') as h5_file:
+        if storage == 'padded':
+            write_padded(h5_file=h5_file, name=name, clips=clips, num_features=num_features, maximum=maximum)
+        elif storage == 'clip_major':
+            write_clip_major(h5_file=h5_file, name=name, clips=clips, num_features=num_features, maximum=maximum, chunk_length=chunk_length)
+        else:
+            write_ragged(h5_file=h5_file, name=name, clips=clips, num_features=num_features)
+
+        for key, data in extra.items():
+            h5_file.create_dataset(name=key, data=data)
+
+        h5_file.attrs.update(attributes)
+
+    os.replace(temp_path, h5_path)